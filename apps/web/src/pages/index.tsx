@@ -18,7 +18,7 @@ import { Modal } from '../components/Modal';
 import { useAuth } from '../auth/AuthContext';
 import { useAuthHeaders } from '../auth/useAuthHeaders';
 import { services } from '../lib/api';
-import { emitTelemetry, mark, markEnd } from '../lib/telemetry';
+import { emitTelemetry, getAnonId, mark, markEnd } from '../lib/telemetry';
 import { FeedbackWidget } from '../components/FeedbackWidget';
 
 
@@ -147,7 +147,7 @@ function HomeInner() {
             {user && !recsDisabled && recsPanel && recsPanel.length>0 && (
               <div style={{ display:'flex', flexDirection:'column', gap:6 }}>
                 {recsPanel.map((r:any)=> (
-                  <button key={r.id} onClick={()=>emitTelemetry({ type:'rec.click', data:{ id: r.id, rank: r.rank, variant: recsVariant } })} style={{ textAlign:'left', fontSize:12, padding:'6px 8px', background:'#161A21', border:'1px solid #2A303B', borderRadius:6, cursor:'pointer' }}>
+                  <button key={r.id} onClick={()=>emitTelemetry({ type:'rec.click', data:{ id: r.id, rank: r.rank, variant: recsVariant }, anonId: getAnonId() })} style={{ textAlign:'left', fontSize:12, padding:'6px 8px', background:'#161A21', border:'1px solid #2A303B', borderRadius:6, cursor:'pointer' }}>
                     <strong>{r.id}</strong> <span style={{opacity:.7}}>score {r.score.toFixed(3)}</span>
                     {r.reason?.length>0 && <em style={{ fontSize:11, opacity:.6 }}> {r.reason.slice(0,3).join(', ')}</em>}
                   </button>
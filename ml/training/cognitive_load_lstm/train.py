@@ -67,7 +67,12 @@ def train(epochs: int = 10, batch_size: int = 32, lr: float = 1e-3):
     output_dir = Path("../../ml/experiments")
     output_dir.mkdir(parents=True, exist_ok=True)
     torch.save(model.state_dict(), output_dir / "cognitive_load_lstm.pt")
-    print(f"Model saved to {output_dir / 'cognitive_load_lstm.pt'}")
+    # Same weights as plain arrays for torch-free inference (cognitive-guardian LOAD_MODEL_PATH)
+    np.savez(
+        output_dir / "cognitive_load_lstm.npz",
+        **{k: v.detach().cpu().numpy() for k, v in model.state_dict().items()},
+    )
+    print(f"Model saved to {output_dir / 'cognitive_load_lstm.pt'} (+ .npz)")
 
 
 if __name__ == "__main__":
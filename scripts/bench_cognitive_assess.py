@@ -0,0 +1,161 @@
+"""Benchmark batch cognitive assessment: /v1/assess:batch vs per-session /v1/assess.
+
+Generates synthetic session metrics plus attention ring buffers and reports,
+per batch size:
+
+* ``endpoint_*`` – ``POST /v1/assess:batch`` through the ASGI app (FastAPI
+  ``TestClient``): JSON decoding, pydantic validation, ring lookups,
+  ``assess_batch``, building the response models and JSON encoding. Only the
+  network and the client's request encoding are left out.
+* ``per_session_endpoint_*`` – the same sessions as one ``POST /v1/assess``
+  each, up to ``--http-loop-max`` sessions (it is slow by design).
+* ``kernel_*`` / ``per_session_rules_*`` – just ``core.batch_assessment.assess_batch``
+  against the per-session rules called in-process. These exclude all
+  (de)serialisation and only compare the arithmetic.
+
+Needs the service's own dependencies (FastAPI, uvicorn, httpx). The weights
+come from the service's ``CognitiveLoadCalculator``.
+
+Usage:
+  python scripts/bench_cognitive_assess.py --sessions 100 1000 10000 100000 --repeat 5
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import pathlib
+import sys
+import time
+
+import numpy as np
+
+SERVICE_DIR = pathlib.Path(__file__).resolve().parents[1] / "services" / "cognitive-guardian"
+sys.path.insert(0, str(SERVICE_DIR))
+
+from core.attention_buffer import AttentionRing  # noqa: E402
+from core.batch_assessment import assess_batch  # noqa: E402
+
+
+def synthetic(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    cols = {
+        "hesitation_ms": rng.integers(0, 20000, n),
+        "error_rate": rng.random(n),
+        "reread_count": rng.integers(0, 10, n),
+        "session_duration_minutes": rng.integers(0, 90, n),
+    }
+    rings = {}
+    for i in range(0, n, 2):  # half the sessions stream attention frames
+        ring = AttentionRing(100)
+        k = int(rng.integers(1, 100))
+        ring.extend(
+            np.arange(k, dtype=np.float64), rng.random(k) > 0.2, rng.uniform(-0.6, 0.6, k),
+            np.full(k, np.nan), np.full(k, np.nan), rng.uniform(-45, 45, k), rng.random(k) > 0.9,
+        )
+        rings[f"s{i}"] = ring
+    return cols, rings
+
+
+def kernel(cols, rings, n, weights):
+    poor = np.zeros(n, dtype=np.int64)
+    frames = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        ring = rings.get(f"s{i}")
+        if ring is not None:
+            poor[i], frames[i] = ring.poor_count, len(ring)
+    return assess_batch(
+        cols["hesitation_ms"], cols["error_rate"], cols["reread_count"],
+        cols["session_duration_minutes"], poor, frames, weights,
+    )
+
+
+def session_dicts(cols, n):
+    return [
+        {
+            "session_id": f"s{i}", "student_id": "bench",
+            "hesitation_ms": int(cols["hesitation_ms"][i]), "error_rate": float(cols["error_rate"][i]),
+            "reread_count": int(cols["reread_count"][i]),
+            "session_duration_minutes": int(cols["session_duration_minutes"][i]),
+        }
+        for i in range(n)
+    ]
+
+
+def per_session_rules(service, metrics, rings):
+    out = []
+    for m in metrics:
+        ring = rings.get(m.session_id)
+        load = service.calculator.calculate(m, ring)
+        emotion = service.emotion_detector.detect(m, load)
+        fatigue = service.calculator._calculate_fatigue(m.session_duration_minutes)
+        out.append((load, emotion, service.determine_intervention(load, emotion, fatigue)))
+    return out
+
+
+def batch_endpoint(client, body: bytes):
+    r = client.post("/v1/assess:batch", content=body, headers={"content-type": "application/json"})
+    r.raise_for_status()
+    return r
+
+
+def per_session_endpoint(client, bodies):
+    for body in bodies:
+        client.post("/v1/assess", content=body, headers={"content-type": "application/json"}).raise_for_status()
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def timed(row, name, n, t):
+    row[f"{name}_ms"] = round(t * 1000, 3)
+    row[f"{name}_sessions_per_s"] = int(n / t)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--http-loop-max", type=int, default=1000, help="largest batch also sent as per-session requests")
+    args = ap.parse_args()
+
+    try:
+        import main as service
+        from fastapi.testclient import TestClient
+    except ImportError as exc:
+        sys.exit(f"cognitive-guardian is not importable ({exc}); install its requirements first")
+
+    weights = service.CognitiveLoadCalculator().weights
+    service.MAX_ASSESS_BATCH = max(args.sessions)  # the benchmark sizes may exceed ASSESS_BATCH_MAX_SESSIONS
+    client = TestClient(service.app)
+
+    results = []
+    for n in args.sessions:
+        cols, rings = synthetic(n)
+        service.attention_buffer.clear()
+        service.attention_buffer.update(rings)
+        sessions = session_dicts(cols, n)
+        row = {"sessions": n}
+
+        body = json.dumps({"sessions": sessions}).encode()  # client-side encoding is not timed
+        timed(row, "endpoint", n, best_of(lambda: batch_endpoint(client, body), args.repeat))
+        if n <= args.http_loop_max:
+            bodies = [json.dumps(s).encode() for s in sessions]
+            timed(row, "per_session_endpoint", n, best_of(lambda: per_session_endpoint(client, bodies), args.repeat))
+            row["endpoint_speedup"] = round(row["per_session_endpoint_ms"] / max(row["endpoint_ms"], 1e-9), 1)
+
+        timed(row, "kernel", n, best_of(lambda: kernel(cols, rings, n, weights), args.repeat))
+        metrics = [service.SessionMetrics(**s) for s in sessions]  # parsing excluded on both sides
+        timed(row, "per_session_rules", n, best_of(lambda: per_session_rules(service, metrics, rings), args.repeat))
+        row["kernel_speedup"] = round(row["per_session_rules_ms"] / max(row["kernel_ms"], 1e-9), 1)
+        results.append(row)
+    print(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
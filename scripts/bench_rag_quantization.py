@@ -0,0 +1,118 @@
+"""Benchmark RAG vector index quantization: recall@k vs memory vs latency.
+
+Builds a synthetic clustered corpus and compares the exact float32 index with
+int8 scalar and product quantization (ADC shortlist + exact re-score), with and
+without IVF. PQ is swept over shortlist depths (``--rerank``) since its recall
+depends on how many candidates get the exact re-score.
+
+``--store ram`` adds the corpus to the index's float32 RAM tail (as ``/v1/rag/index``
+does without ``RAG_EMBED_STORE_DIR``); ``--store mmap`` writes it to an embedding
+store segment and attaches the memory map, as the service does on startup.
+``resident_vector_mb`` is ``VectorIndex.resident_bytes``: the float rows kept in
+process memory plus the codes. ``mapped_vector_mb`` is the memory-mapped float
+data, paged in on demand: every page for flat / IVF scans, only the re-scored
+shortlist for quantized configs. Quantization only shrinks the resident size
+with the mmap store; in RAM mode the float rows stay resident for the re-score.
+
+Usage:
+  python scripts/bench_rag_quantization.py --n 200000 --dim 32 --queries 200 --k 10 --pq-m 8 --rerank 4 16 64 --store ram mmap
+"""
+
+from __future__ import annotations
+import argparse
+import functools
+import importlib.util
+import json
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAG_DIR = pathlib.Path(__file__).resolve().parents[1] / "services" / "rag" / "rag"
+
+
+def _load(name: str):
+    spec = importlib.util.spec_from_file_location(f"rag_{name}", RAG_DIR / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def corpus(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, n)] + 0.35 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def run_config(vi, qz, name, data, queries, truth, k, ivf_threshold, quant, pq_m, rerank, segment=None):
+    factory = functools.partial(qz.train_quantizer, quant, pq_m=pq_m) if quant else None
+    idx = vi.VectorIndex(data.shape[1], ivf_threshold=ivf_threshold, quantizer=factory, rerank=rerank)
+    t0 = time.perf_counter()
+    if segment is None:
+        idx.add([str(i) for i in range(data.shape[0])], data)
+    else:
+        idx.attach(segment.keys, segment.matrix, segment.payloads)
+    build_s = time.perf_counter() - t0
+    lat, hits = [], 0
+    for q, exact in zip(queries, truth):
+        t0 = time.perf_counter()
+        rows, _ = idx.search(q, k)
+        lat.append((time.perf_counter() - t0) * 1000)
+        hits += len(set(rows.tolist()) & exact)
+    mapped = 0 if segment is None else segment.matrix.nbytes
+    return {
+        "config": name,
+        "store": "ram" if segment is None else "mmap",
+        "mode": idx.mode,
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "resident_vector_mb": round(idx.resident_bytes / 2**20, 2),
+        "mapped_vector_mb": round(mapped / 2**20, 2),
+        "code_mb": round(idx.code_bytes / 2**20, 2),
+        "build_s": round(build_s, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000)
+    ap.add_argument("--dim", type=int, default=32)
+    ap.add_argument("--clusters", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--pq-m", type=int, default=8)
+    ap.add_argument("--rerank", type=int, nargs="+", default=[4, 16, 64])
+    ap.add_argument("--store", choices=["ram", "mmap"], nargs="+", default=["ram", "mmap"])
+    args = ap.parse_args()
+
+    vi, qz, es = _load("vector_index"), _load("quantize"), _load("embedding_store")
+    data = vi.normalize(corpus(args.n, args.dim, args.clusters))
+    rng = np.random.default_rng(1)
+    queries = vi.normalize(data[rng.choice(args.n, args.queries, replace=False)] + 0.1 * rng.normal(size=(args.queries, args.dim)))
+    truth = [set(np.argsort(-(data @ q))[: args.k].tolist()) for q in queries]
+
+    never, always = args.n + 1, 1
+    configs = [("float32", never, None, 1), ("ivf", always, None, 1)]
+    configs += [("int8", never, "int8", args.rerank[0]), ("ivf+int8", always, "int8", args.rerank[0])]
+    for rerank in args.rerank:
+        configs += [(f"pq/r{rerank}", never, "pq", rerank), (f"ivf+pq/r{rerank}", always, "pq", rerank)]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-rag-store-") as tmp:
+        segment = None
+        if "mmap" in args.store:
+            segment = es.EmbeddingStore(tmp, args.dim).append([str(i) for i in range(args.n)], data, [{}] * args.n)
+        for store in args.store:
+            results += [
+                run_config(vi, qz, name, data, queries, truth, args.k, ivf, quant, args.pq_m, rerank,
+                           segment if store == "mmap" else None)
+                for name, ivf, quant, rerank in configs
+            ]
+    print(json.dumps({"n": args.n, "dim": args.dim, "k": args.k, "pq_m": args.pq_m, "rerank": args.rerank, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,12 @@ and prerequisite relationships for demo / development purposes.
 
 Usage:
     python scripts/setup/seed_knowledge_graph.py [--neo4j-uri URI]
+    python scripts/setup/seed_knowledge_graph.py --export-json kg.json  # offline stand-in (KG_SNAPSHOT_PATH)
 """
 
 import argparse
 import asyncio
+import json
 import os
 
 
@@ -89,44 +91,48 @@ async def seed(uri: str, user: str, password: str):
     print(f"Connecting to {uri} …")
     driver = AsyncGraphDatabase.driver(uri, auth=(user, password))
 
+    # one UNWIND query per entity type instead of one round trip per row
     async with driver.session() as session:
-        # Topics
-        for t in TOPICS:
-            await session.run(
-                "MERGE (t:Topic {id: $id}) SET t.name = $name, t.description = $desc",
-                id=t["id"], name=t["name"], desc=t["description"],
-            )
+        await session.run(
+            "UNWIND $rows AS t MERGE (n:Topic {id: t.id}) SET n.name = t.name, n.description = t.description",
+            rows=TOPICS,
+        )
         print(f"  ✓ {len(TOPICS)} topics")
 
-        # Concepts
-        for c in CONCEPTS:
-            await session.run(
-                """
-                MERGE (c:Concept {id: $id})
-                SET c.name = $name, c.difficulty = $difficulty
-                WITH c
-                MATCH (t:Topic {id: $topic})
-                MERGE (c)-[:BELONGS_TO]->(t)
-                """,
-                id=c["id"], name=c["name"], difficulty=c["difficulty"], topic=c["topic"],
-            )
+        await session.run(
+            """
+            UNWIND $rows AS row
+            MERGE (c:Concept {id: row.id})
+            SET c.name = row.name, c.difficulty = row.difficulty
+            WITH c, row
+            MATCH (t:Topic {id: row.topic})
+            MERGE (c)-[:BELONGS_TO]->(t)
+            """,
+            rows=CONCEPTS,
+        )
         print(f"  ✓ {len(CONCEPTS)} concepts")
 
-        # Prerequisites
-        for src, dst in PREREQUISITES:
-            await session.run(
-                """
-                MATCH (a:Concept {id: $src}), (b:Concept {id: $dst})
-                MERGE (a)-[:PREREQUISITE_OF]->(b)
-                """,
-                src=src, dst=dst,
-            )
+        await session.run(
+            """
+            UNWIND $rows AS row
+            MATCH (a:Concept {id: row.src}), (b:Concept {id: row.dst})
+            MERGE (a)-[:PREREQUISITE_OF]->(b)
+            """,
+            rows=[{"src": src, "dst": dst} for src, dst in PREREQUISITES],
+        )
         print(f"  ✓ {len(PREREQUISITES)} prerequisite edges")
 
     await driver.close()
     print("\n✅ Knowledge graph seeded.")
 
 
+def export_json(path: str):
+    """Write the sample graph in the format content-architect loads via KG_SNAPSHOT_PATH."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"topics": TOPICS, "concepts": CONCEPTS, "prerequisites": PREREQUISITES}, f, indent=2)
+    print(f"✅ Wrote {len(CONCEPTS)} concepts / {len(PREREQUISITES)} prerequisite edges to {path}")
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
@@ -136,8 +142,12 @@ async def main():
     parser.add_argument("--neo4j-uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"))
     parser.add_argument("--neo4j-user", default=os.getenv("NEO4J_USER", "neo4j"))
     parser.add_argument("--neo4j-password", default=os.getenv("NEO4J_PASSWORD", "neurosync_kg"))
+    parser.add_argument("--export-json", metavar="PATH", help="write the sample graph as JSON instead of seeding Neo4j")
     args = parser.parse_args()
 
+    if args.export_json:
+        export_json(args.export_json)
+        return
     await seed(args.neo4j_uri, args.neo4j_user, args.neo4j_password)
 
 
@@ -0,0 +1,159 @@
+"""
+Per-session attention frame storage – fixed-size NumPy ring buffers.
+
+Frames are stored column-wise (one array per field) instead of as pydantic
+objects, and the counts used by assessment are updated as frames enter and
+leave the window, so reads never rescan the buffer.
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+GAZE_X_LIMIT = 0.4  # |normalised horizontal gaze| beyond this is looking away
+HEAD_YAW_LIMIT = 30.0  # degrees
+
+FACE = 1
+BLINK = 2
+POOR = 4  # no face, gaze off-screen or head turned away
+
+
+def frame_flags(
+    face_detected: bool,
+    eye_gaze_x: Optional[float] = None,
+    head_yaw: Optional[float] = None,
+    blink_detected: bool = False,
+) -> int:
+    """Bit flags for one frame; ``POOR`` marks a frame counted against attention."""
+    poor = (
+        not face_detected
+        or (eye_gaze_x is not None and abs(eye_gaze_x) > GAZE_X_LIMIT)
+        or (head_yaw is not None and abs(head_yaw) > HEAD_YAW_LIMIT)
+    )
+    return (FACE if face_detected else 0) | (BLINK if blink_detected else 0) | (POOR if poor else 0)
+
+
+def batch_flags(
+    face_detected: np.ndarray,
+    eye_gaze_x: np.ndarray,
+    head_yaw: np.ndarray,
+    blink_detected: np.ndarray,
+) -> np.ndarray:
+    """``frame_flags`` for column arrays; NaN gaze / yaw counts as not reported."""
+    with np.errstate(invalid="ignore"):
+        poor = ~face_detected | (np.abs(eye_gaze_x) > GAZE_X_LIMIT) | (np.abs(head_yaw) > HEAD_YAW_LIMIT)
+    return (face_detected * FACE | blink_detected * BLINK | poor * POOR).astype(np.uint8)
+
+
+def _nan(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+class AttentionRing:
+    """Last ``capacity`` attention frames of one session with O(1) rolling counts."""
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity, dtype=np.float64)
+        self.gaze_x = np.full(capacity, np.nan, dtype=np.float32)  # NaN = not reported
+        self.gaze_y = np.full(capacity, np.nan, dtype=np.float32)
+        self.head_pitch = np.full(capacity, np.nan, dtype=np.float32)
+        self.head_yaw = np.full(capacity, np.nan, dtype=np.float32)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self._next = 0  # slot the next frame is written to
+        self._size = 0
+        self.face_count = 0
+        self.blink_count = 0
+        self.poor_count = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(
+        self,
+        timestamp: float,
+        face_detected: bool,
+        eye_gaze_x: Optional[float] = None,
+        eye_gaze_y: Optional[float] = None,
+        head_pitch: Optional[float] = None,
+        head_yaw: Optional[float] = None,
+        blink_detected: bool = False,
+    ):
+        i = self._next
+        if self._size == self.capacity:
+            self._count(int(self.flags[i]), -1)  # overwrite the oldest frame
+        else:
+            self._size += 1
+        flags = frame_flags(face_detected, eye_gaze_x, head_yaw, blink_detected)
+        self.timestamp[i] = timestamp
+        self.gaze_x[i] = _nan(eye_gaze_x)
+        self.gaze_y[i] = _nan(eye_gaze_y)
+        self.head_pitch[i] = _nan(head_pitch)
+        self.head_yaw[i] = _nan(head_yaw)
+        self.flags[i] = flags
+        self._count(flags, 1)
+        self._next = (i + 1) % self.capacity
+
+    def extend(
+        self,
+        timestamp: np.ndarray,
+        face_detected: np.ndarray,
+        eye_gaze_x: np.ndarray,
+        eye_gaze_y: np.ndarray,
+        head_pitch: np.ndarray,
+        head_yaw: np.ndarray,
+        blink_detected: np.ndarray,
+    ):
+        """Append a batch of frames given as equal-length columns (NaN = not reported)."""
+        cols = [
+            np.asarray(timestamp, dtype=np.float64),
+            np.asarray(face_detected, dtype=bool),
+            np.asarray(eye_gaze_x, dtype=np.float32),
+            np.asarray(eye_gaze_y, dtype=np.float32),
+            np.asarray(head_pitch, dtype=np.float32),
+            np.asarray(head_yaw, dtype=np.float32),
+            np.asarray(blink_detected, dtype=bool),
+        ]
+        cols = [c[-self.capacity:] for c in cols]  # only the newest frames survive
+        n = len(cols[0])
+        if n == 0:
+            return
+        ts, face, gx, gy, pitch, yaw, blink = cols
+        idx = (self._next + np.arange(n)) % self.capacity
+        evicted = max(0, self._size + n - self.capacity)  # the last `evicted` slots hold old frames
+        if evicted:
+            self._count_many(self.flags[idx[n - evicted:]], -1)
+        flags = batch_flags(face, gx, yaw, blink)
+        self.timestamp[idx] = ts
+        self.gaze_x[idx] = gx
+        self.gaze_y[idx] = gy
+        self.head_pitch[idx] = pitch
+        self.head_yaw[idx] = yaw
+        self.flags[idx] = flags
+        self._count_many(flags, 1)
+        self._size = min(self.capacity, self._size + n)
+        self._next = int((self._next + n) % self.capacity)
+
+    def _count_many(self, flags: np.ndarray, delta: int):
+        self.face_count += delta * int(np.count_nonzero(flags & FACE))
+        self.blink_count += delta * int(np.count_nonzero(flags & BLINK))
+        self.poor_count += delta * int(np.count_nonzero(flags & POOR))
+
+    def _count(self, flags: int, delta: int):
+        self.face_count += delta * bool(flags & FACE)
+        self.blink_count += delta * bool(flags & BLINK)
+        self.poor_count += delta * bool(flags & POOR)
+
+    def attention_penalty(self) -> int:
+        """Percentage of buffered frames with poor attention (0 when empty)."""
+        return int(self.poor_count / self._size * 100) if self._size else 0
+
+    def face_detection_rate(self) -> float:
+        return self.face_count / self._size if self._size else 0.0
+
+    def ordered(self, column: np.ndarray) -> np.ndarray:
+        """A copy of one column (e.g. ``ring.gaze_x``), oldest frame first."""
+        if self._size < self.capacity:
+            return column[: self._size].copy()
+        return np.roll(column, -self._next)
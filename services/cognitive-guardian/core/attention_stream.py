@@ -0,0 +1,120 @@
+"""
+Wire formats and flow control for the attention WebSocket.
+
+A client may send, per message:
+
+* a JSON object – one frame (the original protocol);
+* a JSON array of frame objects;
+* a binary message: a little-endian float64 base timestamp followed by
+  records of seven little-endian float32 values
+  ``[dt, face_detected, eye_gaze_x, eye_gaze_y, head_pitch, head_yaw, blink_detected]``
+  where ``dt`` is seconds since the base timestamp, flags are 0 / 1 and
+  NaN marks a field that was not measured. Timestamps are split this way
+  because float32 cannot hold epoch seconds at frame resolution.
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+BINARY_HEADER = np.dtype("<f8")
+BINARY_RECORD = np.dtype([(f, "<f4") for f in (
+    "dt", "face_detected", "eye_gaze_x", "eye_gaze_y", "head_pitch", "head_yaw", "blink_detected",
+)])
+
+
+def decode_binary_frames(payload: bytes) -> Dict[str, np.ndarray]:
+    """Columns for ``AttentionRing.extend`` from a packed binary batch."""
+    body = len(payload) - BINARY_HEADER.itemsize
+    if body <= 0 or body % BINARY_RECORD.itemsize:
+        raise ValueError(
+            f"binary batch must be {BINARY_HEADER.itemsize} header bytes plus "
+            f"a multiple of {BINARY_RECORD.itemsize}-byte records"
+        )
+    base = float(np.frombuffer(payload, BINARY_HEADER, count=1)[0])
+    rec = np.frombuffer(payload, BINARY_RECORD, offset=BINARY_HEADER.itemsize)
+    return {
+        "timestamp": base + rec["dt"].astype(np.float64),
+        "face_detected": rec["face_detected"] > 0.5,
+        "eye_gaze_x": rec["eye_gaze_x"],
+        "eye_gaze_y": rec["eye_gaze_y"],
+        "head_pitch": rec["head_pitch"],
+        "head_yaw": rec["head_yaw"],
+        "blink_detected": rec["blink_detected"] > 0.5,
+    }
+
+
+def encode_binary_frames(frames: Sequence[Dict[str, Optional[float]]]) -> bytes:
+    """Inverse of ``decode_binary_frames`` (reference client / tests)."""
+    base = min(f["timestamp"] for f in frames) if frames else 0.0
+    rec = np.zeros(len(frames), dtype=BINARY_RECORD)
+    for i, f in enumerate(frames):
+        rec[i] = (
+            f["timestamp"] - base,
+            float(bool(f.get("face_detected"))),
+            *(np.nan if f.get(k) is None else f[k] for k in ("eye_gaze_x", "eye_gaze_y", "head_pitch", "head_yaw")),
+            float(bool(f.get("blink_detected"))),
+        )
+    return np.array([base], dtype=BINARY_HEADER).tobytes() + rec.tobytes()
+
+
+def frames_to_columns(frames: List) -> Dict[str, np.ndarray]:
+    """Columns from validated ``AttentionFrame`` objects (None becomes NaN)."""
+    return {
+        "timestamp": np.array([f.timestamp for f in frames], dtype=np.float64),
+        "face_detected": np.array([f.face_detected for f in frames], dtype=bool),
+        "eye_gaze_x": np.array([f.eye_gaze_x for f in frames], dtype=np.float32),
+        "eye_gaze_y": np.array([f.eye_gaze_y for f in frames], dtype=np.float32),
+        "head_pitch": np.array([f.head_pitch for f in frames], dtype=np.float32),
+        "head_yaw": np.array([f.head_yaw for f in frames], dtype=np.float32),
+        "blink_detected": np.array([f.blink_detected for f in frames], dtype=bool),
+    }
+
+
+class AckPolicy:
+    """Acknowledge every ``every_frames`` frames or ``interval_s`` seconds, whichever comes first."""
+
+    def __init__(self, every_frames: int = 30, interval_s: float = 1.0):
+        self.every_frames = max(1, every_frames)
+        self.interval_s = interval_s
+        self._unacked = 0
+        self._last = time.monotonic()
+
+    def received(self, n: int) -> bool:
+        """Record ``n`` new frames; True when an ack is due (and resets the window)."""
+        self._unacked += n
+        now = time.monotonic()
+        if self._unacked >= self.every_frames or now - self._last >= self.interval_s:
+            self._unacked, self._last = 0, now
+            return True
+        return False
+
+
+class SampleRateAdvisor:
+    """
+    Suggests the client's frame rate. While the poor-attention share of the
+    window stays within ``tolerance`` for ``stable_checks`` consecutive acks
+    the rate is halved (down to ``min_hz``); any larger change restores ``max_hz``.
+    """
+
+    def __init__(self, max_hz: float = 30.0, min_hz: float = 5.0, tolerance: float = 0.05, stable_checks: int = 3):
+        self.max_hz = max_hz
+        self.min_hz = min_hz
+        self.tolerance = tolerance
+        self.stable_checks = stable_checks
+        self.hz = max_hz
+        self._last: Optional[float] = None
+        self._stable = 0
+
+    def update(self, poor_share: float) -> float:
+        if self._last is not None and abs(poor_share - self._last) <= self.tolerance:
+            self._stable += 1
+            if self._stable >= self.stable_checks:
+                self.hz = max(self.min_hz, self.hz / 2)
+                self._stable = 0
+        else:
+            self._stable = 0
+            self.hz = self.max_hz
+        self._last = poor_share
+        return self.hz
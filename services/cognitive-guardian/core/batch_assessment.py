@@ -0,0 +1,78 @@
+"""
+Vectorised cognitive assessment for many sessions at once.
+
+Mirrors ``CognitiveLoadCalculator``, ``EmotionDetector`` and
+``determine_intervention`` in ``main.py`` rule for rule (including the order
+floating-point terms are summed in), so a session gets the same result from
+``/v1/assess`` and ``/v1/assess:batch``.
+"""
+
+from typing import Dict, Mapping
+
+import numpy as np
+
+EMOTIONS = np.array(["calm", "frustrated", "confused", "tired"])
+ACTIONS = np.array(["continue", "suggest_break", "switch_modality", "simplify_content", "encourage_and_hint"])
+
+
+def fatigue_scores(duration_minutes: np.ndarray) -> np.ndarray:
+    d = duration_minutes.astype(np.int64)
+    return np.select(
+        [d < 20, d < 40],
+        [np.zeros_like(d), (d - 20) * 2],
+        np.minimum(40 + (d - 40) * 5, 100),
+    )
+
+
+def attention_penalties(poor_count: np.ndarray, frame_count: np.ndarray) -> np.ndarray:
+    """Percentage of poor-attention frames per session (0 without frames)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = poor_count / frame_count * 100
+    return np.where(frame_count > 0, np.trunc(share), 0).astype(np.int64)
+
+
+def assess_batch(
+    hesitation_ms: np.ndarray,
+    error_rate: np.ndarray,
+    reread_count: np.ndarray,
+    session_duration_minutes: np.ndarray,
+    poor_count: np.ndarray,
+    frame_count: np.ndarray,
+    weights: Mapping[str, float],
+) -> Dict[str, np.ndarray]:
+    """Column-wise assessment; every input is a 1-D array with one entry per session."""
+    hesitation = np.minimum(hesitation_ms / 100, 100)
+    errors = error_rate * 100
+    rereads = np.minimum(reread_count * 15, 100)
+    fatigue = fatigue_scores(session_duration_minutes)
+    penalty = attention_penalties(poor_count, frame_count)
+
+    load = (
+        weights["hesitation"] * hesitation
+        + weights["errors"] * errors
+        + weights["rereads"] * rereads
+        + weights["fatigue"] * fatigue
+        + weights["attention"] * penalty
+    )
+    cognitive_load = np.trunc(np.minimum(load, 100)).astype(np.int64)
+
+    emotion = np.select(
+        [cognitive_load > 85, error_rate > 0.7, session_duration_minutes > 45],
+        [1, 2, 3],
+        0,
+    )
+    action = np.select(
+        [cognitive_load > 90, cognitive_load > 80, cognitive_load > 70, emotion == 1, fatigue > 80],
+        [1, 2, 3, 4, 1],
+        0,
+    )
+    return {
+        "cognitive_load": cognitive_load,
+        "emotional_state": EMOTIONS[emotion],
+        "attention_level": 100 - penalty,
+        "fatigue_index": fatigue,
+        "intervention_needed": action != 0,
+        "recommended_action": ACTIONS[action],
+        "confidence": np.where(frame_count > 10, 0.85, 0.5),
+        "signals": np.stack([hesitation, errors, rereads, fatigue, penalty], axis=1).astype(np.float64),
+    }
@@ -3,13 +3,27 @@ NeuroSync AI – Cognitive Guardian Agent
 Real-time cognitive state monitoring and prediction.
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional
+import json
+import os
 import uvicorn
 from datetime import datetime
 
+import numpy as np
+
+from core.attention_buffer import AttentionRing
+from core.batch_assessment import assess_batch
+from models.streaming_lstm import StreamingLoadPredictor
+from core.attention_stream import (
+    AckPolicy,
+    SampleRateAdvisor,
+    decode_binary_frames,
+    frames_to_columns,
+)
+
 app = FastAPI(
     title="Cognitive Guardian Agent",
     description="Real-time cognitive load detection and emotion analysis",
@@ -52,9 +66,22 @@ class CognitiveAssessment(BaseModel):
     intervention_needed: bool
     recommended_action: str
     confidence: float = Field(..., ge=0.0, le=1.0)
+    predicted_load: Optional[int] = Field(None, ge=0, le=100)
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 
+class BatchAssessmentRequest(BaseModel):
+    """Metrics for many sessions, e.g. every active session on an orchestrator tick."""
+
+    sessions: List[SessionMetrics]
+
+
+class BatchAssessmentResponse(BaseModel):
+    """Assessments in the same order as the request's sessions."""
+
+    assessments: List[CognitiveAssessment]
+
+
 class AttentionFrame(BaseModel):
     """Single frame of attention data from webcam."""
 
@@ -88,13 +115,15 @@ class CognitiveLoadCalculator:
     def calculate(
         self,
         metrics: SessionMetrics,
-        attention_data: Optional[List[AttentionFrame]] = None,
+        attention_data: Optional[AttentionRing] = None,
     ) -> int:
-        hesitation_score = min(metrics.hesitation_ms / 100, 100)
-        error_score = metrics.error_rate * 100
-        reread_score = min(metrics.reread_count * 15, 100)
-        fatigue_score = self._calculate_fatigue(metrics.session_duration_minutes)
-        attention_score = self._calculate_attention_penalty(attention_data)
+        (
+            hesitation_score,
+            error_score,
+            reread_score,
+            fatigue_score,
+            attention_score,
+        ) = self.signals(metrics, attention_data)
 
         load = (
             self.weights["hesitation"] * hesitation_score
@@ -105,6 +134,20 @@ class CognitiveLoadCalculator:
         )
         return int(min(load, 100))
 
+    def signals(
+        self,
+        metrics: SessionMetrics,
+        attention_data: Optional[AttentionRing] = None,
+    ) -> List[float]:
+        """Per-signal scores (0-100) in weight order; also the load LSTM's input features (/100)."""
+        return [
+            min(metrics.hesitation_ms / 100, 100),
+            metrics.error_rate * 100,
+            min(metrics.reread_count * 15, 100),
+            self._calculate_fatigue(metrics.session_duration_minutes),
+            self._calculate_attention_penalty(attention_data),
+        ]
+
     def _calculate_fatigue(self, duration_minutes: int) -> int:
         if duration_minutes < 20:
             return 0
@@ -114,18 +157,11 @@ class CognitiveLoadCalculator:
             return min(40 + (duration_minutes - 40) * 5, 100)
 
     def _calculate_attention_penalty(
-        self, attention_data: Optional[List[AttentionFrame]]
+        self, attention_data: Optional[AttentionRing]
     ) -> int:
-        if not attention_data:
+        if attention_data is None:
             return 0
-        poor = sum(
-            1
-            for f in attention_data
-            if not f.face_detected
-            or (f.eye_gaze_x is not None and abs(f.eye_gaze_x) > 0.4)
-            or (f.head_yaw is not None and abs(f.head_yaw) > 30)
-        )
-        return int(poor / len(attention_data) * 100)
+        return attention_data.attention_penalty()
 
 
 # ============================================================================
@@ -174,8 +210,18 @@ def determine_intervention(
 calculator = CognitiveLoadCalculator()
 emotion_detector = EmotionDetector()
 
-attention_buffer: Dict[str, List[AttentionFrame]] = {}
+attention_buffer: Dict[str, AttentionRing] = {}
 MAX_BUFFER_SIZE = 100
+MAX_ASSESS_BATCH = int(os.getenv("ASSESS_BATCH_MAX_SESSIONS", "10000"))
+
+# Streaming LSTM load forecast; enabled when LOAD_MODEL_PATH points at weights
+load_predictor: Optional[StreamingLoadPredictor] = None
+
+# WebSocket flow control: ack cadence and the client frame-rate range
+ACK_EVERY_FRAMES = int(os.getenv("ATTENTION_ACK_EVERY_FRAMES", "30"))
+ACK_INTERVAL_S = float(os.getenv("ATTENTION_ACK_INTERVAL_S", "1.0"))
+SAMPLE_MAX_HZ = float(os.getenv("ATTENTION_SAMPLE_MAX_HZ", "30"))
+SAMPLE_MIN_HZ = float(os.getenv("ATTENTION_SAMPLE_MIN_HZ", "5"))
 
 
 # ============================================================================
@@ -205,7 +251,7 @@ async def healthz():
 
 @app.post("/v1/assess", response_model=CognitiveAssessment)
 async def assess_cognitive_state(metrics: SessionMetrics):
-    attention_data = attention_buffer.get(metrics.session_id, [])
+    attention_data = attention_buffer.get(metrics.session_id)
     cognitive_load = calculator.calculate(metrics, attention_data)
     emotional_state = emotion_detector.detect(metrics, cognitive_load)
     attention_level = 100 - calculator._calculate_attention_penalty(attention_data)
@@ -213,7 +259,12 @@ async def assess_cognitive_state(metrics: SessionMetrics):
     intervention_needed, recommended_action = determine_intervention(
         cognitive_load, emotional_state, fatigue_index
     )
-    confidence = 0.85 if len(attention_data) > 10 else 0.5
+    frames = len(attention_data) if attention_data is not None else 0
+    confidence = 0.85 if frames > 10 else 0.5
+    predicted_load = None
+    if load_predictor is not None:
+        features = [s / 100 for s in calculator.signals(metrics, attention_data)]
+        predicted_load = int(load_predictor.step(metrics.session_id, features))
 
     return CognitiveAssessment(
         session_id=metrics.session_id,
@@ -224,28 +275,93 @@ async def assess_cognitive_state(metrics: SessionMetrics):
         intervention_needed=intervention_needed,
         recommended_action=recommended_action,
         confidence=confidence,
+        predicted_load=predicted_load,
+    )
+
+
+@app.post("/v1/assess:batch", response_model=BatchAssessmentResponse)
+async def assess_cognitive_state_batch(request: BatchAssessmentRequest):
+    """Assess many sessions in one vectorised pass; same rules as ``/v1/assess``."""
+    sessions = request.sessions
+    if len(sessions) > MAX_ASSESS_BATCH:
+        raise HTTPException(status_code=413, detail=f"at most {MAX_ASSESS_BATCH} sessions per batch")
+    n = len(sessions)
+    poor = np.zeros(n, dtype=np.int64)
+    frames = np.zeros(n, dtype=np.int64)
+    for i, m in enumerate(sessions):
+        ring = attention_buffer.get(m.session_id)
+        if ring is not None:
+            poor[i], frames[i] = ring.poor_count, len(ring)
+    result = assess_batch(
+        np.array([m.hesitation_ms for m in sessions], dtype=np.int64),
+        np.array([m.error_rate for m in sessions], dtype=np.float64),
+        np.array([m.reread_count for m in sessions], dtype=np.int64),
+        np.array([m.session_duration_minutes for m in sessions], dtype=np.int64),
+        poor,
+        frames,
+        calculator.weights,
+    )
+    signals = result.pop("signals")
+    if load_predictor is not None:
+        predicted = load_predictor.step_many([m.session_id for m in sessions], signals / 100)
+        result["predicted_load"] = predicted.astype(np.int64)
+    columns = {k: v.tolist() for k, v in result.items()}
+    now = datetime.utcnow()
+    return BatchAssessmentResponse(
+        assessments=[
+            CognitiveAssessment(
+                session_id=m.session_id,
+                timestamp=now,
+                **{k: columns[k][i] for k in columns},
+            )
+            for i, m in enumerate(sessions)
+        ]
     )
 
 
 @app.websocket("/v1/attention/stream/{session_id}")
 async def attention_stream(websocket: WebSocket, session_id: str):
-    """WebSocket for streaming attention frames from the frontend."""
+    """WebSocket for streaming attention frames from the frontend.
+
+    Accepts one JSON frame, a JSON array of frames, or a packed binary batch
+    (see ``core.attention_stream``). Acks are coalesced and carry the frame
+    rate the client should sample at.
+    """
     await websocket.accept()
-    if session_id not in attention_buffer:
-        attention_buffer[session_id] = []
+    ring = attention_buffer.setdefault(session_id, AttentionRing(MAX_BUFFER_SIZE))
+    acks = AckPolicy(ACK_EVERY_FRAMES, ACK_INTERVAL_S)
+    advisor = SampleRateAdvisor(SAMPLE_MAX_HZ, SAMPLE_MIN_HZ)
+    received = 0
     try:
         while True:
-            data = await websocket.receive_json()
-            frame = AttentionFrame(session_id=session_id, **data)
-            attention_buffer[session_id].append(frame)
-            if len(attention_buffer[session_id]) > MAX_BUFFER_SIZE:
-                attention_buffer[session_id].pop(0)
-            await websocket.send_json(
-                {
-                    "status": "received",
-                    "buffer_size": len(attention_buffer[session_id]),
-                }
-            )
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                if message.get("bytes") is not None:
+                    columns = decode_binary_frames(message["bytes"])
+                else:
+                    data = json.loads(message["text"])
+                    items = data if isinstance(data, list) else [data]
+                    columns = frames_to_columns(
+                        [AttentionFrame(session_id=session_id, **item) for item in items]
+                    )
+            except (TypeError, ValueError) as exc:  # includes pydantic ValidationError
+                await websocket.send_json({"status": "error", "detail": str(exc)})
+                continue
+            ring.extend(**columns)
+            n = len(columns["timestamp"])
+            received += n
+            if acks.received(n):
+                share = ring.poor_count / len(ring) if len(ring) else 0.0
+                await websocket.send_json(
+                    {
+                        "status": "received",
+                        "frames_received": received,
+                        "buffer_size": len(ring),
+                        "sample_hz": advisor.update(share),
+                    }
+                )
     except WebSocketDisconnect:
         attention_buffer.pop(session_id, None)
 
@@ -254,14 +370,13 @@ async def attention_stream(websocket: WebSocket, session_id: str):
 async def get_attention_metrics(session_id: str):
     if session_id not in attention_buffer:
         return {"session_id": session_id, "frames_collected": 0, "attention_score": None}
-    frames = attention_buffer[session_id]
-    total = len(frames)
-    with_face = sum(1 for f in frames if f.face_detected)
+    ring = attention_buffer[session_id]
+    total = len(ring)
     return {
         "session_id": session_id,
         "frames_collected": total,
-        "attention_score": int(with_face / total * 100) if total else 0,
-        "face_detection_rate": with_face / total if total else 0,
+        "attention_score": int(ring.face_count / total * 100) if total else 0,
+        "face_detection_rate": ring.face_detection_rate(),
     }
 
 
@@ -272,7 +387,18 @@ async def get_attention_metrics(session_id: str):
 
 @app.on_event("startup")
 async def startup_event():
+    global load_predictor
     print("🧠 Cognitive Guardian starting up...")
+    model_path = os.getenv("LOAD_MODEL_PATH")
+    if model_path:
+        try:
+            load_predictor = StreamingLoadPredictor.from_path(
+                model_path,
+                max_sessions=int(os.getenv("LOAD_STATE_MAX_SESSIONS", "10000")),
+                idle_ttl_s=float(os.getenv("LOAD_STATE_IDLE_S", "1800")),
+            )
+        except Exception as exc:
+            print(f"⚠️  Load LSTM unavailable ({exc}); predicted_load disabled")
     print("✅ Cognitive Guardian ready!")
 
 
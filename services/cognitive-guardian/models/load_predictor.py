@@ -1,11 +1,13 @@
 """
-Cognitive Load LSTM Predictor – placeholder for the trained LSTM model
-that predicts cognitive load trajectory.
+Cognitive Load LSTM Predictor – forecasts the cognitive load trajectory
+with the trained LSTM (NumPy inference, see streaming_lstm.py).
 """
 
-from typing import List
+from typing import List, Sequence, Union
 import numpy as np
 
+from .streaming_lstm import NumpyLSTM, load_lstm_state_dict
+
 
 class LoadPredictor:
     """
@@ -14,7 +16,9 @@ class LoadPredictor:
     Takes a sequence of recent cognitive load readings and predicts
     the next N values so the system can intervene proactively.
 
-    Model will be trained via ml/training/cognitive_load_lstm/.
+    Model is trained via ml/training/cognitive_load_lstm/. For per-reading
+    updates of live sessions use ``StreamingLoadPredictor`` instead, which
+    keeps LSTM state rather than re-running the window.
     """
 
     def __init__(self, model_path: str | None = None):
@@ -23,20 +27,19 @@ class LoadPredictor:
             self._load(model_path)
 
     def _load(self, path: str):
-        """Load a trained PyTorch LSTM model."""
+        """Load trained LSTM weights (``.npz`` export, or ``.pt`` state_dict if torch is installed)."""
         try:
-            import torch
-            self._model = torch.load(path, map_location="cpu")
-            self._model.eval()
+            self._model = NumpyLSTM(load_lstm_state_dict(path))
         except Exception:
             self._model = None
 
-    def predict(self, history: List[int], horizon: int = 5) -> List[int]:
+    def predict(self, history: Sequence[Union[int, Sequence[float]]], horizon: int = 5) -> List[int]:
         """
         Predict future cognitive load from recent history.
 
         Args:
-            history: list of recent cognitive load readings (0-100)
+            history: list of recent cognitive load readings (0-100), or of
+                signal rows in the model's feature order (each 0-1)
             horizon: how many future steps to predict
 
         Returns:
@@ -54,5 +57,19 @@ class LoadPredictor:
                 predictions.append(int(last))
             return predictions
 
-        # TODO: real inference with self._model
-        return [50] * horizon
+        if not len(history):
+            return [50] * horizon
+        rows = np.asarray(history, dtype=np.float32)
+        if rows.ndim == 1:
+            # a bare load reading becomes a uniform signal row (the model's
+            # training target is the mean signal x 100)
+            rows = np.repeat(rows[:, None] / 100, self._model.input_size, axis=1)
+        h, c = self._model.zero_state(1)
+        for row in rows:
+            y, h, c = self._model.step(row[None], h, c)
+        predictions = []
+        for _ in range(horizon):  # autoregressive: feed each forecast back in
+            load = float(np.clip(y[0], 0, 100))
+            predictions.append(int(load))
+            y, h, c = self._model.step(np.full((1, self._model.input_size), load / 100, np.float32), h, c)
+        return predictions
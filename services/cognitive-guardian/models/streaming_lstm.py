@@ -0,0 +1,213 @@
+"""
+Streaming cognitive load LSTM – NumPy inference with per-session state.
+
+``NumpyLSTM`` runs the ``CogLoadLSTM`` from ml/training/cognitive_load_lstm
+(stacked ``nn.LSTM`` + ``nn.Linear`` head) from its state_dict, so CPU pods
+do not need torch. ``StreamingLoadPredictor`` keeps each session's (h, c)
+between readings and advances every session in a batch with one forward
+step instead of re-running the history window.
+"""
+
+import re
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+_LAYER_KEY = re.compile(r"^lstm\.weight_ih_l(\d+)$")
+
+
+def load_lstm_state_dict(path: str) -> Dict[str, np.ndarray]:
+    """Weights from an ``.npz`` export, or a torch ``state_dict`` file when torch is installed."""
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    import torch  # only needed for .pt files
+
+    state = torch.load(path, map_location="cpu")
+    return {k: v.detach().cpu().numpy() for k, v in state.items()}
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.tanh(0.5 * x))  # no overflow for large |x|
+
+
+class NumpyLSTM:
+    """Stacked LSTM (PyTorch gate order i, f, g, o) with a linear head, float32."""
+
+    def __init__(self, state: Mapping[str, np.ndarray]):
+        layers = sorted(int(m.group(1)) for m in map(_LAYER_KEY.match, state) if m)
+        if not layers:
+            raise ValueError("state_dict has no lstm.weight_ih_l* tensors")
+        self.num_layers = len(layers)
+        self.hidden_size = int(np.asarray(state["lstm.weight_hh_l0"]).shape[1])
+        self.input_size = int(np.asarray(state["lstm.weight_ih_l0"]).shape[1])
+        self._w: List[np.ndarray] = []  # per layer: [W_ih^T; W_hh^T], shape (in + H, 4H)
+        self._b: List[np.ndarray] = []  # per layer: b_ih + b_hh
+        for k in range(self.num_layers):
+            w_ih = np.asarray(state[f"lstm.weight_ih_l{k}"], dtype=np.float32)
+            w_hh = np.asarray(state[f"lstm.weight_hh_l{k}"], dtype=np.float32)
+            self._w.append(np.ascontiguousarray(np.concatenate([w_ih.T, w_hh.T], axis=0)))
+            b = np.zeros(4 * self.hidden_size, dtype=np.float32)
+            for name in (f"lstm.bias_ih_l{k}", f"lstm.bias_hh_l{k}"):
+                if name in state:
+                    b += np.asarray(state[name], dtype=np.float32)
+            self._b.append(b)
+        self._fc_w = np.asarray(state["fc.weight"], dtype=np.float32).T  # (H, 1)
+        self._fc_b = np.asarray(state.get("fc.bias", np.zeros(1)), dtype=np.float32)
+
+    def zero_state(self, batch: int) -> Tuple[np.ndarray, np.ndarray]:
+        shape = (self.num_layers, batch, self.hidden_size)
+        return np.zeros(shape, dtype=np.float32), np.zeros(shape, dtype=np.float32)
+
+    def step(self, x: np.ndarray, h: np.ndarray, c: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """One time step for a batch: x (B, input), h / c (layers, B, H) -> (y (B,), h', c')."""
+        H = self.hidden_size
+        out = np.asarray(x, dtype=np.float32)
+        h_new, c_new = np.empty_like(h), np.empty_like(c)
+        for k in range(self.num_layers):
+            gates = np.concatenate([out, h[k]], axis=1) @ self._w[k] + self._b[k]
+            i = _sigmoid(gates[:, :H])
+            f = _sigmoid(gates[:, H:2 * H])
+            g = np.tanh(gates[:, 2 * H:3 * H])
+            o = _sigmoid(gates[:, 3 * H:])
+            c_new[k] = f * c[k] + i * g
+            h_new[k] = o * np.tanh(c_new[k])
+            out = h_new[k]
+        return (out @ self._fc_w + self._fc_b)[:, 0], h_new, c_new
+
+    def run(self, seq: np.ndarray) -> np.ndarray:
+        """Whole sequences (B, T, input) from a zero state; the head output after each step, (B, T)."""
+        seq = np.asarray(seq, dtype=np.float32)
+        h, c = self.zero_state(seq.shape[0])
+        ys = []
+        for t in range(seq.shape[1]):
+            y, h, c = self.step(seq[:, t], h, c)
+            ys.append(y)
+        return np.stack(ys, axis=1) if ys else np.zeros((seq.shape[0], 0), dtype=np.float32)
+
+
+class SessionStateStore:
+    """
+    (h, c) for many sessions in two preallocated float32 slabs of shape
+    (layers, slots, H), grown by doubling up to ``max_sessions``. Sessions
+    idle for ``idle_ttl_s`` are evicted; when full, the least recently
+    stepped session gives up its slot.
+    """
+
+    def __init__(self, num_layers: int, hidden_size: int, max_sessions: int = 10000, idle_ttl_s: float = 1800.0):
+        self.num_layers = num_layers
+        self.hidden_size = hidden_size
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self.slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self.h = np.zeros((num_layers, 0, hidden_size), dtype=np.float32)
+        self.c = np.zeros_like(self.h)
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self._grow(min(64, max_sessions))
+        self._last_sweep = time.monotonic()
+
+    def _grow(self, capacity: int):
+        start = self.capacity
+        for name in ("h", "c"):
+            old = getattr(self, name)
+            new = np.zeros((self.num_layers, capacity, self.hidden_size), dtype=np.float32)
+            new[:, :start] = old
+            setattr(self, name, new)
+        self.last_seen = np.concatenate([self.last_seen, np.zeros(capacity - start)])
+        self._free.extend(range(capacity - 1, start - 1, -1))  # pop() hands out low slots first
+
+    @property
+    def capacity(self) -> int:
+        return self.h.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.slots
+
+    def release(self, session_id: str):
+        slot = self.slots.pop(session_id, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        stale = [s for s, slot in self.slots.items() if now - self.last_seen[slot] > self.idle_ttl_s]
+        for s in stale:
+            self.release(s)
+        return len(stale)
+
+    def acquire(self, session_ids: Sequence[str], now: float) -> np.ndarray:
+        """Slot per session, allocating zeroed state for new ones; marks them as used at ``now``."""
+        if now - self._last_sweep > self.idle_ttl_s / 10:
+            self.evict_idle(now)
+        slots = np.empty(len(session_ids), dtype=np.int64)
+        batch = set(session_ids)
+        for j, s in enumerate(session_ids):
+            slot = self.slots.get(s)
+            if slot is None:
+                slot = self._new_slot(batch)
+                self.slots[s] = slot
+                self.h[:, slot] = 0.0
+                self.c[:, slot] = 0.0
+            self.last_seen[slot] = now
+            slots[j] = slot
+        return slots
+
+    def _new_slot(self, keep: set) -> int:
+        if not self._free and self.capacity < self.max_sessions:
+            self._grow(min(self.capacity * 2, self.max_sessions))
+        if not self._free:
+            candidates = [(self.last_seen[slot], s) for s, slot in self.slots.items() if s not in keep]
+            if not candidates:
+                raise ValueError(f"batch has more than max_sessions={self.max_sessions} distinct sessions")
+            self.release(min(candidates)[1])
+        return self._free.pop()
+
+
+class StreamingLoadPredictor:
+    """Advances per-session LSTM state one reading at a time, batched across sessions."""
+
+    def __init__(self, lstm: NumpyLSTM, max_sessions: int = 10000, idle_ttl_s: float = 1800.0):
+        self.lstm = lstm
+        self.store = SessionStateStore(lstm.num_layers, lstm.hidden_size, max_sessions, idle_ttl_s)
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs) -> "StreamingLoadPredictor":
+        return cls(NumpyLSTM(load_lstm_state_dict(path)), **kwargs)
+
+    def step_many(self, session_ids: Sequence[str], features: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """
+        Feed one reading per entry (``features`` is (B, input)) and return the
+        predicted next load (0-100) per entry. A session listed more than once
+        is advanced once per occurrence, in order.
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(len(session_ids), self.lstm.input_size)
+        now = time.monotonic() if now is None else now
+        out = np.empty(len(session_ids), dtype=np.float32)
+        seen: Dict[str, int] = {}
+        rounds: List[List[int]] = []
+        for j, s in enumerate(session_ids):
+            r = seen.get(s, 0)
+            seen[s] = r + 1
+            if r == len(rounds):
+                rounds.append([])
+            rounds[r].append(j)
+        for rows in rounds:  # one forward step per round; usually a single round
+            ids = [session_ids[j] for j in rows]
+            slots = self.store.acquire(ids, now)
+            y, h, c = self.lstm.step(features[rows], self.store.h[:, slots], self.store.c[:, slots])
+            self.store.h[:, slots] = h
+            self.store.c[:, slots] = c
+            out[rows] = y
+        return np.clip(out, 0, 100)
+
+    def step(self, session_id: str, features: Sequence[float]) -> float:
+        return float(self.step_many([session_id], np.asarray([features]))[0])
+
+    def reset(self, session_id: str):
+        self.store.release(session_id)
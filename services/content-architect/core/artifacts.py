@@ -0,0 +1,215 @@
+"""Content-addressed storage and HTTP serving for generated images and audio."""
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+_NAME = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]{1,8})?$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK = 256 * 1024
+
+
+class ArtifactStore:
+    """
+    Files are named by the SHA-256 of their bytes plus an extension and
+    sharded as ``root/ab/cd/<digest><ext>``, so identical artifacts are stored
+    once and a name never changes meaning. Writes go to a temp file in the
+    target directory and are renamed into place. Once the store exceeds
+    ``max_bytes`` the least recently served artifacts are deleted.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # name -> size, oldest use first
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name[2:4], name)
+
+    @staticmethod
+    def url(name: str) -> str:
+        return f"/generated/{name}"
+
+    def load(self):
+        """Index what is already on disk, least recently accessed first."""
+        found = []
+        for dirpath, _, files in os.walk(self.root):
+            for f in files:
+                if _NAME.match(f):
+                    st = os.stat(os.path.join(dirpath, f))
+                    found.append((st.st_atime, f, st.st_size))
+        with self._lock:
+            for _, name, size in sorted(found):
+                self._entries[name] = size
+                self.total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(name))  # open readers keep their descriptor
+            except FileNotFoundError:
+                pass
+
+    def _commit(self, name: str, size: int, write) -> str:
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                return name
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = size
+                self.total_bytes += size
+            self._entries.move_to_end(name)
+            self._evict()
+        return name
+
+    def put(self, data: bytes, ext: str = "") -> str:
+        """Store bytes; returns the artifact name (``<sha256><ext>``)."""
+        name = hashlib.sha256(data).hexdigest() + ext.lower()
+
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+        return self._commit(name, len(data), write)
+
+    def put_file(self, src: str, ext: str = "") -> str:
+        """Store a file produced elsewhere (e.g. a TTS render), hashing it in chunks."""
+        digest = hashlib.sha256()
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        size = os.path.getsize(src)
+
+        def write(tmp):
+            shutil.copyfile(src, tmp)  # kernel-side copy (sendfile / copy_file_range) on Linux
+            with open(tmp, "rb") as f:
+                os.fsync(f.fileno())
+
+        return self._commit(digest.hexdigest() + ext.lower(), size, write)
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Path of a stored artifact (marking it recently used), or None."""
+        if not _NAME.match(name):
+            return None
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        return self._path(name)
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single ``bytes=`` range; None if unsatisfiable or unsupported."""
+    m = _RANGE.match(value.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    if not m.group(1):  # suffix: last N bytes
+        n = int(m.group(2))
+        return (max(0, size - n), size - 1) if n and size else None
+    start = int(m.group(1))
+    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    return (start, end) if start <= end else None
+
+
+class ArtifactResponse(Response):
+    """
+    Serves one stored artifact with a strong ETag (its digest), immutable
+    caching, ``If-None-Match`` and single-range ``Range`` / ``If-Range``.
+    The body goes out as ``os.pread`` chunks read off the event loop (uvicorn
+    offers no zero-copy ASGI extension); put a CDN or proxy cache in front for
+    hot artifacts, which the immutable caching headers allow.
+    """
+
+    def __init__(self, path: str, name: str):
+        super().__init__(status_code=200)
+        self.path = path
+        self.name = name
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        req = Headers(scope=scope)
+        etag = f'"{self.name.split(".")[0]}"'
+        headers = {
+            "etag": etag,
+            "accept-ranges": "bytes",
+            "cache-control": "public, max-age=31536000, immutable",
+        }
+        if etag in [t.strip() for t in req.get("if-none-match", "").split(",")]:
+            await self._send(send, 304, headers)
+            return
+
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:  # evicted between lookup and open
+            await self._send(send, 404, {})
+            return
+        try:
+            size = os.fstat(fd).st_size
+            start, end, status = 0, size - 1, 200
+            rng = req.get("range")
+            if rng and req.get("if-range", etag) == etag:
+                parsed = _parse_range(rng, size)
+                if parsed is None and "," not in rng:  # multi-range requests get the whole file
+                    headers["content-range"] = f"bytes */{size}"
+                    await self._send(send, 416, headers)
+                    return
+                if parsed is not None:
+                    start, end, status = parsed[0], parsed[1], 206
+                    headers["content-range"] = f"bytes {start}-{end}/{size}"
+            length = max(0, end - start + 1)
+            headers["content-type"] = mimetypes.guess_type(self.name)[0] or "application/octet-stream"
+            headers["content-length"] = str(length)
+            await self._send(send, status, headers, more_body=scope["method"] != "HEAD" and length > 0)
+            if scope["method"] == "HEAD" or length == 0:
+                return
+            offset, remaining = start, length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(os.pread, fd, min(CHUNK, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:  # file shrank underneath us; close the response
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+    async def _send(self, send: Send, status: int, headers: dict, more_body: bool = False):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        })
+        if not more_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,162 @@
+"""Two-tier cache for generated content blocks, with singleflight."""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter
+
+CONTENT_CACHE_REQUESTS = Counter(
+    "content_architect_content_cache_total",
+    "Generated-content cache lookups by where the block came from",
+    ["result"],
+)
+
+
+def content_key(concept: str, modality: str, difficulty: str, generator: str, model: str, version: str) -> str:
+    """Content address of a block; a new generator model or version yields new keys."""
+    raw = json.dumps([concept.strip(), modality, difficulty, generator, model, version])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ContentCache:
+    """
+    L1: in-process LRU with TTL. L2 (optional): Redis when a client is given,
+    otherwise a directory of JSON files. L2 hits are promoted to L1.
+
+    ``get_or_create`` runs at most one generation per key at a time: concurrent
+    callers await the same task, which is shielded so a caller timing out does
+    not cancel it for the others. Failed generations are not cached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl_s: float = 86400.0,
+        redis: Any = None,
+        disk_dir: Optional[str] = None,
+        prefix: str = "ca:content:",
+    ):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.redis = redis
+        self.disk_dir = disk_dir
+        self.prefix = prefix
+        self._lru: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def tier(self) -> str:
+        return "redis" if self.redis is not None else ("disk" if self.disk_dir else "memory")
+
+    # --- L1 ---
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl_s:
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return entry[1]
+
+    def _put_local(self, key: str, value: Dict[str, Any]):
+        self._lru[key] = (time.monotonic(), value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    # --- L2 ---
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_s:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+
+    async def _get_remote(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self.prefix + key)
+            except Exception:
+                return None  # Redis is an optimisation; treat errors as misses
+            return json.loads(raw) if raw else None
+        if self.disk_dir:
+            return await asyncio.to_thread(self._read_disk, key)
+        return None
+
+    async def _put_remote(self, key: str, value: Dict[str, Any]):
+        if self.redis is not None:
+            try:
+                await self.redis.set(self.prefix + key, json.dumps(value), ex=int(self.ttl_s))
+            except Exception:
+                pass
+        elif self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, value)
+
+    # --- public ---
+    async def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """(value, tier it came from) or (None, "miss")."""
+        value = self._get_local(key)
+        if value is not None:
+            return value, "memory"
+        value = await self._get_remote(key)
+        if value is not None:
+            self._put_local(key, value)
+            return value, self.tier
+        return None, "miss"
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        self._put_local(key, value)
+        await self._put_remote(key, value)
+
+    async def get_or_create(
+        self, key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """Cached value, or the result of ``factory`` shared by all concurrent callers for ``key``."""
+        task = self._inflight.get(key)
+        if task is not None:
+            CONTENT_CACHE_REQUESTS.labels(result="shared").inc()
+            return await asyncio.shield(task), "shared"
+        value, source = await self.get(key)
+        if value is not None:
+            CONTENT_CACHE_REQUESTS.labels(result=source).inc()
+            return value, source
+        task = self._inflight.get(key)  # another caller may have started while we read L2
+        if task is not None:
+            CONTENT_CACHE_REQUESTS.labels(result="shared").inc()
+            return await asyncio.shield(task), "shared"
+
+        async def fill():
+            try:
+                value = await factory()
+                await self.put(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = self._inflight[key] = asyncio.get_running_loop().create_task(fill())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # failure seen even if every caller timed out
+        CONTENT_CACHE_REQUESTS.labels(result="miss").inc()
+        return await asyncio.shield(task), "miss"
+
+    def clear(self):
+        self._lru.clear()
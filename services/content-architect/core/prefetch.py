@@ -0,0 +1,102 @@
+"""Background prefetch of the next concepts' content along a learner's path."""
+
+import asyncio
+import itertools
+from typing import Awaitable, Callable, Hashable, List, Optional, Set, Tuple
+
+from prometheus_client import Counter, Gauge
+
+PREFETCH_JOBS = Counter(
+    "content_architect_prefetch_total",
+    "Prefetch jobs by result",
+    ["result"],
+)
+PREFETCH_QUEUE = Gauge("content_architect_prefetch_queue", "Prefetch jobs waiting to run")
+
+
+class PrefetchScheduler:
+    """
+    Low-priority background generation for concepts a learner is about to reach.
+
+    ``hint`` enqueues the next concepts once mastery of the current one passes
+    ``mastery_threshold``. Jobs are ordered by distance along the path (then
+    by how close the learner is to moving on) and run on ``max_concurrency``
+    workers, the global budget for prefetch work. A worker holds off while
+    ``busy()`` reports foreground load. Results land in the content cache via
+    ``run``, so the learner's later request is a cache hit. The queue is
+    bounded, and a job already queued or running is not queued again.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Hashable], Awaitable[None]],
+        busy: Callable[[], bool] = lambda: False,
+        max_concurrency: int = 2,
+        max_queue: int = 256,
+        lookahead: int = 2,
+        mastery_threshold: float = 0.8,
+        backoff_s: float = 0.05,
+    ):
+        self._run = run
+        self._busy = busy
+        self.max_concurrency = max_concurrency
+        self.lookahead = lookahead
+        self.mastery_threshold = mastery_threshold
+        self.backoff_s = backoff_s
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue(max_queue)
+        self._pending: Set[Hashable] = set()  # queued or running
+        self._seq = itertools.count()
+        self._workers: List[asyncio.Task] = []
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def close(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def should_prefetch(self, mastery: Optional[float]) -> bool:
+        return mastery is not None and mastery >= self.mastery_threshold
+
+    def hint(self, jobs: List[Hashable], mastery: float) -> int:
+        """Queue jobs (nearest first, at most ``lookahead``); returns how many were accepted."""
+        accepted = 0
+        for rank, job in enumerate(jobs[: self.lookahead]):
+            if job in self._pending:
+                PREFETCH_JOBS.labels(result="duplicate").inc()
+                continue
+            priority: Tuple[int, float, int] = (rank, -mastery, next(self._seq))
+            try:
+                self._queue.put_nowait((priority, job))
+            except asyncio.QueueFull:
+                PREFETCH_JOBS.labels(result="dropped").inc()
+                continue
+            self._pending.add(job)
+            accepted += 1
+            PREFETCH_JOBS.labels(result="queued").inc()
+        PREFETCH_QUEUE.set(self._queue.qsize())
+        return accepted
+
+    async def _worker(self):
+        while True:
+            _, job = await self._queue.get()
+            PREFETCH_QUEUE.set(self._queue.qsize())
+            try:
+                while self._busy():
+                    await asyncio.sleep(self.backoff_s)
+                await self._run(job)
+                PREFETCH_JOBS.labels(result="done").inc()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                PREFETCH_JOBS.labels(result="failed").inc()
+            finally:
+                self._pending.discard(job)
+                self._queue.task_done()
+
+    async def join(self):
+        """Wait until every queued job has run (tests / graceful drain)."""
+        await self._queue.join()
@@ -1,19 +1,78 @@
 """Knowledge Graph integration – Neo4j driver wrapper."""
 
+import asyncio
+import logging
+import time
 from typing import Dict, List, Any, Optional
 
+from .snapshot import GraphSnapshot, snapshot_from_records
+
+logger = logging.getLogger(__name__)
+
+# One round trip for the whole graph. The seed script writes PREREQUISITE_OF
+# edges and older writers PREREQUISITE_FOR; both point from prerequisite to dependent.
+SNAPSHOT_QUERY = (
+    "MATCH (c:Concept) "
+    "RETURN c.name AS name, c.id AS id, c.domain AS domain, c.difficulty AS difficulty, "
+    "[(p:Concept)-[:PREREQUISITE_FOR|PREREQUISITE_OF]->(c) | p.name] AS prerequisites, "
+    "[(c)-[:RELATED_TO]-(r:Concept) | r.name] AS related"
+)
+PREREQUISITES_MANY_QUERY = (
+    "UNWIND $names AS name "
+    "MATCH (c:Concept {name: name})<-[:PREREQUISITE_FOR|PREREQUISITE_OF]-(p:Concept) "
+    "RETURN name, collect(DISTINCT p.name) AS prerequisites"
+)
+RELATED_MANY_QUERY = (
+    "UNWIND $names AS name "
+    "MATCH (c:Concept {name: name})-[:RELATED_TO]-(r:Concept) "
+    "WITH name, collect(DISTINCT r.name) AS related "
+    "RETURN name, related[..$limit] AS related"
+)
+ADD_CONCEPTS_QUERY = (
+    "UNWIND $rows AS row "
+    "MERGE (c:Concept {name: row.name}) "
+    "SET c.domain = row.domain, c.keywords = row.keywords"
+)
+
 
 class KnowledgeGraph:
     """
     Interface to Neo4j for concept relationships, prerequisites,
     and learning path computation.
+
+    Reads are served from a ``GraphSnapshot`` loaded with one bulk query and
+    rebuilt after local writes or once ``snapshot_ttl_s`` has passed. Without
+    a Neo4j driver, or while Neo4j is unreachable, the snapshot comes from
+    ``snapshot_path`` (seed JSON export); failing that the last good snapshot
+    is kept and the load is retried after ``retry_s``.
+    With ``use_snapshot=False`` (graphs too large to hold in memory) reads go to
+    Neo4j; the ``*_many`` variants then cost one UNWIND round trip per call.
     """
 
-    def __init__(self, uri: str = "bolt://neo4j:7687", user: str = "neo4j", password: str = "neurosync"):
+    def __init__(
+        self,
+        uri: str = "bolt://neo4j:7687",
+        user: str = "neo4j",
+        password: str = "neurosync",
+        snapshot_path: Optional[str] = None,
+        snapshot_ttl_s: float = 300.0,
+        use_snapshot: bool = True,
+        write_batch_size: int = 1000,
+        retry_s: float = 30.0,
+    ):
         self._uri = uri
         self._user = user
         self._password = password
         self._driver = None
+        self.snapshot_path = snapshot_path
+        self.snapshot_ttl_s = snapshot_ttl_s
+        self.use_snapshot = use_snapshot
+        self.write_batch_size = write_batch_size
+        self._snapshot: Optional[GraphSnapshot] = None
+        self._snapshot_at = 0.0
+        self._snapshot_lock: Optional[asyncio.Lock] = None
+        self.retry_s = retry_s
+        self._retry_at = 0.0  # no reload attempts before this (after a failed load)
 
     async def connect(self):
         try:
@@ -26,42 +85,104 @@ class KnowledgeGraph:
         if self._driver:
             await self._driver.close()
 
+    # --- snapshot ---
+    async def _load_snapshot(self) -> Optional[GraphSnapshot]:
+        if self._driver:
+            try:
+                records = await self._query(SNAPSHOT_QUERY)
+                return await asyncio.to_thread(snapshot_from_records, records)
+            except Exception as exc:
+                logger.warning("Neo4j snapshot load failed: %s", exc)
+        if self.snapshot_path:
+            try:
+                return await asyncio.to_thread(GraphSnapshot.from_seed_json, self.snapshot_path)
+            except (OSError, ValueError, KeyError) as exc:
+                logger.warning("Snapshot file %s unreadable: %s", self.snapshot_path, exc)
+        return None
+
+    def invalidate_snapshot(self):
+        self._snapshot_at = 0.0
+        self._retry_at = 0.0
+
+    async def snapshot(self) -> Optional[GraphSnapshot]:
+        """Current snapshot, reloading when stale; None when there is no graph source."""
+        if not self.use_snapshot:
+            return None
+        if not self._stale():
+            return self._snapshot
+        if self._snapshot_lock is None:
+            self._snapshot_lock = asyncio.Lock()
+        async with self._snapshot_lock:
+            if self._stale():
+                snap = await self._load_snapshot()
+                if snap is not None:
+                    self._snapshot, self._snapshot_at = snap, time.monotonic()
+                else:  # keep serving the last good snapshot (if any) until the retry
+                    self._retry_at = time.monotonic() + self.retry_s
+        return self._snapshot
+
+    def _stale(self) -> bool:
+        now = time.monotonic()
+        if now < self._retry_at:
+            return False
+        return self._snapshot is None or now - self._snapshot_at >= self.snapshot_ttl_s
+
+    @property
+    def source(self) -> str:
+        return self._snapshot.source if self._snapshot is not None else ("neo4j" if self._driver else "none")
+
+    async def _query(self, query: str, **params) -> List[Dict[str, Any]]:
+        async with self._driver.session() as session:
+            result = await session.run(query, **params)
+            return await result.data()
+
+    # --- reads ---
     async def get_prerequisites(self, concept: str) -> List[str]:
         """Get prerequisite concepts from the graph."""
-        if not self._driver:
-            return []
-        async with self._driver.session() as session:
-            result = await session.run(
-                "MATCH (c:Concept {name: $name})<-[:PREREQUISITE_FOR]-(p:Concept) "
-                "RETURN p.name AS prerequisite",
-                name=concept,
-            )
-            records = await result.data()
-            return [r["prerequisite"] for r in records]
+        return (await self.get_prerequisites_many([concept]))[concept]
+
+    async def get_prerequisites_many(self, concepts: List[str]) -> Dict[str, List[str]]:
+        """Direct prerequisites for every concept, in one snapshot lookup or one UNWIND query."""
+        snap = await self.snapshot()
+        if snap is not None:
+            return {c: snap.prerequisites(c) for c in concepts}
+        out: Dict[str, List[str]] = {c: [] for c in concepts}
+        if self._driver and concepts:
+            for r in await self._query(PREREQUISITES_MANY_QUERY, names=list(dict.fromkeys(concepts))):
+                out[r["name"]] = r["prerequisites"]
+        return out
+
+    async def get_prerequisite_closure(self, concept: str) -> List[str]:
+        """Every transitive prerequisite of concept (unordered)."""
+        snap = await self.snapshot()
+        return snap.closure(concept) if snap is not None else []
 
     async def get_related_concepts(self, concept: str, limit: int = 5) -> List[str]:
         """Get related concepts."""
-        if not self._driver:
-            return []
-        async with self._driver.session() as session:
-            result = await session.run(
-                "MATCH (c:Concept {name: $name})-[:RELATED_TO]-(r:Concept) "
-                "RETURN r.name AS related LIMIT $limit",
-                name=concept,
-                limit=limit,
-            )
-            records = await result.data()
-            return [r["related"] for r in records]
+        return (await self.get_related_many([concept], limit))[concept]
 
+    async def get_related_many(self, concepts: List[str], limit: int = 5) -> Dict[str, List[str]]:
+        """Related concepts (up to ``limit`` each) for every concept, batched like ``get_prerequisites_many``."""
+        snap = await self.snapshot()
+        if snap is not None:
+            return {c: snap.related(c, limit) for c in concepts}
+        out: Dict[str, List[str]] = {c: [] for c in concepts}
+        if self._driver and concepts:
+            for r in await self._query(RELATED_MANY_QUERY, names=list(dict.fromkeys(concepts)), limit=limit):
+                out[r["name"]] = r["related"]
+        return out
+
+    # --- writes ---
     async def add_concept(self, concept: str, domain: str, keywords: List[str] = None):
         """Add a concept node."""
-        if not self._driver:
+        await self.add_concepts_many([{"name": concept, "domain": domain, "keywords": keywords}])
+
+    async def add_concepts_many(self, concepts: List[Dict[str, Any]]):
+        """MERGE ``{name, domain, keywords}`` rows with UNWIND, ``write_batch_size`` rows per query."""
+        if not self._driver or not concepts:
             return
+        rows = [{"name": c["name"], "domain": c.get("domain"), "keywords": c.get("keywords") or []} for c in concepts]
         async with self._driver.session() as session:
-            await session.run(
-                "MERGE (c:Concept {name: $name}) "
-                "SET c.domain = $domain, c.keywords = $keywords",
-                name=concept,
-                domain=domain,
-                keywords=keywords or [],
-            )
+            for i in range(0, len(rows), self.write_batch_size):
+                await session.run(ADD_CONCEPTS_QUERY, rows=rows[i:i + self.write_batch_size])
+        self.invalidate_snapshot()
@@ -1,6 +1,6 @@
 """Prerequisite Planner – computes optimal learning paths via the KG."""
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .knowledge_graph import KnowledgeGraph
 
 
@@ -11,7 +11,28 @@ class PrerequisitePlanner:
         self.kg = kg
 
     async def compute_learning_path(self, target_concept: str) -> List[str]:
-        """Return ordered list of concepts to learn before target_concept."""
-        prereqs = await self.kg.get_prerequisites(target_concept)
-        # TODO: full topological sort using recursive prerequisite lookup
-        return prereqs + [target_concept]
+        """Return ordered list of concepts to learn before target_concept, ending with it.
+
+        Uses the transitive prerequisite closure from the graph snapshot
+        (memoized per target until the snapshot is refreshed).
+        """
+        snap = await self.kg.snapshot()
+        if snap is None:
+            return [target_concept]
+        return snap.learning_path(target_concept)
+
+    async def next_concepts(self, concept: str, goal: Optional[str] = None, limit: int = 2) -> List[str]:
+        """The concepts a learner is likely to open after ``concept``.
+
+        With a goal, the ones following it on the goal's learning path; without
+        one, its direct dependents, easiest first.
+        """
+        snap = await self.kg.snapshot()
+        if snap is None or limit <= 0:
+            return []
+        if goal is not None:
+            path = snap.learning_path(goal)
+            name = snap.names[snap.index[concept]] if concept in snap else concept
+            if name in path:
+                return path[path.index(name) + 1:][:limit]
+        return snap.dependents(concept)[:limit]
@@ -0,0 +1,168 @@
+"""In-memory, read-only snapshot of the concept graph for planning."""
+
+import heapq
+import json
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+def _csr(n: int, edges: Sequence[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR rows keyed by the first element: neighbours of i are indices[indptr[i]:indptr[i + 1]]."""
+    if not edges:
+        return np.zeros(n + 1, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    arr = np.unique(np.asarray(edges, dtype=np.int32), axis=0)  # sorted by row, de-duplicated
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(arr[:, 0], minlength=n), out=indptr[1:])
+    return indptr, np.ascontiguousarray(arr[:, 1])
+
+
+class GraphSnapshot:
+    """
+    Concepts indexed 0..n-1 with CSR adjacency for prerequisite and related
+    edges. Snapshots are immutable: a refresh builds a new one, which also
+    drops the per-target memo of closures and learning paths.
+    """
+
+    def __init__(
+        self,
+        concepts: Sequence[Dict[str, Any]],
+        prerequisites: Iterable[Tuple[str, str]],
+        related: Iterable[Tuple[str, str]] = (),
+        source: str = "memory",
+    ):
+        self.source = source
+        self.names: List[str] = [c["name"] for c in concepts]
+        self.meta: List[Dict[str, Any]] = [dict(c) for c in concepts]
+        self.index: Dict[str, int] = {}
+        for i, c in enumerate(concepts):
+            if c.get("id") is not None:
+                self.index.setdefault(str(c["id"]), i)
+        self.index.update({name: i for i, name in enumerate(self.names)})  # names win over ids
+        n = len(self.names)
+        # prerequisite (src) -> dependent (dst) is stored as dst -> src rows
+        pre = [(self.index[dst], self.index[src]) for src, dst in prerequisites if src in self.index and dst in self.index]
+        rel = [(self.index[a], self.index[b]) for a, b in related if a in self.index and b in self.index]
+        self.pre_indptr, self.pre_indices = _csr(n, pre)
+        self.dep_indptr, self.dep_indices = _csr(n, [(src, dst) for dst, src in pre])
+        self.rel_indptr, self.rel_indices = _csr(n, rel + [(b, a) for a, b in rel])
+        self._difficulty = np.asarray([float(c.get("difficulty") or 0.5) for c in concepts], dtype=np.float32)
+        self._closure: Dict[int, np.ndarray] = {}
+        self._paths: Dict[int, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, concept: str) -> bool:
+        return concept in self.index
+
+    @classmethod
+    def from_seed_json(cls, path: str) -> "GraphSnapshot":
+        """Load the ``seed_knowledge_graph.py --export-json`` format (edges reference concept ids)."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        concepts = data.get("concepts", [])
+        by_id = {c.get("id", c["name"]): c["name"] for c in concepts}
+        prereqs = [(by_id.get(s, s), by_id.get(d, d)) for s, d in data.get("prerequisites", [])]
+        related = [(by_id.get(a, a), by_id.get(b, b)) for a, b in data.get("related", [])]
+        return cls(concepts, prereqs, related, source="file")
+
+    def _row(self, indptr: np.ndarray, indices: np.ndarray, i: int) -> np.ndarray:
+        return indices[indptr[i]:indptr[i + 1]]
+
+    def prerequisites(self, concept: str) -> List[str]:
+        i = self.index.get(concept)
+        return [] if i is None else [self.names[j] for j in self._row(self.pre_indptr, self.pre_indices, i)]
+
+    def dependents(self, concept: str) -> List[str]:
+        """Concepts that list concept as a direct prerequisite, easiest first."""
+        i = self.index.get(concept)
+        if i is None:
+            return []
+        rows = self._row(self.dep_indptr, self.dep_indices, i)
+        return [self.names[j] for j in sorted(rows.tolist(), key=lambda j: (float(self._difficulty[j]), self.names[j]))]
+
+    def related(self, concept: str, limit: int = 5) -> List[str]:
+        i = self.index.get(concept)
+        return [] if i is None else [self.names[j] for j in self._row(self.rel_indptr, self.rel_indices, i)[:limit]]
+
+    def _closure_of(self, i: int) -> np.ndarray:
+        """Indices of every transitive prerequisite of concept i (excluding i)."""
+        cached = self._closure.get(i)
+        if cached is not None:
+            return cached
+        seen = np.zeros(len(self.names), dtype=bool)
+        stack = [i]
+        while stack:
+            j = stack.pop()
+            for k in self._row(self.pre_indptr, self.pre_indices, j):
+                if not seen[k]:
+                    seen[k] = True
+                    memo = self._closure.get(int(k))
+                    if memo is not None:
+                        seen[memo] = True  # reuse an already closed sub-graph
+                    else:
+                        stack.append(int(k))
+        seen[i] = False  # only reachable again through a cycle
+        result = np.flatnonzero(seen)
+        self._closure[i] = result
+        return result
+
+    def closure(self, concept: str) -> List[str]:
+        i = self.index.get(concept)
+        return [] if i is None else [self.names[j] for j in self._closure_of(i)]
+
+    def learning_path(self, concept: str) -> List[str]:
+        """Every transitive prerequisite in dependency order, then the concept itself.
+
+        Ties are broken by difficulty, then name, so paths are stable. Concepts
+        on a prerequisite cycle are emitted easiest-first once nothing else is ready.
+        """
+        i = self.index.get(concept)
+        if i is None:
+            return [concept]
+        cached = self._paths.get(i)
+        if cached is not None:
+            return list(cached)
+        nodes = set(self._closure_of(i).tolist()) | {i}
+        indeg = {j: sum(1 for k in self._row(self.pre_indptr, self.pre_indices, j) if int(k) in nodes) for j in nodes}
+        dependents: Dict[int, List[int]] = {j: [] for j in nodes}
+        for j in nodes:
+            for k in self._row(self.pre_indptr, self.pre_indices, j):
+                if int(k) in nodes:
+                    dependents[int(k)].append(j)
+        key = lambda j: (j == i, float(self._difficulty[j]), self.names[j], j)  # noqa: E731
+        ready = [key(j) for j in nodes if indeg[j] == 0]
+        heapq.heapify(ready)
+        order: List[int] = []
+        while len(order) < len(nodes):
+            if not ready:  # cycle: release the easiest remaining concept
+                j = min((j for j in nodes if indeg[j] > 0), key=key)
+                indeg[j] = 0
+                heapq.heappush(ready, key(j))
+            j = heapq.heappop(ready)[-1]
+            if indeg[j] < 0:
+                continue
+            indeg[j] = -1
+            order.append(j)
+            for d in dependents[j]:
+                if indeg[d] > 0:
+                    indeg[d] -= 1
+                    if indeg[d] == 0:
+                        heapq.heappush(ready, key(d))
+        path = [self.names[j] for j in order]
+        self._paths[i] = path
+        return list(path)
+
+
+def snapshot_from_records(records: Sequence[Dict[str, Any]], source: str = "neo4j") -> GraphSnapshot:
+    """Build from rows of the bulk snapshot query (one row per concept with neighbour name lists)."""
+    concepts, prereqs, related = [], [], []
+    for r in records:
+        if not r.get("name"):
+            continue
+        concepts.append({k: r.get(k) for k in ("name", "id", "domain", "difficulty")})
+        prereqs.extend((p, r["name"]) for p in r.get("prerequisites") or [])
+        related.extend((r["name"], x) for x in r.get("related") or [] if r["name"] < x)
+    return GraphSnapshot(concepts, prereqs, related, source=source)
+
@@ -3,14 +3,48 @@ NeuroSync AI – Content Architect Agent
 Multi-modal content generation with knowledge graph integration.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Set, Tuple
+import asyncio
+import html
+import io
+import json
+import logging
+import os
+import time
 import uvicorn
+import wave
 from datetime import datetime
 from enum import Enum
 
+from core.artifacts import ArtifactResponse, ArtifactStore
+from core.content_cache import ContentCache, content_key
+from core.prefetch import PrefetchScheduler
+from graph.knowledge_graph import KnowledgeGraph
+from graph.prerequisite_planner import PrerequisitePlanner
+from rag.embedding import EmbeddingService
+from rag.reranker import Reranker
+from rag.retrieval import Retriever
+from rag.vector_store import VectorStore
+
+logger = logging.getLogger("content_architect")
+
+BLOCK_LATENCY = Histogram(
+    "content_architect_block_latency_ms",
+    "Per-block generation latency (ms)",
+    ["modality", "outcome", "source"],
+    buckets=(5, 25, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000),
+)
+
+try:  # Redis tier of the content cache is optional
+    from redis import asyncio as aioredis  # type: ignore
+except Exception:  # pragma: no cover
+    aioredis = None  # type: ignore
+
 app = FastAPI(
     title="Content Architect Agent",
     description="Multi-modal content generation with knowledge graph planning",
@@ -55,9 +89,15 @@ class ContentBlock(BaseModel):
     metadata: Dict[str, Any] = {}
 
 
+class BlockError(BaseModel):
+    modality: ContentModality
+    error: str
+
+
 class ContentResponse(BaseModel):
     concept: str
     blocks: List[ContentBlock]
+    errors: List[BlockError] = []
     prerequisites: List[str] = []
     related_concepts: List[str] = []
     difficulty: str = "intermediate"
@@ -65,6 +105,16 @@ class ContentResponse(BaseModel):
     generated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class IndexDocument(BaseModel):
+    doc_id: str
+    text: str
+    metadata: Dict[str, Any] = {}
+
+
+class IndexRequest(BaseModel):
+    documents: List[IndexDocument]
+
+
 class ConceptNode(BaseModel):
     """Knowledge graph node."""
     concept_id: str
@@ -93,6 +143,44 @@ class ContentEngine:
         (80, 100): [ContentModality.VOICE],
     }
 
+    # seconds per modality (overridable per engine); a block that overruns is dropped from the response
+    BLOCK_TIMEOUTS_S = {
+        ContentModality.TEXT: float(os.getenv("CONTENT_TEXT_TIMEOUT_S", "20")),
+        ContentModality.IMAGE: float(os.getenv("CONTENT_IMAGE_TIMEOUT_S", "60")),
+        ContentModality.VOICE: float(os.getenv("CONTENT_VOICE_TIMEOUT_S", "45")),
+    }
+    DEFAULT_BLOCK_TIMEOUT_S = float(os.getenv("CONTENT_BLOCK_TIMEOUT_S", "30"))
+
+    # (generator, model, version) per modality; part of the cache key, so bumping
+    # a model or version invalidates that modality's cached blocks
+    GENERATORS = {
+        ContentModality.TEXT: ("text_generator", "gpt-4", "2"),
+        ContentModality.IMAGE: ("image_generator", "sdxl", "1"),
+        ContentModality.VOICE: ("voice_generator", "tts-1", "1"),
+    }
+    DEFAULT_GENERATOR = ("interactive_generator", "", "1")
+    CACHE_VERSION = os.getenv("CONTENT_CACHE_VERSION", "1")
+    PLACEHOLDER_AUDIO_S = 2
+    CONTEXT_CHUNKS = int(os.getenv("CONTENT_CONTEXT_CHUNKS", "3"))
+
+    def __init__(
+        self,
+        cache: Optional[ContentCache] = None,
+        planner: Optional[PrerequisitePlanner] = None,
+        artifacts: Optional[ArtifactStore] = None,
+        retriever: Optional[Retriever] = None,
+        block_timeouts: Optional[Dict[ContentModality, float]] = None,
+    ):
+        self.cache = cache if cache is not None else ContentCache()
+        self.block_timeouts = {**self.BLOCK_TIMEOUTS_S, **(block_timeouts or {})}
+        self.planner = planner  # fills ContentResponse.prerequisites from the knowledge graph
+        self.retriever = retriever  # grounding chunks for text blocks
+        # image / audio bytes live here; blocks carry their content-addressed /generated/ URL
+        self.artifacts = artifacts if artifacts is not None else ArtifactStore(
+            os.getenv("ARTIFACT_DIR", "/tmp/content-architect/artifacts")
+        )
+        self.active = 0  # foreground generations in flight (prefetch backs off while busy)
+
     def select_modalities(
         self,
         cognitive_load: int,
@@ -112,21 +200,131 @@ class ContentEngine:
             request.cognitive_load, request.preferred_modality
         )
 
-        blocks = []
-        for modality in modalities:
-            block = await self._generate_block(request.concept, modality, request.difficulty_level)
-            blocks.append(block)
-
-        # TODO: Query Neo4j for prerequisites and related concepts
+        # blocks are independent: latency is the slowest generator, not the sum
+        self.active += 1
+        try:
+            results = await asyncio.gather(
+                *(self._timed_block(request.concept, m, request.difficulty_level) for m in modalities)
+            )
+        finally:
+            self.active -= 1
+        blocks = [block for block, _ in results if block is not None]
+        errors = [error for _, error in results if error is not None]
+        if not blocks:
+            raise RuntimeError("; ".join(f"{e.modality.value}: {e.error}" for e in errors))
+
+        return await self._response(request, blocks, errors)
+
+    async def _response(
+        self, request: ContentRequest, blocks: List[ContentBlock], errors: List[BlockError]
+    ) -> ContentResponse:
+        prerequisites = []
+        if self.planner is not None:
+            prerequisites = (await self.planner.compute_learning_path(request.concept))[:-1]
         return ContentResponse(
             concept=request.concept,
             blocks=blocks,
-            prerequisites=[],
+            errors=errors,
+            prerequisites=prerequisites,
             related_concepts=[],
             difficulty=request.difficulty_level or "intermediate",
             estimated_time_minutes=self._estimate_time(blocks),
         )
 
+    async def generate_stream(self, request: ContentRequest) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ("block" | "error", payload) as blocks finish, then ("summary", response sans blocks).
+
+        All generators start at once; a text block is always emitted first so
+        the learner can start reading while images and audio are still rendering.
+        """
+        modalities = self.select_modalities(
+            request.cognitive_load, request.preferred_modality
+        )
+        tasks = [
+            asyncio.create_task(self._timed_block(request.concept, m, request.difficulty_level))
+            for m in modalities
+        ]
+        first = [t for m, t in zip(modalities, tasks) if m == ContentModality.TEXT]
+        blocks, errors = [], []
+        self.active += 1
+        try:
+            for fut in first + list(asyncio.as_completed([t for t in tasks if t not in first])):
+                block, error = await fut
+                if block is not None:
+                    blocks.append(block)
+                    yield "block", block.model_dump(mode="json")
+                else:
+                    errors.append(error)
+                    yield "error", error.model_dump(mode="json")
+        finally:
+            self.active -= 1
+            for t in tasks:
+                t.cancel()  # client went away; shared cache fills carry on
+        summary = (await self._response(request, blocks, errors)).model_dump(mode="json", exclude={"blocks"})
+        yield "summary", summary
+
+    async def prefetch(self, job: Tuple[str, Optional[str], Tuple[ContentModality, ...]]):
+        """Warm the content cache for (concept, difficulty, modalities); raises if any block failed."""
+        concept, difficulty, modalities = job
+        results = await asyncio.gather(
+            *(self._timed_block(concept, m, difficulty, source="prefetch") for m in modalities)
+        )
+        errors = [e for _, e in results if e is not None]
+        if errors:
+            raise RuntimeError("; ".join(f"{e.modality.value}: {e.error}" for e in errors))
+
+    async def _timed_block(
+        self, concept: str, modality: ContentModality, difficulty: str, source: str = "foreground"
+    ) -> Tuple[Optional[ContentBlock], Optional[BlockError]]:
+        """Generate one block under its timeout; failures become a BlockError instead of raising."""
+        timeout = self.block_timeouts.get(modality, self.DEFAULT_BLOCK_TIMEOUT_S)
+        t0 = time.perf_counter()
+        block, error, outcome = None, None, "ok"
+        try:
+            block = await asyncio.wait_for(self._cached_block(concept, modality, difficulty), timeout)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            error = BlockError(modality=modality, error=f"timed out after {timeout:g}s")
+        except Exception as e:
+            outcome = "error"
+            error = BlockError(modality=modality, error=str(e) or type(e).__name__)
+        BLOCK_LATENCY.labels(modality=modality.value, outcome=outcome, source=source).observe(
+            (time.perf_counter() - t0) * 1000
+        )
+        return block, error
+
+    async def _cached_block(
+        self, concept: str, modality: ContentModality, difficulty: str
+    ) -> ContentBlock:
+        generator, model, version = self.GENERATORS.get(modality, self.DEFAULT_GENERATOR)
+        key = content_key(concept, modality.value, difficulty or "", generator, model, f"{version}.{self.CACHE_VERSION}")
+
+        async def generate():
+            block = await self._generate_block(concept, modality, difficulty)
+            return block.model_dump(mode="json")
+
+        data, _ = await self.cache.get_or_create(key, generate)
+        name = data.get("metadata", {}).get("artifact")
+        if name and self.artifacts.lookup(name) is None:
+            # the cached block outlived its file (evicted, or written by another worker): render it again
+            data = await generate()
+            await self.cache.put(key, data)
+        return ContentBlock(**data)
+
+    async def _sources(self, concept: str) -> List[Dict[str, Any]]:
+        """Indexed chunks about the concept; retrieval trouble leaves the block ungrounded."""
+        if self.retriever is None:
+            return []
+        try:
+            hits = await self.retriever.retrieve(concept, top_k=self.CONTEXT_CHUNKS)
+        except Exception as exc:
+            logger.warning("retrieval failed for %r: %s", concept, exc)
+            return []
+        return [{"id": h["id"], "snippet": h["payload"].get("text", "")[:160]} for h in hits]
+
+    async def _store_artifact(self, data: bytes, ext: str) -> str:
+        return await asyncio.to_thread(self.artifacts.put, data, ext)
+
     async def _generate_block(
         self, concept: str, modality: ContentModality, difficulty: str
     ) -> ContentBlock:
@@ -138,28 +336,31 @@ class ContentEngine:
                     "title": f"Understanding {concept}",
                     "body": f"Placeholder text content for {concept} at {difficulty} level.",
                     "format": "markdown",
+                    "sources": await self._sources(concept),
                 },
                 metadata={"generator": "text_generator", "model": "gpt-4"},
             )
         elif modality == ContentModality.IMAGE:
+            name = await self._store_artifact(_placeholder_svg(concept), ".svg")
             return ContentBlock(
                 modality=modality,
                 content={
-                    "url": f"/generated/images/{concept}.png",
+                    "url": ArtifactStore.url(name),
                     "alt_text": f"Diagram illustrating {concept}",
                     "caption": f"Visual representation of {concept}",
                 },
-                metadata={"generator": "image_generator", "model": "sdxl"},
+                metadata={"generator": "image_generator", "model": "sdxl", "artifact": name},
             )
         elif modality == ContentModality.VOICE:
+            name = await self._store_artifact(_silent_wav(self.PLACEHOLDER_AUDIO_S), ".wav")
             return ContentBlock(
                 modality=modality,
                 content={
-                    "url": f"/generated/audio/{concept}.mp3",
+                    "url": ArtifactStore.url(name),
                     "transcript": f"Audio explanation of {concept}",
-                    "duration_seconds": 120,
+                    "duration_seconds": self.PLACEHOLDER_AUDIO_S,
                 },
-                metadata={"generator": "voice_generator", "model": "tts-1"},
+                metadata={"generator": "voice_generator", "model": "tts-1", "artifact": name},
             )
         else:
             return ContentBlock(
@@ -181,7 +382,64 @@ class ContentEngine:
         return sum(time_map.get(b.modality, 5) for b in blocks)
 
 
-content_engine = ContentEngine()
+def _placeholder_svg(concept: str) -> bytes:
+    """Placeholder diagram until an image model is wired in."""
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="640" height="360">'
+        '<rect width="100%" height="100%" fill="#f4f6fb"/>'
+        '<text x="50%" y="50%" text-anchor="middle" font-family="sans-serif" font-size="28">'
+        f"{html.escape(concept)}</text></svg>"
+    ).encode()
+
+
+def _silent_wav(seconds: int, rate: int = 8000) -> bytes:
+    """Placeholder narration until a TTS model is wired in."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(1)
+        w.setframerate(rate)
+        w.writeframes(b"\x80" * (seconds * rate))  # unsigned 8-bit silence
+    return buf.getvalue()
+
+
+embedding_service = EmbeddingService()
+reranker = Reranker()
+vector_store = VectorStore(
+    url=os.getenv("QDRANT_URL", "http://qdrant:6333"),
+    collection_name=os.getenv("QDRANT_COLLECTION", "educational_content"),
+    path=os.getenv("VECTOR_STORE_PATH"),  # local backend persistence when Qdrant is not installed
+)
+# one embedding model + query cache for the process; fused hits are re-scored by the cross-encoder
+retriever = Retriever(vector_store, embeddings=embedding_service, reranker=reranker)
+knowledge_graph = KnowledgeGraph(
+    uri=os.getenv("NEO4J_URI", "bolt://neo4j:7687"),
+    user=os.getenv("NEO4J_USER", "neo4j"),
+    password=os.getenv("NEO4J_PASSWORD", "neurosync"),
+    snapshot_path=os.getenv("KG_SNAPSHOT_PATH"),  # seed JSON export, used when Neo4j is unavailable
+)
+planner = PrerequisitePlanner(knowledge_graph)
+artifacts = ArtifactStore(
+    os.getenv("ARTIFACT_DIR", "/tmp/content-architect/artifacts"),
+    max_bytes=int(os.getenv("ARTIFACT_MAX_BYTES", str(2 << 30))),
+)
+content_engine = ContentEngine(
+    ContentCache(
+        maxsize=int(os.getenv("CONTENT_CACHE_SIZE", "1024")),
+        ttl_s=float(os.getenv("CONTENT_CACHE_TTL_S", "86400")),
+        disk_dir=os.getenv("CONTENT_CACHE_DIR"),
+    ),
+    planner,
+    artifacts,
+    retriever,
+)
+prefetcher = PrefetchScheduler(
+    content_engine.prefetch,
+    busy=lambda: content_engine.active >= int(os.getenv("PREFETCH_MAX_FOREGROUND", "4")),
+    max_concurrency=int(os.getenv("PREFETCH_CONCURRENCY", "2")),
+    lookahead=int(os.getenv("PREFETCH_LOOKAHEAD", "2")),
+    mastery_threshold=float(os.getenv("PREFETCH_MASTERY_THRESHOLD", "0.8")),
+)
 
 
 # ============================================================================
@@ -207,18 +465,92 @@ async def health_check():
 
 @app.get("/healthz")
 async def healthz():
-    return {"status": "ok"}
+    return {"status": "ok", "embeddings": embedding_service.available, "reranker": reranker.available}
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+_prefetch_planning: Set[asyncio.Task] = set()
+
+
+def schedule_prefetch(request: ContentRequest):
+    """Queue the next concepts on the learner's path once ``context.mastery`` nears mastery.
+
+    ``context.goal_concept`` selects the path; without it the concept's direct
+    dependents are used. Planning runs in a background task, so it neither
+    delays nor fails the request that triggered it.
+    """
+    context = request.context or {}
+    try:
+        mastery = float(context["mastery"])
+    except (KeyError, TypeError, ValueError):
+        return
+    if not prefetcher.should_prefetch(mastery):
+        return
+    task = asyncio.create_task(_plan_prefetch(request, mastery))
+    _prefetch_planning.add(task)
+    task.add_done_callback(_prefetch_planning.discard)
+
+
+async def _plan_prefetch(request: ContentRequest, mastery: float):
+    try:
+        context = request.context or {}
+        upcoming = await planner.next_concepts(request.concept, context.get("goal_concept"), prefetcher.lookahead)
+        modalities = tuple(content_engine.select_modalities(request.cognitive_load, request.preferred_modality))
+        prefetcher.hint([(c, request.difficulty_level, modalities) for c in upcoming], mastery)
+    except Exception:
+        logger.exception("Prefetch planning failed for %r", request.concept)
 
 
 @app.post("/v1/generate", response_model=ContentResponse)
 async def generate_content(request: ContentRequest):
     """Generate multi-modal educational content."""
+    schedule_prefetch(request)
     try:
         return await content_engine.generate(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/v1/generate/stream")
+async def generate_content_stream(request: ContentRequest, http_request: Request):
+    """Stream blocks as they are generated: NDJSON by default, SSE for ``Accept: text/event-stream``.
+
+    Events: ``block`` / ``error`` per modality, then one ``summary`` with
+    prerequisites, time estimate and errors.
+    """
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    schedule_prefetch(request)
+
+    async def body():
+        async for event, data in content_engine.generate_stream(request):
+            if sse:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            else:
+                yield json.dumps({"event": event, "data": data}) + "\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream" if sse else "application/x-ndjson")
+
+
+@app.post("/v1/content/index")
+async def index_content(request: IndexRequest):
+    """Add source chunks that text blocks are grounded on (keyword index + vector store)."""
+    await retriever.index_many([(d.doc_id, d.text, d.metadata) for d in request.documents])
+    return {"indexed": len(request.documents)}
+
+
+@app.api_route("/generated/{name}", methods=["GET", "HEAD"])
+async def get_artifact(name: str):
+    """Serve a generated image / audio file by content address (Range + ETag aware)."""
+    path = artifacts.lookup(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="artifact not found")
+    return ArtifactResponse(path, name)
+
+
 @app.post("/v1/concept/decompose")
 async def decompose_concept(concept: str, depth: int = 2):
     """Break a concept into prerequisite sub-concepts."""
@@ -236,7 +568,8 @@ async def decompose_concept(concept: str, depth: int = 2):
 @app.get("/v1/concept/{concept_id}/prerequisites")
 async def get_prerequisites(concept_id: str):
     """Get prerequisite chain from the knowledge graph."""
-    return {"concept_id": concept_id, "prerequisites": [], "graph_source": "neo4j"}
+    path = await planner.compute_learning_path(concept_id)
+    return {"concept_id": concept_id, "prerequisites": path[:-1], "graph_source": knowledge_graph.source}
 
 
 # ============================================================================
@@ -244,15 +577,42 @@ async def get_prerequisites(concept_id: str):
 # ============================================================================
 
 
+async def _warm_graph():
+    """Load the graph snapshot; never fatal (reads fall back / retry later)."""
+    try:
+        await knowledge_graph.snapshot()
+    except Exception as exc:
+        print(f"⚠️  Knowledge graph snapshot unavailable at startup: {exc}")
+
+
 @app.on_event("startup")
 async def startup_event():
     print("📐 Content Architect starting up...")
+    # load + warm the models and the graph snapshot before taking traffic
+    await asyncio.to_thread(artifacts.load)
+    redis_url = os.getenv("CONTENT_CACHE_REDIS_URL")
+    if aioredis and redis_url:
+        try:
+            content_engine.cache.redis = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+            await content_engine.cache.redis.ping()
+        except Exception:
+            content_engine.cache.redis = None
+    await knowledge_graph.connect()
+    prefetcher.start()
+    await asyncio.gather(embedding_service.start(), reranker.start(), _warm_graph())
     print("✅ Content Architect ready!")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("👋 Content Architect shutting down...")
+    for task in list(_prefetch_planning):
+        task.cancel()
+    await prefetcher.close()
+    await embedding_service.close()
+    await reranker.close()
+    await vector_store.close()
+    await knowledge_graph.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+"""Cross-request micro-batching and a small LRU cache for model calls."""
+
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Hashable, List, Optional, Sequence
+
+from prometheus_client import Histogram
+
+BATCH_QUEUE_WAIT = Histogram(
+    "content_architect_batch_queue_wait_ms",
+    "Time an item waited in a micro-batch queue before its batch ran (ms)",
+    ["batcher"],
+    buckets=(0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+BATCH_SIZE = Histogram(
+    "content_architect_batch_size",
+    "Items per model call issued by a micro-batcher",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction (event-loop only, not thread-safe)."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent ``submit`` calls into one ``fn(items) -> results`` call.
+
+    A batch closes when it reaches ``max_batch`` items or ``max_wait_ms`` after
+    its first item arrived, then runs in ``executor`` so the event loop stays
+    free. Batches run one at a time; items arriving meanwhile form the next one,
+    so batch size grows with load while an idle queue adds at most
+    ``max_wait_ms`` of latency.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Sequence[Any]],
+        name: str,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ):
+        self.fn = fn
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, fut, time.perf_counter()))
+        return await fut
+
+    async def submit_many(self, items: Sequence[Any]) -> List[Any]:
+        return list(await asyncio.gather(*(self.submit(i) for i in items)))
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [entry for entry in batch if not entry[1].done()]  # drop cancelled callers
+            if not batch:
+                continue
+            now = time.perf_counter()
+            for _, _, enqueued in batch:
+                BATCH_QUEUE_WAIT.labels(batcher=self.name).observe((now - enqueued) * 1000)
+            BATCH_SIZE.labels(batcher=self.name).observe(len(batch))
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, [item for item, _, _ in batch])
+            except Exception as e:  # fail this batch's callers, keep serving
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, fut, _), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
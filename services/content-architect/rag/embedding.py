@@ -0,0 +1,94 @@
+"""Sentence embeddings off the event loop, micro-batched across requests."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+
+from .batching import LRUCache, MicroBatcher
+
+
+def load_sentence_transformer(model_name: str = "all-MiniLM-L6-v2"):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    return SentenceTransformer(model_name)
+
+
+class EmbeddingService:
+    """
+    Owns the embedding model and a dedicated worker thread it runs on.
+
+    ``start`` loads the model once and runs a warmup encode, so the first
+    request does not pay for either. Concurrent ``embed`` calls are coalesced
+    by a ``MicroBatcher`` into one ``encode`` call; results are kept in an LRU
+    cache keyed by text and shared by every caller of this service. When no
+    model can be loaded, ``embed`` returns None and callers skip semantic search.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Any] = load_sentence_transformer,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 4096,
+    ):
+        self._loader = loader
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self._batcher = MicroBatcher(self._encode, "embedding", max_batch, max_wait_ms, self._executor)
+        self.cache = LRUCache(cache_size)
+        self.model = None
+        self._started = False
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+    def _load(self):
+        model = self._loader()
+        if model is not None:
+            model.encode(["warmup"])
+        return model
+
+    async def start(self):
+        if self._started:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if not self._started:
+                self.model = await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+                self._started = True
+
+    async def close(self):
+        await self._batcher.close()
+        self._executor.shutdown(wait=False)
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        vectors = await self.embed_many([text])
+        return None if vectors is None else vectors[0]
+
+    async def embed_many(self, texts: Sequence[str], cache: bool = True) -> Optional[List[np.ndarray]]:
+        """One vector per text, or None without a model.
+
+        Cached texts are served from the LRU; the rest are batched with other
+        requests. Bulk indexing passes ``cache=False`` to keep query vectors resident.
+        """
+        await self.start()
+        if self.model is None:
+            return None
+        out: List[Optional[np.ndarray]] = [self.cache.get(t) if cache else None for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, out) if v is None))
+        if missing:
+            fresh = dict(zip(missing, await self._batcher.submit_many(missing)))
+            if cache:
+                for text, vec in fresh.items():
+                    self.cache.put(text, vec)
+            out = [v if v is not None else fresh[t] for t, v in zip(texts, out)]
+        return out
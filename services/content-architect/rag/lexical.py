@@ -0,0 +1,139 @@
+"""BM25 keyword index and rank fusion for hybrid retrieval."""
+
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index with compact per-term postings
+    (``array('I')`` rows + ``array('H')`` term frequencies).
+    Supports incremental add/replace/delete; deleted rows are skipped at
+    query time and purged from postings by ``compact``.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._vocab: Dict[str, int] = {}
+        self._post_rows: List[array] = []
+        self._post_tf: List[array] = []
+        self._doc_len = array("I")
+        self._alive = array("B")
+        self._keys: List[Optional[str]] = []
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}
+        self._total_len = 0
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def payload(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(key)
+        return None if row is None else self._payloads[row]
+
+    def _remove(self, key: str) -> bool:
+        row = self._rows.pop(key, None)
+        if row is None:
+            return False
+        self._alive[row] = 0
+        self._keys[row] = None
+        self._payloads[row] = None
+        self._total_len -= self._doc_len[row]
+        self._dead += 1
+        return True
+
+    def add(self, key: str, text: str, payload: Optional[Dict[str, Any]] = None):
+        """Index a document, replacing any previous version of ``key``."""
+        with self._lock:
+            self._remove(key)
+            row = len(self._keys)
+            tf = Counter(tokenize(text))
+            for term, n in tf.items():
+                tid = self._vocab.setdefault(term, len(self._post_rows))
+                if tid == len(self._post_rows):
+                    self._post_rows.append(array("I"))
+                    self._post_tf.append(array("H"))
+                self._post_rows[tid].append(row)
+                self._post_tf[tid].append(min(n, 65535))
+            dl = sum(tf.values())
+            self._doc_len.append(dl)
+            self._alive.append(1)
+            self._keys.append(key)
+            self._payloads.append(payload)
+            self._rows[key] = row
+            self._total_len += dl
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            removed = self._remove(key)
+            if self._dead > max(1024, len(self._keys) // 4):
+                self.compact()
+            return removed
+
+    def compact(self):
+        """Drop postings that point at deleted rows."""
+        with self._lock:
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            for tid, rows_arr in enumerate(self._post_rows):
+                rows = np.frombuffer(rows_arr, dtype=np.uint32)
+                keep = alive[rows]
+                if not keep.all():
+                    tf = np.frombuffer(self._post_tf[tid], dtype=np.uint16)
+                    self._post_rows[tid] = array("I", rows[keep].tobytes())
+                    self._post_tf[tid] = array("H", tf[keep].tobytes())
+            self._dead = 0
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Return up to ``limit`` (key, score) pairs, best first."""
+        with self._lock:
+            n_live = len(self._rows)
+            tids = {self._vocab[t] for t in tokenize(query) if t in self._vocab}
+            if not n_live or not tids or limit <= 0:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)
+            avgdl = self._total_len / n_live or 1.0
+            all_rows, all_scores = [], []
+            for tid in tids:
+                rows = np.frombuffer(self._post_rows[tid], dtype=np.uint32)
+                live = alive[rows]
+                rows = rows[live]
+                if rows.size == 0:
+                    continue
+                tf = np.frombuffer(self._post_tf[tid], dtype=np.uint16)[live].astype(np.float32)
+                idf = math.log(1.0 + (n_live - rows.size + 0.5) / (rows.size + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * doc_len[rows] / avgdl)
+                all_rows.append(rows)
+                all_scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+            if not all_rows:
+                return []
+            uniq, inv = np.unique(np.concatenate(all_rows), return_inverse=True)
+            scores = np.bincount(inv, weights=np.concatenate(all_scores))
+            top = np.argsort(-scores, kind="stable")[:limit]
+            return [(self._keys[int(uniq[i])], float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]], limit: int, k: int = 60
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank)."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: -kv[1])[:limit]
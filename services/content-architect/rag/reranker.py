@@ -1,36 +1,127 @@
 """Cross-encoder re-ranker for RAG results."""
 
-from typing import List, Dict, Any
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from .batching import LRUCache, MicroBatcher
+
+RERANK_REQUESTS = Counter(
+    "content_architect_rerank_requests_total",
+    "Rerank calls by outcome",
+    ["outcome"],
+)
+
+
+def load_cross_encoder(model_name: str):
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        return None
+    return CrossEncoder(model_name)
 
 
 class Reranker:
-    """Re-ranks retrieved documents using a cross-encoder model."""
+    """
+    Re-ranks retrieved documents using a cross-encoder model.
+
+    The model is loaded and warmed by ``start`` on a dedicated worker thread,
+    where all ``predict`` calls run; (query, passage) pairs from concurrent
+    requests are micro-batched into one call. Scores are cached per
+    (query hash, doc id), so re-asking the same question only scores new
+    documents. Only the first ``max_candidates`` documents are scored, and
+    reranking is skipped outright when the first-stage top-k is already
+    separated from the rest by a relative margin of at least ``skip_margin``.
+    """
 
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        loader: Optional[Callable[[], Any]] = None,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 8192,
+        max_candidates: int = 32,
+        skip_margin: Optional[float] = None,
+    ):
         self.model_name = model_name
+        self._loader = loader if loader is not None else (lambda: load_cross_encoder(model_name))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._batcher = MicroBatcher(self._predict, "rerank", max_batch, max_wait_ms, self._executor)
+        self.cache = LRUCache(cache_size)
+        self.max_candidates = max_candidates
+        self.skip_margin = skip_margin
         self._model = None
+        self._started = False
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        return [float(s) for s in self._model.predict(pairs)]
 
     def _load(self):
-        try:
-            from sentence_transformers import CrossEncoder
-            self._model = CrossEncoder(self.model_name)
-        except ImportError:
-            pass
+        model = self._loader()
+        if model is not None:
+            model.predict([("warmup", "warmup")])
+        return model
 
-    def rerank(
+    async def start(self):
+        if self._started:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if not self._started:
+                self._model = await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+                self._started = True
+
+    async def close(self):
+        await self._batcher.close()
+        self._executor.shutdown(wait=False)
+
+    @property
+    def available(self) -> bool:
+        return self._model is not None
+
+    def _decisive(self, documents: List[Dict[str, Any]], top_k: int) -> bool:
+        if self.skip_margin is None or len(documents) <= top_k:
+            return False
+        scores = [float(d.get("score", 0.0)) for d in documents]
+        if scores != sorted(scores, reverse=True):
+            return False
+        return (scores[top_k - 1] - scores[top_k]) >= self.skip_margin * (abs(scores[0]) + 1e-9)
+
+    async def rerank(
         self, query: str, documents: List[Dict[str, Any]], top_k: int = 3
     ) -> List[Dict[str, Any]]:
-        """Re-rank documents by relevance to query."""
+        """Re-rank documents by relevance to query; returns new dicts with ``rerank_score``."""
         if not documents:
             return []
+        await self.start()
         if self._model is None:
-            self._load()
-        if self._model is None:
+            RERANK_REQUESTS.labels(outcome="no_model").inc()
+            return documents[:top_k]
+        if self._decisive(documents, top_k):
+            RERANK_REQUESTS.labels(outcome="skipped").inc()
             return documents[:top_k]
 
-        pairs = [(query, doc.get("payload", {}).get("text", "")) for doc in documents]
-        scores = self._model.predict(pairs)
-        for doc, score in zip(documents, scores):
-            doc["rerank_score"] = float(score)
-        documents.sort(key=lambda d: d.get("rerank_score", 0), reverse=True)
-        return documents[:top_k]
+        candidates = documents[: self.max_candidates]
+        qhash = hashlib.sha1(query.encode()).hexdigest()
+        keys = [(qhash, str(doc["id"])) if "id" in doc else None for doc in candidates]
+        scores = [self.cache.get(k) if k is not None else None for k in keys]
+        todo = [i for i, s in enumerate(scores) if s is None]
+        if todo:
+            pairs = [(query, candidates[i].get("payload", {}).get("text", "")) for i in todo]
+            for i, score in zip(todo, await self._batcher.submit_many(pairs)):
+                scores[i] = score
+                if keys[i] is not None:
+                    self.cache.put(keys[i], score)
+        RERANK_REQUESTS.labels(outcome="reranked").inc()
+        ranked = sorted(
+            ({**doc, "rerank_score": score} for doc, score in zip(candidates, scores)),
+            key=lambda d: d["rerank_score"],
+            reverse=True,
+        )
+        return ranked[:top_k]
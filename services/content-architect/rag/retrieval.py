@@ -1,29 +1,88 @@
 """RAG retrieval pipeline."""
 
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from .embedding import EmbeddingService
+from .lexical import BM25Index, reciprocal_rank_fusion
+from .reranker import Reranker
 from .vector_store import VectorStore
 
 
 class Retriever:
-    """Retrieves relevant educational content chunks for a query."""
+    """
+    Retrieves relevant educational content chunks for a query.
+    Runs semantic (vector store) and keyword (BM25) search concurrently and
+    merges them with reciprocal rank fusion; either side may be unavailable.
+    With a ``reranker`` the fused candidates (``top_k * candidate_multiplier``)
+    are re-scored by the cross-encoder and the best ``top_k`` kept.
+    """
 
-    def __init__(self, vector_store: VectorStore):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        lexical: Optional[BM25Index] = None,
+        candidate_multiplier: int = 4,
+        embeddings: Optional[EmbeddingService] = None,
+        reranker: Optional[Reranker] = None,
+    ):
         self.vector_store = vector_store
-        self._embedder = None
+        self.lexical = lexical if lexical is not None else BM25Index()
+        self.candidate_multiplier = candidate_multiplier
+        self.embeddings = embeddings if embeddings is not None else EmbeddingService()
+        self.reranker = reranker
 
-    def _get_embedder(self):
-        if self._embedder is None:
-            try:
-                from sentence_transformers import SentenceTransformer
-                self._embedder = SentenceTransformer("all-MiniLM-L6-v2")
-            except ImportError:
-                pass
-        return self._embedder
+    async def index(self, doc_id: str, text: str, payload: Optional[Dict] = None):
+        """Add a chunk to the keyword index and, when an embedder is available, the vector store."""
+        await self.index_many([(doc_id, text, payload)])
 
-    async def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Embed query and search vector store."""
-        embedder = self._get_embedder()
-        if embedder is None:
+    async def index_many(self, docs: Sequence[Tuple[str, str, Optional[Dict]]]):
+        """Batched ``index``: one embedding request and one ``upsert_many`` for all (doc_id, text, payload)."""
+        points = []
+        for doc_id, text, payload in docs:
+            payload = {**(payload or {}), "text": text}
+            self.lexical.add(doc_id, text, payload)
+            points.append((doc_id, text, payload))
+        if not points:
+            return
+        vectors = await self.embeddings.embed_many([text for _, text, _ in points], cache=False)
+        if vectors is not None:
+            await self.vector_store.upsert_many(
+                [(doc_id, vec.tolist(), payload) for (doc_id, _, payload), vec in zip(points, vectors)]
+            )
+
+    async def _semantic(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        vector = await self.embeddings.embed(query)
+        if vector is None:
             return []
-        vector = embedder.encode(query).tolist()
-        return await self.vector_store.search(vector, limit=top_k)
+        return await self.vector_store.search(vector.tolist(), limit=limit)
+
+    async def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Hybrid search; results keep the vector store shape ({id, score, payload})."""
+        if self.reranker is None:
+            return await self._hybrid(query, top_k)
+        candidates = await self._hybrid(query, top_k * self.candidate_multiplier)
+        return await self.reranker.rerank(query, candidates, top_k=top_k)
+
+    async def _hybrid(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        depth = top_k * self.candidate_multiplier
+        semantic, keyword = await asyncio.gather(
+            self._semantic(query, depth),
+            asyncio.to_thread(self.lexical.search, query, depth),
+        )
+        if not keyword:
+            return semantic[:top_k]
+        if not semantic:
+            return [
+                {"id": key, "score": score, "payload": self.lexical.payload(key) or {}}
+                for key, score in keyword[:top_k]
+            ]
+        by_id = {hit["id"]: hit for hit in semantic}
+        fused = reciprocal_rank_fusion(
+            [[hit["id"] for hit in semantic], [key for key, _ in keyword]], limit=top_k
+        )
+        results = []
+        for key, score in fused:
+            hit = by_id.get(key)
+            payload = hit["payload"] if hit else (self.lexical.payload(key) or {})
+            results.append({"id": key, "score": score, "payload": payload})
+        return results
@@ -1,50 +1,343 @@
-"""Qdrant vector store integration for RAG."""
+"""Vector store for RAG: Qdrant when available, an embedded NumPy store otherwise."""
 
-from typing import List, Dict, Any, Optional
+import asyncio
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class VectorBackend(ABC):
+    """Backend interface; hits are ``{"id", "score", "payload"}`` dicts, best first."""
+
+    name = "none"
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def upsert_many(self, points: Sequence[Tuple[str, List[float], Dict]]):
+        """Insert or replace ``(id, vector, payload)`` points."""
+        ...
+
+    @abstractmethod
+    async def search_many(
+        self, query_vectors: Sequence[List[float]], limit: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """Top ``limit`` hits for each query vector."""
+        ...
+
+
+class QdrantBackend(VectorBackend):
+    """Qdrant over HTTP; batches go out as one request per ``batch_size`` points."""
+
+    name = "qdrant"
+
+    def __init__(self, url: str, collection_name: str, batch_size: int = 256):
+        self._url = url
+        self._collection = collection_name
+        self.batch_size = batch_size
+        self._client = None
+
+    async def connect(self):
+        from qdrant_client import AsyncQdrantClient  # ImportError -> caller falls back
+        self._client = AsyncQdrantClient(url=self._url)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+
+    async def upsert_many(self, points):
+        from qdrant_client.models import PointStruct
+        for i in range(0, len(points), self.batch_size):
+            await self._client.upsert(
+                collection_name=self._collection,
+                points=[
+                    PointStruct(id=doc_id, vector=list(vector), payload=payload)
+                    for doc_id, vector, payload in points[i:i + self.batch_size]
+                ],
+            )
+
+    async def search_many(self, query_vectors, limit=5):
+        from qdrant_client.models import SearchRequest
+        batches = await self._client.search_batch(
+            collection_name=self._collection,
+            requests=[
+                SearchRequest(vector=list(v), limit=limit, with_payload=True)
+                for v in query_vectors
+            ],
+        )
+        return [
+            [{"id": str(r.id), "score": r.score, "payload": r.payload} for r in results]
+            for results in batches
+        ]
+
+
+class LocalBackend(VectorBackend):
+    """
+    Embedded store: unit-normalised float32 rows in a growable NumPy matrix,
+    scored by cosine similarity with one matrix product per query batch.
+
+    With ``hnsw=True`` and ``hnswlib`` installed, collections of at least
+    ``hnsw_min_rows`` are searched through an HNSW graph instead of exactly.
+    With ``path`` set, every batch is appended to the current generation's
+    ``vectors.<gen>.f32`` / ``records.<gen>.jsonl`` (last record per id wins on
+    load); once the log holds twice as many rows as there are live ids it is
+    rewritten as the next generation.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        hnsw: bool = False,
+        hnsw_min_rows: int = 10000,
+        ef_search: int = 64,
+    ):
+        self.path = path
+        self.hnsw_min_rows = hnsw_min_rows
+        self.ef_search = ef_search
+        self._want_hnsw = hnsw
+        self._hnsw = None
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self._mat = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._payloads: List[Dict] = []
+        self._rows: Dict[str, int] = {}
+        self._gen: Optional[int] = None
+        self._log_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # --- persistence ---
+    def _files(self, gen: int):
+        return (
+            os.path.join(self.path, f"vectors.{gen}.f32"),
+            os.path.join(self.path, f"records.{gen}.jsonl"),
+        )
+
+    def _load(self):
+        current = os.path.join(self.path, "CURRENT")
+        if not os.path.exists(current):
+            return
+        with open(current, "r", encoding="utf-8") as f:
+            self._gen = int(f.read().strip())
+        vec_file, rec_file = self._files(self._gen)
+        with open(rec_file, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if not records:
+            return
+        dim = records[0]["dim"]
+        vecs = np.fromfile(vec_file, dtype=np.float32)
+        rows = min(len(records), vecs.size // dim)  # a torn last append is dropped
+        vecs = vecs[: rows * dim].reshape(rows, dim)
+        self._add([r["id"] for r in records[:rows]], vecs, [r["payload"] for r in records[:rows]])
+        self._log_rows = rows
+
+    def _write_records(self, rec_file: str, mode: str, ids, payloads):
+        with open(rec_file, mode, encoding="utf-8") as f:
+            for doc_id, payload in zip(ids, payloads):
+                f.write(json.dumps({"id": doc_id, "dim": self.dim, "payload": payload}) + "\n")
+
+    def _append_log(self, ids, vecs, payloads):
+        if self._gen is None:
+            self._rewrite_log()  # first write: creates generation 0 from the (already added) rows
+            return
+        vec_file, rec_file = self._files(self._gen)
+        with open(vec_file, "ab") as f:
+            f.write(np.ascontiguousarray(vecs, dtype=np.float32).tobytes())
+        self._write_records(rec_file, "a", ids, payloads)
+        self._log_rows += len(ids)
+        if self._log_rows > 2 * len(self._ids):
+            self._rewrite_log()
+
+    def _rewrite_log(self):
+        """Write the live rows as a new generation, then switch ``CURRENT`` to it atomically."""
+        os.makedirs(self.path, exist_ok=True)
+        old, gen = self._gen, (self._gen + 1 if self._gen is not None else 0)
+        vec_file, rec_file = self._files(gen)
+        n = len(self._ids)
+        self._mat[:n].tofile(vec_file)
+        self._write_records(rec_file, "w", self._ids, self._payloads)
+        current = os.path.join(self.path, "CURRENT")
+        with open(current + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(gen))
+        os.replace(current + ".tmp", current)
+        self._gen, self._log_rows = gen, n
+        if old is not None:
+            for stale in self._files(old):
+                os.remove(stale)
+
+    async def connect(self):
+        if self.path:
+            await asyncio.to_thread(self._load)
+
+    # --- writes ---
+    def _add(self, ids: List[str], vecs: np.ndarray, payloads: List[Dict]) -> np.ndarray:
+        """Insert or overwrite in place; returns the affected rows."""
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vecs.shape[1])
+                self._mat = np.zeros((max(64, len(ids)), self.dim), dtype=np.float32)
+            elif vecs.shape[1] != self.dim:
+                raise ValueError(f"vector dim {vecs.shape[1]} != store dim {self.dim}")
+            vecs = vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, (doc_id, payload) in enumerate(zip(ids, payloads)):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = self._rows[doc_id] = len(self._ids)
+                    self._ids.append(doc_id)
+                    self._payloads.append(payload)
+                else:
+                    self._payloads[row] = payload
+                rows[i] = row
+            if len(self._ids) > self._mat.shape[0]:
+                grown = np.zeros((max(len(self._ids), 2 * self._mat.shape[0]), self.dim), dtype=np.float32)
+                grown[: self._mat.shape[0]] = self._mat
+                self._mat = grown
+            self._mat[rows] = vecs
+            if self._hnsw is not None:
+                self._hnsw_add(rows, vecs)
+            return rows
+
+    def _upsert(self, ids, vecs, payloads):
+        with self._lock:
+            self._add(ids, vecs, payloads)
+            if self.path:
+                self._append_log(ids, vecs, payloads)
+            self._maybe_build_hnsw()
+
+    async def upsert_many(self, points):
+        if not points:
+            return
+        ids = [str(doc_id) for doc_id, _, _ in points]
+        vecs = np.asarray([vector for _, vector, _ in points], dtype=np.float32)
+        await asyncio.to_thread(self._upsert, ids, vecs, [payload or {} for _, _, payload in points])
+
+    # --- HNSW ---
+    def _maybe_build_hnsw(self):
+        if not self._want_hnsw or self._hnsw is not None or len(self._ids) < self.hnsw_min_rows:
+            return
+        try:
+            import hnswlib
+        except ImportError:
+            self._want_hnsw = False
+            return
+        self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+        self._hnsw.init_index(max_elements=2 * len(self._ids), ef_construction=200, M=16)
+        self._hnsw.set_ef(self.ef_search)
+        self._hnsw_add(np.arange(len(self._ids)), self._mat[: len(self._ids)])
+
+    def _hnsw_add(self, rows: np.ndarray, vecs: np.ndarray):
+        if len(self._ids) > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(2 * len(self._ids))
+        self._hnsw.add_items(vecs, rows)  # existing labels are updated in place
+
+    # --- reads ---
+    def _search(self, queries: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or limit <= 0:
+                return [[] for _ in range(len(queries))]
+            k = min(limit, n)
+            queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+            if self._hnsw is not None:
+                self._hnsw.set_ef(max(self.ef_search, k))
+                labels, dist = self._hnsw.knn_query(queries, k=k)
+                top, scores = labels.astype(np.int64), 1.0 - dist  # "ip" distance is 1 - q.v
+            else:
+                sims = queries @ self._mat[:n].T
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(queries), 1))
+                scores = np.take_along_axis(sims, top, axis=1)
+                order = np.argsort(-scores, axis=1)
+                top, scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(scores, order, axis=1)
+            return [
+                [
+                    {"id": self._ids[r], "score": float(s), "payload": self._payloads[r]}
+                    for r, s in zip(row_ids.tolist(), row_scores.tolist())
+                ]
+                for row_ids, row_scores in zip(top, scores)
+            ]
+
+    async def search_many(self, query_vectors, limit=5):
+        if len(query_vectors) == 0:
+            return []
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+        if self.dim is not None and queries.shape[1] != self.dim:
+            raise ValueError(f"query dim {queries.shape[1]} != store dim {self.dim}")
+        return await asyncio.to_thread(self._search, queries, limit)
 
 
 class VectorStore:
-    """Wrapper around Qdrant for semantic search over educational content."""
+    """
+    Semantic search over educational content.
+    ``backend="auto"`` uses Qdrant when ``qdrant_client`` is installed and the
+    embedded ``LocalBackend`` otherwise, so retrieval also works offline.
+    """
 
     def __init__(
         self,
         url: str = "http://qdrant:6333",
         collection_name: str = "educational_content",
+        backend: str = "auto",
+        path: Optional[str] = None,
+        hnsw: bool = False,
     ):
         self._url = url
         self._collection = collection_name
-        self._client = None
+        self._backend_name = backend
+        self._path = path
+        self._hnsw = hnsw
+        self.backend: Optional[VectorBackend] = None
 
     async def connect(self):
-        try:
-            from qdrant_client import AsyncQdrantClient
-            self._client = AsyncQdrantClient(url=self._url)
-        except ImportError:
-            pass
+        if self._backend_name in ("auto", "qdrant"):
+            backend = QdrantBackend(self._url, self._collection)
+            try:
+                await backend.connect()
+                self.backend = backend
+                return
+            except ImportError:
+                if self._backend_name == "qdrant":
+                    raise
+        self.backend = LocalBackend(path=self._path, hnsw=self._hnsw)
+        await self.backend.connect()
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+    async def _ready(self) -> VectorBackend:
+        if self.backend is None:
+            await self.connect()
+        return self.backend
 
     async def search(
         self, query_vector: List[float], limit: int = 5
     ) -> List[Dict[str, Any]]:
         """Semantic search in the vector store."""
-        if not self._client:
-            return []
-        from qdrant_client.models import SearchRequest
-        results = await self._client.search(
-            collection_name=self._collection,
-            query_vector=query_vector,
-            limit=limit,
-        )
-        return [
-            {"id": str(r.id), "score": r.score, "payload": r.payload}
-            for r in results
-        ]
+        return (await self.search_many([query_vector], limit=limit))[0]
+
+    async def search_many(
+        self, query_vectors: Sequence[List[float]], limit: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """One result list per query vector, in one backend round trip."""
+        return await (await self._ready()).search_many(query_vectors, limit=limit)
 
     async def upsert(self, doc_id: str, vector: List[float], payload: Dict):
         """Insert or update a document."""
-        if not self._client:
-            return
-        from qdrant_client.models import PointStruct
-        await self._client.upsert(
-            collection_name=self._collection,
-            points=[PointStruct(id=doc_id, vector=vector, payload=payload)],
-        )
+        await self.upsert_many([(doc_id, vector, payload)])
+
+    async def upsert_many(self, points: Sequence[Tuple[str, List[float], Dict]]):
+        """Insert or update ``(doc_id, vector, payload)`` points in batches."""
+        await (await self._ready()).upsert_many(list(points))
@@ -0,0 +1,49 @@
+"""Small process-local caches for the RAG query path."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import re, time
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case/whitespace-insensitive form used for answer cache keys."""
+    return _WS.sub(" ", query.strip().lower())
+
+
+class LRUCache:
+    """Bounded LRU with optional TTL; not thread-safe (event loop use only)."""
+
+    def __init__(self, maxsize: int, ttl_s: float = 0.0):
+        self.maxsize = max(0, maxsize)
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None or (self.ttl_s and time.monotonic() - item[0] > self.ttl_s):
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key: Hashable, value: Any):
+        if not self.maxsize:
+            return
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
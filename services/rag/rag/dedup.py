@@ -0,0 +1,119 @@
+"""Near-duplicate detection for RAG documents (MinHash + LSH banding).
+
+Texts are reduced to word shingles, hashed with ``zlib.crc32`` and summarised by
+``num_perm`` MinHash values (vectorised universal hashing mod 2^31-1). The
+signature is cut into ``bands`` x ``rows``; two documents become candidates when
+any band matches exactly, which happens with probability 1-(1-J^rows)^bands.
+Bands/rows are picked so the S-curve rises below ``threshold``, and candidates
+are then verified on the estimated Jaccard, so lookups touch only a few buckets
+instead of every stored signature.
+
+Documents flagged as duplicates share a group (the first document's key), which
+queries use to collapse copies. Not thread-safe: mutate from the event loop.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import re, zlib
+
+import numpy as np
+
+_P = (1 << 31) - 1
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) whose S-curve midpoint (1/b)^(1/r) is the highest one <= threshold."""
+    best = (num_perm, 1)
+    best_t = -1.0
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        t = (1.0 / bands) ** (1.0 / rows)
+        if best_t < t <= threshold:
+            best, best_t = (bands, rows), t
+    return best
+
+
+class NearDupIndex:
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _P, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, _P, num_perm, dtype=np.uint64)[:, None]
+        self._buckets: List[Dict[int, List[str]]] = [{} for _ in range(self.bands)]
+        self._sigs: Dict[str, np.ndarray] = {}
+        self._group: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sigs
+
+    # --- signatures ---
+    def _shingles(self, text: str) -> np.ndarray:
+        words = _WORD.findall((text or "").lower())
+        k = min(self.shingle, len(words))
+        grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)} if k else set()
+        return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature (num_perm uint32), or None for text without words."""
+        sh = self._shingles(text)
+        if sh.size == 0:
+            return None
+        # (a * x + b) mod p with x < 2^32, a, b < 2^31: products stay below 2^63
+        return ((self._a * (sh[None, :] % _P) + self._b) % _P).min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        return [self.signature(t) for t in texts]
+
+    def _band_keys(self, sig: np.ndarray):
+        for i in range(self.bands):
+            yield i, hash(sig[i * self.rows:(i + 1) * self.rows].tobytes())
+
+    # --- index ---
+    def find(self, sig: Optional[np.ndarray], exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Best stored match with estimated Jaccard >= threshold, as (key, similarity)."""
+        if sig is None:
+            return None
+        candidates = set()
+        for i, h in self._band_keys(sig):
+            candidates.update(self._buckets[i].get(h, ()))
+        candidates.discard(exclude)
+        best: Optional[Tuple[str, float]] = None
+        for key in candidates:
+            sim = float(np.mean(self._sigs[key] == sig))
+            if sim >= self.threshold and (best is None or sim > best[1]):
+                best = (key, sim)
+        return best
+
+    def add(self, key: str, sig: Optional[np.ndarray], group: Optional[str] = None):
+        self.remove(key)
+        if sig is None:
+            return
+        self._sigs[key] = sig
+        self._group[key] = group or key
+        for i, h in self._band_keys(sig):
+            self._buckets[i].setdefault(h, []).append(key)
+
+    def remove(self, key: str) -> bool:
+        sig = self._sigs.pop(key, None)
+        if sig is None:
+            return False
+        self._group.pop(key, None)
+        for i, h in self._band_keys(sig):
+            bucket = self._buckets[i].get(h)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[i][h]
+        return True
+
+    def group_of(self, key: str) -> str:
+        return self._group.get(key, key)
@@ -0,0 +1,232 @@
+"""Append-only, memory-mapped embedding segments for the RAG index.
+
+Layout (one directory, shared by every worker on the host):
+  manifest.json          {version, dim, dtype, segments: [name, ...], next_seq}
+  seg-000001.vec         header | (n x dim) float32/float16 matrix of unit-norm rows
+  seg-000001.ids.jsonl   one {"k": key, "p": payload, "t": full text} line per row
+  tombstones.jsonl       one {"s": segment, "r": row} line per deleted row (append-only)
+
+Segments are immutable once written, so they are opened with ``np.memmap`` and
+attached to the index without copying; every worker maps the same files and
+shares page cache. A key appearing in a later segment supersedes earlier rows.
+Payloads may be truncated for display; ``t`` keeps the full text so lexical and
+near-duplicate indexes rebuilt from a segment see the same text as at ingest.
+``merge`` compacts segments (dropping superseded and tombstoned rows) into one.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import json, os, struct
+
+import numpy as np
+
+try:  # POSIX advisory lock; Windows dev boxes run single-process
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+MAGIC = b"RES1"
+_HEADER = struct.Struct("<4sIII")  # magic, dtype code, dim, rows
+_DTYPES = {"float32": (0, np.float32), "float16": (1, np.float16)}
+_CODES = {code: (name, dt) for name, (code, dt) in _DTYPES.items()}
+MANIFEST = "manifest.json"
+TOMBSTONES = "tombstones.jsonl"
+
+
+@dataclass
+class Segment:
+    name: str
+    matrix: np.ndarray  # read-only memmap, shape (rows, dim)
+    keys: List[str]
+    payloads: List[Dict[str, Any]]
+    texts: List[str]  # full text per row (payload text for segments written without it)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class EmbeddingStore:
+    def __init__(self, path: str, dim: int, dtype: str = "float32"):
+        if dtype not in _DTYPES:
+            raise ValueError(f"unsupported dtype {dtype}")
+        self.path = path
+        self.dim = dim
+        self.dtype = dtype
+        self._manifest: Dict[str, Any] = {}
+        self._manifest_mtime = 0
+        os.makedirs(path, exist_ok=True)
+
+    # --- manifest / locking ---
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(os.path.join(self.path, "store.lock"), "a+") as lf:
+            if fcntl:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        p = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(p):
+            return {"version": 1, "dim": self.dim, "dtype": self.dtype, "segments": [], "next_seq": 1}
+        with open(p, "r", encoding="utf-8") as f:
+            m = json.load(f)
+        if m.get("dim") != self.dim:
+            raise ValueError(f"embedding store dim {m.get('dim')} != {self.dim}")
+        self._manifest_mtime = os.stat(p).st_mtime_ns
+        return m
+
+    def _write_manifest(self, m: Dict[str, Any]):
+        p = os.path.join(self.path, MANIFEST)
+        _write_atomic(p, json.dumps(m).encode())
+        self._manifest = m
+        self._manifest_mtime = os.stat(p).st_mtime_ns
+
+    def changed(self) -> bool:
+        """True when another process rewrote the manifest since we last read it."""
+        try:
+            return os.stat(os.path.join(self.path, MANIFEST)).st_mtime_ns != self._manifest_mtime
+        except FileNotFoundError:
+            return False
+
+    def reload_manifest(self) -> List[str]:
+        self._manifest = self._read_manifest()
+        return self.segment_names
+
+    @property
+    def segment_names(self) -> List[str]:
+        return list(self._manifest.get("segments", []))
+
+    # --- segments ---
+    def _seg_path(self, name: str, ext: str) -> str:
+        return os.path.join(self.path, f"{name}.{ext}")
+
+    def open_segment(self, name: str) -> Segment:
+        vec_path = self._seg_path(name, "vec")
+        with open(vec_path, "rb") as f:
+            magic, code, dim, rows = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or dim != self.dim:
+            raise ValueError(f"corrupt segment {name}")
+        dt = _CODES[code][1]
+        matrix = np.memmap(vec_path, dtype=dt, mode="r", offset=_HEADER.size, shape=(rows, dim)) if rows else np.zeros((0, dim), dtype=dt)
+        keys, payloads, texts = [], [], []
+        with open(self._seg_path(name, "ids.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                keys.append(rec["k"]); payloads.append(rec.get("p") or {})
+                texts.append(rec["t"] if "t" in rec else payloads[-1].get("text", ""))
+        if len(keys) != rows:
+            raise ValueError(f"segment {name} id map has {len(keys)} rows, matrix {rows}")
+        return Segment(name, matrix, keys, payloads, texts)
+
+    def open(self) -> List[Segment]:
+        """Read the manifest and map every live segment (no vector data is copied)."""
+        self._manifest = self._read_manifest()
+        return [self.open_segment(n) for n in self.segment_names]
+
+    def append(self, keys: List[str], vecs: np.ndarray, payloads: List[Dict[str, Any]],
+               texts: Optional[List[str]] = None) -> Segment:
+        """Write a new immutable segment and publish it in the manifest (`texts` defaults to payload text)."""
+        code, dt = _DTYPES[self.dtype]
+        mat = np.ascontiguousarray(np.asarray(vecs, dtype=np.float32).reshape(len(keys), self.dim).astype(dt))
+        with self._locked():
+            m = self._read_manifest()
+            name = f"seg-{m['next_seq']:06d}"
+            if texts is None:
+                texts = [p.get("text", "") for p in payloads]
+            ids = "".join(json.dumps({"k": k, "p": p, "t": t}) + "\n" for k, p, t in zip(keys, payloads, texts))
+            # id map first, matrix second: a segment is only visible once listed in the manifest
+            _write_atomic(self._seg_path(name, "ids.jsonl"), ids.encode())
+            _write_atomic(self._seg_path(name, "vec"), _HEADER.pack(MAGIC, code, self.dim, len(keys)) + mat.tobytes())
+            m["segments"] = m.get("segments", []) + [name]
+            m["next_seq"] = m["next_seq"] + 1
+            self._write_manifest(m)
+        return self.open_segment(name)
+
+    # --- tombstones ---
+    def delete(self, locs: List[Tuple[str, int]]):
+        if not locs:
+            return
+        with self._locked():
+            with open(os.path.join(self.path, TOMBSTONES), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps({"s": s, "r": int(r)}) + "\n" for s, r in locs))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def tombstones(self, since: int = 0) -> Tuple[Dict[str, Set[int]], int]:
+        """Tombstoned rows per segment read from byte offset `since`; returns (rows, new offset)."""
+        out: Dict[str, Set[int]] = {}
+        p = os.path.join(self.path, TOMBSTONES)
+        if not os.path.exists(p):
+            return out, 0
+        with open(p, "rb") as f:
+            f.seek(since)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # ignore a partially written trailing line
+        for line in data[:end].splitlines():
+            rec = json.loads(line)
+            out.setdefault(rec["s"], set()).add(rec["r"])
+        return out, since + end
+
+    # --- compaction ---
+    def merge(self, max_segments: int = 16, force: bool = False) -> Optional[str]:
+        """Compact all segments into one when there are more than `max_segments`.
+
+        Superseded keys and tombstoned rows are dropped. Old files are unlinked after
+        the manifest switch; processes that still map them keep valid pages.
+        """
+        with self._locked():
+            m = self._read_manifest()
+            names = m.get("segments", [])
+            if len(names) <= 1 or (len(names) <= max_segments and not force):
+                return None
+            dead, _ = self.tombstones()
+            latest: Dict[str, Tuple[int, int]] = {}
+            segs = [self.open_segment(n) for n in names]
+            for si, seg in enumerate(segs):
+                gone = dead.get(seg.name, set())
+                for r, k in enumerate(seg.keys):
+                    if r in gone:
+                        latest.pop(k, None)  # a later tombstoned row supersedes anything before it
+                    else:
+                        latest[k] = (si, r)
+            order = np.array(sorted(latest.values()), dtype=np.int64).reshape(-1, 2)
+            keys = [segs[si].keys[r] for si, r in order.tolist()]
+            payloads = [segs[si].payloads[r] for si, r in order.tolist()]
+            texts = [segs[si].texts[r] for si, r in order.tolist()]
+            mat = np.empty((len(keys), self.dim), dtype=_DTYPES[self.dtype][1])
+            for si, seg in enumerate(segs):
+                sel = order[:, 0] == si
+                if sel.any():
+                    mat[sel] = seg.matrix[order[sel, 1]]
+            code, _ = _DTYPES[self.dtype]
+            name = f"seg-{m['next_seq']:06d}"
+            ids = "".join(json.dumps({"k": k, "p": p, "t": t}) + "\n" for k, p, t in zip(keys, payloads, texts))
+            _write_atomic(self._seg_path(name, "ids.jsonl"), ids.encode())
+            _write_atomic(self._seg_path(name, "vec"), _HEADER.pack(MAGIC, code, self.dim, len(keys)) + mat.tobytes())
+            m["segments"] = [name]
+            m["next_seq"] += 1
+            self._write_manifest(m)
+            # every tombstone referred to a merged segment
+            _write_atomic(os.path.join(self.path, TOMBSTONES), b"")
+            for n in names:
+                for ext in ("vec", "ids.jsonl"):
+                    try:
+                        os.unlink(self._seg_path(n, ext))
+                    except OSError:  # already gone, or still mapped on Windows
+                        pass
+            return name
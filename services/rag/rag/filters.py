@@ -0,0 +1,106 @@
+"""Metadata filters for RAG retrieval.
+
+A filter maps metadata fields to a value or ``{"$in": [values]}``; fields are
+ANDed, values within a field ORed. ``MetadataBitmaps`` keeps, per indexed field
+and value, an append-only sorted array of index rows (the sparse container of a
+roaring bitmap). Combining them yields the candidate rows directly, so a
+selective filter never touches non-matching rows; dense results are turned into
+a boolean mask by the caller. Rows are never reused, so deletes are handled by
+the index's liveness mask rather than by rewriting postings.
+
+Without an explicit field list the ingest bookkeeping keys (``INTERNAL_FIELDS``)
+are skipped, and a field that grows past ``max_values`` distinct values is
+dropped: a near-unique field costs one posting array per row and is better
+served by scanning payload metadata.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import json
+
+import numpy as np
+
+_SCALARS = (str, int, float, bool)
+INTERNAL_FIELDS = frozenset({"chunk", "offset", "parent_doc_id", "duplicate_of"})  # set per chunk at ingest
+
+
+def normalize_filter(filters: Optional[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Validate and canonicalise a filter to {field: [allowed values]}; raises ValueError."""
+    out: Dict[str, List[Any]] = {}
+    for field, cond in (filters or {}).items():
+        if isinstance(cond, dict):
+            if set(cond) != {"$in"} or not isinstance(cond["$in"], list):
+                raise ValueError(f"filter on {field!r}: only a value or {{'$in': [...]}} is supported")
+            values = cond["$in"]
+        else:
+            values = cond if isinstance(cond, list) else [cond]
+        if not all(isinstance(v, _SCALARS) for v in values):
+            raise ValueError(f"filter on {field!r}: values must be strings, numbers or booleans")
+        out[field] = values
+    return out
+
+
+def filter_key(nf: Dict[str, List[Any]]) -> str:
+    """Stable string form of a normalised filter (cache keys)."""
+    return json.dumps({f: sorted(v, key=repr) for f, v in nf.items()}, sort_keys=True)
+
+
+def _values(v: Any) -> Iterable[Any]:
+    if isinstance(v, _SCALARS):
+        yield v
+    elif isinstance(v, (list, tuple)):
+        for x in v:
+            if isinstance(x, _SCALARS):
+                yield x
+
+
+def matches(metadata: Optional[Dict[str, Any]], nf: Dict[str, List[Any]]) -> bool:
+    md = metadata or {}
+    return all(any(x in allowed for x in _values(md.get(field))) for field, allowed in nf.items())
+
+
+class MetadataBitmaps:
+    def __init__(self, fields: Optional[Sequence[str]] = None, max_values: Optional[int] = None):
+        self.fields = set(fields) if fields else None  # None = every non-internal scalar / list-of-scalar field
+        self.max_values = max_values  # only applies when fields is None
+        self.dropped = set(INTERNAL_FIELDS) if self.fields is None else set()
+        self._postings: Dict[str, Dict[Any, array]] = {}
+
+    def add(self, rows: Iterable[int], metadatas: Iterable[Optional[Dict[str, Any]]]):
+        """Rows must be increasing across calls (index row ids are append-only)."""
+        for row, md in zip(rows, metadatas):
+            for field, v in (md or {}).items():
+                if field in self.dropped or (self.fields is not None and field not in self.fields):
+                    continue
+                by_value = self._postings.setdefault(field, {})
+                for x in _values(v):
+                    by_value.setdefault(x, array("I")).append(int(row))
+                if self.fields is None and self.max_values is not None and len(by_value) > self.max_values:
+                    self.dropped.add(field)
+                    del self._postings[field]
+
+    def indexed(self, nf: Dict[str, List[Any]]) -> bool:
+        if self.fields is None:
+            return not any(f in self.dropped for f in nf)
+        return all(f in self.fields for f in nf)
+
+    def rows(self, nf: Dict[str, List[Any]]) -> np.ndarray:
+        """Sorted candidate rows matching every field (may include deleted rows)."""
+        result: Optional[np.ndarray] = None
+        # intersect the smallest field first so later intersections stay cheap
+        per_field = []
+        for field, allowed in nf.items():
+            by_value = self._postings.get(field, {})
+            parts = [np.frombuffer(by_value[v], dtype=np.uint32) for v in allowed if v in by_value]
+            if not parts:
+                return np.empty(0, dtype=np.int64)
+            per_field.append(parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts)))
+        for rows in sorted(per_field, key=len):
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if result.size == 0:
+                break
+        return np.empty(0, dtype=np.int64) if result is None else result.astype(np.int64)
+
+    def cardinality(self) -> Dict[str, int]:
+        return {field: len(by_value) for field, by_value in self._postings.items()}
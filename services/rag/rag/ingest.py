@@ -0,0 +1,189 @@
+"""Streaming bulk ingestion: NDJSON docs -> overlapping chunks -> batched embeddings -> writes.
+
+Three stages connected by bounded ``asyncio.Queue``s, so a slow writer stalls the
+embedders and the embedders stall the reader:
+
+  read + chunk  --embed_q-->  N embed workers (executor)  --write_q-->  writer
+
+The queues bound the chunks held in memory, not the upload: the service spools
+the request body to a file first and the reader consumes that file. Embedding
+runs in a thread or process pool, keeping the event loop free for queries while
+a whole textbook is being indexed.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio, hashlib, json, re, time
+
+import numpy as np
+
+_WORD = re.compile(r"\S+")
+
+
+def embed_batch(texts: List[str], dim: int) -> np.ndarray:
+    """Deterministic stand-in embedder: unit-normalised leading bytes of SHA-256 (dim <= 32)."""
+    raw = b"".join(hashlib.sha256(t.encode()).digest()[:dim] for t in texts)
+    mat = np.frombuffer(raw, dtype=np.uint8).reshape(len(texts), dim).astype(np.float32)
+    return mat / (np.linalg.norm(mat, axis=1, keepdims=True) + 1e-8)
+
+
+def chunk_text(text: str, size: int, overlap: int) -> List[Tuple[int, str]]:
+    """Split into windows of `size` words overlapping by `overlap`; returns (char offset, chunk)."""
+    spans = [m.span() for m in _WORD.finditer(text or "")]
+    if not spans:
+        return []
+    step = max(1, size - overlap)
+    out = []
+    for lo in range(0, len(spans), step):
+        hi = min(lo + size, len(spans))
+        out.append((spans[lo][0], text[spans[lo][0]:spans[hi - 1][1]]))
+        if hi == len(spans):
+            break
+    return out
+
+
+@dataclass
+class Chunk:
+    key: str
+    parent: str
+    seq: int
+    offset: int
+    text: str
+    metadata: Dict[str, Any]
+
+
+@dataclass
+class IngestJob:
+    id: str
+    status: str = "queued"  # queued | running | done | failed
+    docs: int = 0
+    chunks: int = 0
+    indexed: int = 0  # chunks written
+    skipped: int = 0  # chunks dropped as near-duplicates
+    duplicates: int = 0  # near-duplicates found (skipped or linked)
+    errors: List[str] = field(default_factory=list)
+    started_at: float = 0.0
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "docs": self.docs,
+            "chunks": self.chunks,
+            "indexed": self.indexed,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "progress": round((self.indexed + self.skipped) / self.chunks, 4) if self.chunks else 0.0,
+            "elapsed_s": round(elapsed, 3),
+            "chunks_per_s": round((self.indexed + self.skipped) / elapsed, 1) if elapsed > 0 else 0.0,
+            "errors": self.errors[-20:],
+        }
+
+
+async def read_ndjson(path: str, block_bytes: int = 1 << 20) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, parsed object or exception) from an NDJSON file without blocking the loop."""
+    with open(path, "r", encoding="utf-8") as f:
+        n = 0
+        while True:
+            lines = await asyncio.to_thread(f.readlines, block_bytes)
+            if not lines:
+                return
+            for line in lines:
+                n += 1
+                if not line.strip():
+                    continue
+                try:
+                    yield n, json.loads(line)
+                except ValueError as e:
+                    yield n, e
+
+
+async def run_pipeline(
+    job: IngestJob,
+    source: AsyncIterator[Tuple[int, Any]],
+    embed: Callable[[List[str]], np.ndarray],
+    write: Callable[[List[Chunk], np.ndarray], Awaitable[Optional[Tuple[int, int]]]],
+    *,
+    executor=None,
+    chunk_words: int = 200,
+    overlap: int = 40,
+    batch_size: int = 256,
+    workers: int = 2,
+    queue_size: int = 4,
+    on_doc: Optional[Callable[[str, int], Awaitable[None]]] = None,
+    on_stage: Optional[Callable[[str, float, int], None]] = None,
+):
+    """Run the ingest pipeline for `job` to completion (status/progress are updated in place).
+
+    `write` may return (chunks written, near-duplicates found) for the batch; None means
+    every chunk was written and none were duplicates. `on_doc(doc_id,
+    n_chunks)` runs after a doc is chunked (e.g. to drop stale chunks of a previous
+    version); `on_stage(stage, seconds, n)` receives per-batch timings.
+    """
+    loop = asyncio.get_running_loop()
+    embed_q: asyncio.Queue = asyncio.Queue(queue_size)
+    write_q: asyncio.Queue = asyncio.Queue(queue_size)
+
+    async def produce():
+        batch: List[Chunk] = []
+        async for line_no, doc in source:
+            if isinstance(doc, Exception) or not isinstance(doc, dict) or not doc.get("doc_id"):
+                job.errors.append(f"line {line_no}: expected a JSON object with doc_id and text")
+                continue
+            doc_id, meta = str(doc["doc_id"]), doc.get("metadata") or {}
+            pieces = chunk_text(doc.get("text") or "", chunk_words, overlap)
+            job.docs += 1
+            job.chunks += len(pieces)
+            if on_doc is not None:
+                await on_doc(doc_id, len(pieces))
+            for seq, (offset, text) in enumerate(pieces):
+                batch.append(Chunk(f"{doc_id}#{seq}", doc_id, seq, offset, text, meta))
+                if len(batch) >= batch_size:
+                    await embed_q.put(batch)
+                    batch = []
+        if batch:
+            await embed_q.put(batch)
+        for _ in range(workers):
+            await embed_q.put(None)
+
+    async def embedder():
+        while (batch := await embed_q.get()) is not None:
+            t0 = time.perf_counter()
+            vecs = await loop.run_in_executor(executor, embed, [c.text for c in batch])
+            if on_stage is not None:
+                on_stage("embed", time.perf_counter() - t0, len(batch))
+            await write_q.put((batch, vecs))
+
+    async def writer():
+        while (item := await write_q.get()) is not None:
+            batch, vecs = item
+            t0 = time.perf_counter()
+            written, dups = await write(batch, vecs) or (len(batch), 0)
+            if on_stage is not None:
+                on_stage("write", time.perf_counter() - t0, len(batch))
+            job.indexed += written
+            job.skipped += len(batch) - written
+            job.duplicates += dups
+
+    async def feed():
+        embedders = [tg.create_task(embedder()) for _ in range(workers)]
+        await produce()
+        await asyncio.gather(*embedders)
+        await write_q.put(None)
+
+    job.status, job.started_at = "running", time.time()
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(writer())
+            tg.create_task(feed())
+    except BaseException as e:  # TaskGroup wraps failures in an ExceptionGroup
+        job.status = "failed"
+        job.errors.append(repr(getattr(e, "exceptions", [e])[0]))
+        raise
+    else:
+        job.status = "done"
+    finally:
+        job.finished_at = time.time()
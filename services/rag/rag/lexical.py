@@ -0,0 +1,162 @@
+"""In-process BM25 inverted index and rank fusion for hybrid retrieval.
+
+Each term owns two compact append-only postings arrays (``array('I')`` doc rows,
+``array('H')`` term frequencies), so adding a document is amortised O(terms).
+Deletes only flip a liveness bit; document frequencies are counted over live
+postings at query time and ``compact`` drops dead postings once they pile up.
+
+Rows are never reused; a re-added key tombstones its previous row. A lock
+serialises mutations and searches so queries may run in worker threads.
+"""
+from __future__ import annotations
+
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import math, re, threading
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_MAX_TF = 65535
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, compact_ratio: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self.lock = threading.RLock()
+        self._vocab: Dict[str, int] = {}
+        self._post_rows: List[array] = []
+        self._post_tf: List[array] = []
+        self._doc_len = array("I")
+        self._alive = array("B")
+        self._keys: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._total_len = 0
+        self._dead = 0
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def terms(self) -> int:
+        return len(self._vocab)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    # --- mutation ---
+    def _delete_row(self, key: str) -> bool:
+        row = self._rows.pop(key, None)
+        if row is None:
+            return False
+        self._alive[row] = 0
+        self._keys[row] = None
+        self._total_len -= self._doc_len[row]
+        self._dead += 1
+        return True
+
+    def add(self, keys: Sequence[str], texts: Sequence[str]):
+        """Index (or replace) documents; later duplicates of a key win."""
+        with self.lock:
+            for key, text in zip(keys, texts):
+                self._delete_row(key)
+                row = len(self._keys)
+                tf = Counter(tokenize(text))
+                for term, n in tf.items():
+                    tid = self._vocab.get(term)
+                    if tid is None:
+                        tid = self._vocab[term] = len(self._post_rows)
+                        self._post_rows.append(array("I"))
+                        self._post_tf.append(array("H"))
+                    self._post_rows[tid].append(row)
+                    self._post_tf[tid].append(min(n, _MAX_TF))
+                dl = sum(tf.values())
+                self._doc_len.append(dl)
+                self._alive.append(1)
+                self._keys.append(key)
+                self._rows[key] = row
+                self._total_len += dl
+            self.version += 1
+
+    def delete(self, keys: Sequence[str]) -> int:
+        with self.lock:
+            removed = sum(1 for k in keys if self._delete_row(k))
+            if removed:
+                self.version += 1
+                if self._dead > max(1024, self.compact_ratio * len(self._keys)):
+                    self.compact()
+            return removed
+
+    def compact(self):
+        """Drop postings of deleted rows (row ids stay stable)."""
+        with self.lock:
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            for tid in range(len(self._post_rows)):
+                rows = np.frombuffer(self._post_rows[tid], dtype=np.uint32)
+                keep = alive[rows]
+                if not keep.all():
+                    tf = np.frombuffer(self._post_tf[tid], dtype=np.uint16)
+                    self._post_rows[tid] = array("I", rows[keep].tobytes())
+                    self._post_tf[tid] = array("H", tf[keep].tobytes())
+            self._dead = 0
+
+    # --- search ---
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (key, BM25 score) pairs, best first."""
+        with self.lock:
+            n_live = len(self._rows)
+            tids = {self._vocab[t] for t in tokenize(query) if t in self._vocab}
+            if not n_live or not tids or k <= 0:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)
+            avgdl = self._total_len / n_live or 1.0
+            rows_parts, score_parts = [], []
+            for tid in tids:
+                rows = np.frombuffer(self._post_rows[tid], dtype=np.uint32)
+                live = alive[rows]
+                rows = rows[live]
+                if rows.size == 0:
+                    continue
+                tf = np.frombuffer(self._post_tf[tid], dtype=np.uint16)[live].astype(np.float32)
+                idf = math.log(1.0 + (n_live - rows.size + 0.5) / (rows.size + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * doc_len[rows] / avgdl)
+                rows_parts.append(rows)
+                score_parts.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+            if not rows_parts:
+                return []
+            uniq, inv = np.unique(np.concatenate(rows_parts), return_inverse=True)
+            scores = np.bincount(inv, weights=np.concatenate(score_parts))
+            top = np.argsort(-scores, kind="stable")[:k]
+            return [(self._keys[int(uniq[i])], float(scores[i])) for i in top]
+
+
+def fuse(rankings: Sequence[Sequence[Tuple[str, float]]], k: int, method: str = "rrf",
+         weights: Optional[Sequence[float]] = None, rrf_k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked (key, score) lists into one top-k list.
+
+    ``rrf`` (reciprocal rank fusion) only uses ranks, so BM25 and cosine scales
+    never need calibrating. ``weighted`` sums min-max normalised scores.
+    """
+    weights = list(weights) if weights is not None else [1.0] * len(rankings)
+    fused: Dict[str, float] = {}
+    for ranking, w in zip(rankings, weights):
+        if not ranking:
+            continue
+        if method == "weighted":
+            scores = [s for _, s in ranking]
+            lo, span = min(scores), max(scores) - min(scores)
+            for key, s in ranking:
+                fused[key] = fused.get(key, 0.0) + w * ((s - lo) / span if span else 1.0)
+        else:
+            for rank, (key, _) in enumerate(ranking, start=1):
+                fused[key] = fused.get(key, 0.0) + w / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda kv: -kv[1])[:k]
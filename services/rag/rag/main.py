@@ -1,10 +1,48 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional, Tuple
 import motor.motor_asyncio
 import numpy as np
-import hashlib, os
+import asyncio, bisect, functools, logging, os, random, tempfile, time, uuid
+import importlib, pathlib, sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+
+def _sibling(name: str):
+    """Import a helper module living next to this file.
+
+    Relative import works under uvicorn (``rag.main``); tests load this file by path,
+    so fall back to a path-based import registered as ``rag_<name>``.
+    """
+    here = pathlib.Path(__file__).resolve().parent
+    pkg = sys.modules.get(__package__ or "")
+    if pkg is not None and any(pathlib.Path(p).resolve() == here for p in getattr(pkg, "__path__", [])):
+        return importlib.import_module(f".{name}", __package__)
+    mod_name = f"rag_{name}"
+    if mod_name in sys.modules:
+        return sys.modules[mod_name]
+    spec = importlib.util.spec_from_file_location(mod_name, here / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)  # type: ignore
+    sys.modules[mod_name] = mod
+    spec.loader.exec_module(mod)  # type: ignore
+    return mod
+
+
+logger = logging.getLogger(__name__)
+
+VectorIndex = _sibling("vector_index").VectorIndex
+EmbeddingStore = _sibling("embedding_store").EmbeddingStore
+_cache = _sibling("cache")
+LRUCache, normalize_query = _cache.LRUCache, _cache.normalize_query
+_lexical = _sibling("lexical")
+BM25Index, fuse = _lexical.BM25Index, _lexical.fuse
+_ingest = _sibling("ingest")
+train_quantizer = _sibling("quantize").train_quantizer
+_filters = _sibling("filters")
+NearDupIndex = _sibling("dedup").NearDupIndex
 
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/edu")
 MONGODB_DB = os.getenv("MONGODB_DB", "edu")
@@ -15,6 +53,70 @@ db = client[MONGODB_DB]
 app = FastAPI(title="RAG Service", version="0.2.0")
 
 EMBED_DIM = 32
+IVF_THRESHOLD = int(os.getenv("RAG_IVF_THRESHOLD", "50000"))
+IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+QUANTIZATION = os.getenv("RAG_QUANTIZATION", "none")  # none | int8 | pq
+PQ_M = int(os.getenv("RAG_PQ_M", "8"))  # sub-vectors per PQ code (EMBED_DIM must divide evenly)
+QUANT_MIN_ROWS = int(os.getenv("RAG_QUANT_MIN_ROWS", "1024"))
+RERANK_FACTOR = int(os.getenv("RAG_RERANK_FACTOR", "4"))  # exact re-score shortlist = top_k * factor
+FILTER_FIELDS = [f for f in os.getenv("RAG_FILTER_FIELDS", "").split(",") if f]  # empty = every non-internal field
+FILTER_MAX_VALUES = int(os.getenv("RAG_FILTER_MAX_VALUES", "1024"))  # stop indexing a field past this many values
+FILTER_PREFILTER_MAX = int(os.getenv("RAG_FILTER_PREFILTER_MAX", "20000"))  # matches above this use ANN post-filter
+RECALL_SAMPLE_RATE = float(os.getenv("RAG_RECALL_SAMPLE_RATE", "0.01"))
+LOAD_BATCH = int(os.getenv("RAG_INDEX_LOAD_BATCH", "10000"))
+PAYLOAD_TEXT_CHARS = int(os.getenv("RAG_PAYLOAD_TEXT_CHARS", "512"))
+EMBED_STORE_DIR = os.getenv("RAG_EMBED_STORE_DIR", "")  # empty = index rebuilt from rag_docs on startup
+EMBED_STORE_DTYPE = os.getenv("RAG_EMBED_STORE_DTYPE", "float32")  # float32 | float16
+SEGMENT_MAX = int(os.getenv("RAG_SEGMENT_MAX", "16"))  # merge (startup / in the background) past this many segments
+STORE_REFRESH_MS = int(os.getenv("RAG_STORE_REFRESH_MS", "1000"))  # pick up other workers' writes
+EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", "4096"))
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_S = float(os.getenv("RAG_ANSWER_CACHE_TTL_S", "600"))
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")  # hybrid | vector | lexical; hybrid keeps cosine in score
+FUSION = os.getenv("RAG_FUSION", "rrf")  # rrf | weighted
+HYBRID_VECTOR_WEIGHT = float(os.getenv("RAG_HYBRID_VECTOR_WEIGHT", "0.5"))
+HYBRID_DEPTH = int(os.getenv("RAG_HYBRID_DEPTH", "4"))  # per-retriever candidates = top_k * depth
+CHUNK_WORDS = int(os.getenv("RAG_CHUNK_WORDS", "200"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "40"))
+INGEST_BATCH = int(os.getenv("RAG_INGEST_BATCH", "256"))  # chunks per embed / write batch
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "2"))
+INGEST_QUEUE = int(os.getenv("RAG_INGEST_QUEUE", "4"))  # batches buffered between stages
+INGEST_SPOOL_BLOCK = 1 << 20  # bytes of request body buffered per spool write
+INGEST_EXECUTOR = os.getenv("RAG_INGEST_EXECUTOR", "thread")  # thread | process
+INGEST_JOBS_KEPT = 100
+DEDUP_MODE = os.getenv("RAG_DEDUP", "link")  # off | skip (drop near-duplicates) | link (index as versions)
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard of word shingles
+DEDUP_NUM_PERM = int(os.getenv("RAG_DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE = int(os.getenv("RAG_DEDUP_SHINGLE", "5"))  # words per shingle
+
+RAG_SEARCH_LATENCY = Histogram(
+    "rag_search_latency_ms",
+    "In-process index search latency ms",
+    ["mode"],
+    buckets=(0.5, 1, 2, 5, 10, 25, 50, 100, 250),
+)
+RAG_ANN_RECALL = Histogram(
+    "rag_ann_recall_at_k",
+    "Sampled recall@k of approximate search vs exact scan",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0),
+)
+RAG_INDEX_VECTORS = Gauge("rag_index_vectors", "Live vectors in the in-process index")
+RAG_CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total", "RAG cache lookups", ["cache", "result"]
+)
+RAG_STORE_SEGMENTS = Gauge("rag_store_segments", "Embedding store segments attached to the index")
+RAG_INGEST_CHUNKS = Counter("rag_ingest_chunks_total", "Chunks written by bulk ingest jobs")
+RAG_INGEST_STAGE_LATENCY = Histogram(
+    "rag_ingest_stage_latency_ms",
+    "Per-batch bulk ingest stage latency ms",
+    ["stage"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+RAG_FILTERED_SEARCHES = Counter(
+    "rag_filtered_searches_total", "Metadata-filtered vector searches", ["strategy"]
+)
+RAG_DUPLICATES = Counter("rag_duplicates_total", "Near-duplicate documents detected at index time", ["action"])
+RAG_INGEST_ACTIVE = Gauge("rag_ingest_jobs_active", "Bulk ingest jobs currently running")
 
 class IndexDocument(BaseModel):
     doc_id: str
@@ -27,72 +129,639 @@ class RAGIndexRequest(BaseModel):
 class RAGQueryRequest(BaseModel):
     query: str
     top_k: int = 3
+    mode: Optional[Literal["hybrid", "vector", "lexical"]] = None
+    filters: Optional[Dict[str, Any]] = None  # {"field": value | {"$in": [values]}}, fields ANDed
 
 class RAGQueryResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
 
+# IVF / quantizer training triggered by writes runs here, off the event loop
+_REORGANIZE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-reorganize")
+
+def _new_index() -> VectorIndex:
+    quantizer = None
+    if QUANTIZATION != "none":
+        quantizer = functools.partial(train_quantizer, QUANTIZATION, pq_m=PQ_M)
+    return VectorIndex(EMBED_DIM, ivf_threshold=IVF_THRESHOLD, nprobe=IVF_NPROBE,
+                       quantizer=quantizer, quant_min_rows=QUANT_MIN_ROWS, rerank=RERANK_FACTOR,
+                       schedule=_REORGANIZE_POOL.submit)
+
+def _new_dedup() -> Optional[NearDupIndex]:
+    if DEDUP_MODE == "off":
+        return None
+    return NearDupIndex(DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE)
+
+def _scan_rows(idx: VectorIndex, live: np.ndarray, nf: Dict[str, List[Any]]) -> np.ndarray:
+    return np.array([r for r in live.tolist() if _filters.matches((idx.payload(r) or {}).get("metadata"), nf)],
+                    dtype=np.int64)
+
+def _payload(doc_id: str, text: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {"doc_id": doc_id, "text": (text or "")[:PAYLOAD_TEXT_CHARS], "metadata": metadata or {}}
+
+
 class VectorStore:
+    """Mongo persistence + in-process vector and BM25 indexes.
+
+    With ``RAG_EMBED_STORE_DIR`` set, vectors are also written to append-only mmap
+    segments; startup attaches those segments without re-reading rag_docs. The
+    BM25 index mirrors the vector index key set; for attached segments it is
+    built from the full chunk text stored with each segment row, not from the
+    payload text (cut to ``RAG_PAYLOAD_TEXT_CHARS``).
+
+    Store I/O (segment writes, tombstone fsyncs, merges, remaps) runs in worker
+    threads while ``_io_lock`` is held, so index rows stay in segment order; the
+    event loop only applies the results. Queries never wait on it: they read the
+    current state and refresh in the background.
+    """
+
+    def __init__(self, store: Optional[EmbeddingStore] = None):
+        self.index_ = _new_index()
+        self.lexical = BM25Index()
+        self.filters = _filters.MetadataBitmaps(FILTER_FIELDS, FILTER_MAX_VALUES)
+        self.dedup = _new_dedup()
+        if store is None and EMBED_STORE_DIR:
+            store = EmbeddingStore(EMBED_STORE_DIR, EMBED_DIM, EMBED_STORE_DTYPE)
+        self.store = store
+        self._io_lock = asyncio.Lock()
+        self._refreshing: Optional[asyncio.Task] = None
+        self._compacting: Optional[asyncio.Task] = None
+        # index row ranges per store segment (sorted by start row) for tombstoning
+        self._seg_starts: List[int] = []
+        self._seg_names: List[str] = []
+        self._tomb_offset = 0
+        self._next_refresh = 0.0
+        self._generation = 0  # bumped whenever the index object is rebuilt
+        self._embed_cache = LRUCache(EMBED_CACHE_SIZE)
+
+    @property
+    def version(self) -> str:
+        """Changes whenever search results may change (answer cache key component)."""
+        return f"{self._generation}.{self.index_.version}.{self.lexical.version}"
+
     def embed(self, text: str) -> List[float]:
-        h = hashlib.sha256(text.encode()).digest()
-        nums = [b for b in h[:EMBED_DIM]]
-        vec = np.array(nums, dtype=np.float32)
-        return (vec / (np.linalg.norm(vec) + 1e-8)).tolist()
+        return _ingest.embed_batch([text], EMBED_DIM)[0].tolist()
+
+    def embed_query(self, query: str) -> np.ndarray:
+        qv = self._embed_cache.get(query)
+        RAG_CACHE_REQUESTS.labels(cache="embedding", result="miss" if qv is None else "hit").inc()
+        if qv is None:
+            qv = np.asarray(self.embed(query), dtype=np.float32)
+            qv.setflags(write=False)
+            self._embed_cache.put(query, qv)
+        return qv
+
+    def _track(self, name: str, start: int):
+        self._seg_starts.append(start)
+        self._seg_names.append(name)
+        RAG_STORE_SEGMENTS.set(len(self._seg_names))
+
+    def _locate(self, row: int):
+        i = bisect.bisect_right(self._seg_starts, row) - 1
+        return (self._seg_names[i], row - self._seg_starts[i]) if i >= 0 else None
+
+    def _attach(self, seg):
+        """Attach a store segment; rows superseded by a newer segment already attached stay dead."""
+        seq = int(seg.name.split("-")[1])
+        dead = np.zeros(len(seg), dtype=bool)
+        for i, k in enumerate(seg.keys):
+            row = self.index_.row_of(k)
+            loc = self._locate(row) if row is not None else None
+            if loc and int(loc[0].split("-")[1]) > seq:
+                dead[i] = True
+        start = self.index_.rows
+        rows = self.index_.attach(seg.keys, seg.matrix, seg.payloads, dead)
+        self.filters.add(rows.tolist(), [p.get("metadata") for p in seg.payloads])
+        live = np.flatnonzero(~dead).tolist()
+        self.lexical.add([seg.keys[i] for i in live], [seg.texts[i] for i in live])
+        self._restore_dedup([seg.keys[i] for i in live], [seg.payloads[i] for i in live], [seg.texts[i] for i in live])
+        self._track(seg.name, start)
+
+    def _apply_tombstones(self):
+        dead, self._tomb_offset = self.store.tombstones(self._tomb_offset)
+        self._drop_dead(dead)
+
+    def _drop_dead(self, dead):
+        keys = []
+        for name, rows in dead.items():
+            if name not in self._seg_names:
+                continue
+            start = self._seg_starts[self._seg_names.index(name)]
+            for r in rows:
+                k = self.index_.key(start + r)
+                if k is not None and self.index_.row_of(k) == start + r:
+                    keys.append(k)
+        self.index_.delete(keys)
+        self.lexical.delete(keys)
+        self._forget_dedup(keys)
+
+    def _rebuilt(self) -> Optional["VectorStore"]:
+        """Merge if due and map every segment into a new VectorStore (worker thread; live state untouched)."""
+        self.store.merge(SEGMENT_MAX)
+        segs = self.store.open()
+        if not segs:
+            return None
+        fresh = VectorStore(self.store)
+        for seg in segs:
+            fresh._attach(seg)
+        fresh._apply_tombstones()
+        return fresh
+
+    async def _load_store(self) -> bool:
+        """Rebuild from the store off the event loop, then swap it in (caller holds `_io_lock`)."""
+        fresh = await asyncio.to_thread(self._rebuilt)
+        if fresh is None:
+            return False
+        self.index_, self.lexical, self.filters, self.dedup = fresh.index_, fresh.lexical, fresh.filters, fresh.dedup
+        self._seg_starts, self._seg_names, self._tomb_offset = fresh._seg_starts, fresh._seg_names, fresh._tomb_offset
+        self._generation += 1
+        RAG_STORE_SEGMENTS.set(len(self._seg_names))
+        return True
+
+    def _open_segments(self, names: List[str]):
+        return [self.store.open_segment(n) for n in names]
+
+    async def _sync_segments(self):
+        names = self.store.segment_names
+        if any(n not in names for n in self._seg_names):
+            await self._load_store()  # another worker compacted; remap everything
+            return
+        new = [n for n in names if n not in self._seg_names]
+        if new:
+            for seg in await asyncio.to_thread(self._open_segments, new):
+                self._attach(seg)
+
+    def _poll_manifest(self) -> bool:
+        """Re-read the manifest if another worker rewrote it (worker thread)."""
+        if not self.store.changed():
+            return False
+        self.store.reload_manifest()
+        return True
+
+    async def _refresh_locked(self):
+        if time.monotonic() < self._next_refresh:
+            return
+        self._next_refresh = time.monotonic() + STORE_REFRESH_MS / 1000
+        if await asyncio.to_thread(self._poll_manifest):
+            await self._sync_segments()
+        dead, self._tomb_offset = await asyncio.to_thread(self.store.tombstones, self._tomb_offset)
+        self._drop_dead(dead)
+        RAG_INDEX_VECTORS.set(len(self.index_))
+
+    async def refresh(self):
+        """Attach segments / tombstones written by other workers (throttled)."""
+        if self.store is None or time.monotonic() < self._next_refresh:
+            return
+        async with self._io_lock:
+            await self._refresh_locked()
+
+    def refresh_soon(self):
+        """Query path: start a refresh in the background instead of waiting on store I/O."""
+        if self.store is None or time.monotonic() < self._next_refresh:
+            return
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = _background(self.refresh())
+
+    async def compact(self, force: bool = False) -> Optional[str]:
+        """Merge store segments (drops tombstoned rows) and remap the index; returns the merged segment."""
+        async with self._io_lock:
+            merged = await asyncio.to_thread(self.store.merge, SEGMENT_MAX, force)
+            if merged is not None:
+                await self._load_store()
+            return merged
+
+    def _compact_soon(self):
+        # every ingest batch is a segment: merge in the background once there are too many
+        if len(self.store.segment_names) > SEGMENT_MAX and (self._compacting is None or self._compacting.done()):
+            self._compacting = _background(self.compact())
+
+    async def load(self):
+        """Attach the embedding store, or stream rag_docs into the index in batches (startup)."""
+        if self.store is None:
+            return await self._load_docs()
+        async with self._io_lock:
+            if await self._load_store():
+                RAG_INDEX_VECTORS.set(len(self.index_))
+                return len(self.index_)
+            return await self._load_docs()
+
+    async def _load_docs(self):
+        keys, vecs, payloads, texts = [], [], [], []
+        full_text: Dict[str, str] = {}  # for the store bootstrap below
+        cur = db.rag_docs.find({}, {"doc_id": 1, "text": 1, "metadata": 1, "embedding": 1}).batch_size(LOAD_BATCH)
+        async for d in cur:
+            emb = d.get("embedding") or self.embed(d.get("text", ""))
+            keys.append(d["doc_id"]); vecs.append(emb); texts.append(d.get("text", ""))
+            if self.store is not None:
+                full_text[d["doc_id"]] = texts[-1]
+            payloads.append(_payload(d["doc_id"], d.get("text", ""), d.get("metadata", {})))
+            if len(keys) >= LOAD_BATCH:
+                self._index_add(keys, np.asarray(vecs, dtype=np.float32), payloads)
+                self.lexical.add(keys, texts)
+                self._restore_dedup(keys, payloads, texts)
+                keys, vecs, payloads, texts = [], [], [], []
+        if keys:
+            self._index_add(keys, np.asarray(vecs, dtype=np.float32), payloads)
+            self.lexical.add(keys, texts)
+            self._restore_dedup(keys, payloads, texts)
+        if self.store is not None and len(self.index_):
+            # bootstrap the store once so the next restart skips rag_docs
+            rows = self.index_.live_rows()
+            live_keys = [self.index_.key(r) for r in rows.tolist()]
+            await asyncio.to_thread(self.store.append, live_keys, self.index_.gather(rows),
+                                    [self.index_.payload(r) for r in rows.tolist()], [full_text[k] for k in live_keys])
+            lexical, dedup = self.lexical, self.dedup
+            await self._load_store()
+            self.lexical, self.dedup = lexical, dedup  # same key set, built from full rag_docs text
+        RAG_INDEX_VECTORS.set(len(self.index_))
+        return len(self.index_)
+
+    def _index_add(self, keys: List[str], vecs: np.ndarray, payloads: List[Dict[str, Any]]):
+        rows = self.index_.add(keys, vecs, payloads)
+        self.filters.add(rows.tolist(), [p.get("metadata") for p in payloads])
+
+    async def _add(self, keys: List[str], vecs: np.ndarray, payloads: List[Dict[str, Any]], texts: List[str]):
+        if self.store is not None:
+            async with self._io_lock:
+                await self._refresh_locked()
+                seg = await asyncio.to_thread(self.store.append, keys, vecs, payloads, texts)
+                start = self.index_.rows
+                self.lexical.add(keys, texts)  # after the await: a remap may have swapped the indexes
+                self._index_add(keys, vecs, payloads)
+                if self.dedup is not None:
+                    # signatures registered by _check_duplicates before a remap are not in the rebuilt index
+                    lost = [i for i, k in enumerate(keys) if k not in self.dedup]
+                    self._restore_dedup([keys[i] for i in lost], [payloads[i] for i in lost], [texts[i] for i in lost])
+                self._track(seg.name, start)
+                # append re-read the manifest: attach segments other workers published meanwhile
+                await self._sync_segments()
+            self._compact_soon()
+        else:
+            self.lexical.add(keys, texts)
+            self._index_add(keys, vecs, payloads)
+        RAG_INDEX_VECTORS.set(len(self.index_))
+
+    def _restore_dedup(self, keys: List[str], payloads: List[Dict[str, Any]], texts: Optional[List[str]] = None):
+        """Rebuild signatures for already indexed docs (startup / segments from other workers).
+
+        `texts` must be the full text: signatures of the truncated payload text
+        would not match those of newly ingested docs.
+        """
+        if self.dedup is None:
+            return
+        texts = texts if texts is not None else [p.get("text", "") for p in payloads]
+        for key, p, text in zip(keys, payloads, texts):
+            self.dedup.add(key, self.dedup.signature(text), group=(p.get("metadata") or {}).get("duplicate_of"))
+
+    def _forget_dedup(self, keys: List[str]):
+        if self.dedup is not None:
+            for k in keys:
+                self.dedup.remove(k)
+
+    async def _check_duplicates(self, keys: List[str], texts: List[str], metas: List[Dict[str, Any]]):
+        """Near-duplicate check against the index and earlier docs of the same batch.
+
+        Returns (keep mask, reports). In link mode duplicates are kept and their
+        metadata gains ``duplicate_of`` (the group's first document).
+        """
+        if self.dedup is None:
+            return [True] * len(keys), []
+        sigs = await asyncio.to_thread(self.dedup.signatures, texts)
+        keep, reports = [], []
+        for key, sig, meta in zip(keys, sigs, metas):
+            match = self.dedup.find(sig, exclude=key)
+            group = None
+            if match is not None:
+                group = self.dedup.group_of(match[0])
+                reports.append({"doc_id": key, "duplicate_of": group, "similarity": round(match[1], 3)})
+                RAG_DUPLICATES.labels(action="skipped" if DEDUP_MODE == "skip" else "linked").inc()
+                if DEDUP_MODE == "skip":
+                    keep.append(False)
+                    continue
+                meta["duplicate_of"] = group
+            self.dedup.add(key, sig, group=group)
+            keep.append(True)
+        return keep, reports
+
     async def index(self, docs: List[IndexDocument]):
+        """Index whole documents; returns (indexed count, near-duplicate reports)."""
+        metas = [dict(d.metadata) for d in docs]
+        keep, dups = await self._check_duplicates([d.doc_id for d in docs], [d.text for d in docs], metas)
+        docs, metas = [d for d, k in zip(docs, keep) if k], [m for m, k in zip(metas, keep) if k]
+        if not docs:
+            return 0, dups
+        vecs = await asyncio.to_thread(_ingest.embed_batch, [d.text for d in docs], EMBED_DIM)
         ops = []
-        for d in docs:
+        for d, meta, emb in zip(docs, metas, vecs):
             ops.append({
                 "doc_id": d.doc_id,
                 "text": d.text,
-                "metadata": d.metadata,
-                "embedding": self.embed(d.text),
+                "metadata": meta,
+                "embedding": emb.tolist(),
                 "created_at": datetime.utcnow(),
                 "schema_version": 1
             })
-        if ops:
-            await db.rag_docs.insert_many(ops, ordered=False)
-        return len(ops)
-    async def search(self, query: str, top_k: int):
-        qv = np.array(self.embed(query))
-        cur = db.rag_docs.find().limit(500)
-        scored = []
-        async for d in cur:
-            v = np.array(d.get("embedding", [0]*EMBED_DIM))
-            score = float(np.dot(qv, v))
-            scored.append((score, d))
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [d for _, d in scored[:top_k]]
+        await db.rag_docs.insert_many(ops, ordered=False)
+        await self._add(
+            [o["doc_id"] for o in ops],
+            vecs,
+            [_payload(o["doc_id"], o["text"], o["metadata"]) for o in ops],
+            [o["text"] for o in ops],
+        )
+        return len(ops), dups
+
+    async def write_chunks(self, chunks, vecs: np.ndarray) -> Tuple[int, int]:
+        """Persist one ingest batch (rag_docs insert_many + index append); returns (written, duplicates found)."""
+        metas = [{**c.metadata, "parent_doc_id": c.parent, "chunk": c.seq, "offset": c.offset} for c in chunks]
+        keep, dups = await self._check_duplicates([c.key for c in chunks], [c.text for c in chunks], metas)
+        vecs = np.asarray(vecs, dtype=np.float32)[np.asarray(keep, dtype=bool)]
+        chunks, metas = [c for c, k in zip(chunks, keep) if k], [m for m, k in zip(metas, keep) if k]
+        if not chunks:
+            return 0, len(dups)
+        now = datetime.utcnow()
+        ops, payloads = [], []
+        for c, meta, emb in zip(chunks, metas, vecs):
+            ops.append({
+                "doc_id": c.key,
+                "parent_doc_id": c.parent,
+                "chunk": c.seq,
+                "text": c.text,
+                "metadata": meta,
+                "embedding": emb.tolist(),
+                "created_at": now,
+                "schema_version": 1
+            })
+            payloads.append(_payload(c.key, c.text, meta))
+        await db.rag_docs.insert_many(ops, ordered=False)
+        await self._add([c.key for c in chunks], vecs, payloads, [c.text for c in chunks])
+        RAG_INGEST_CHUNKS.inc(len(chunks))
+        return len(chunks), len(dups)
+
+    async def drop_stale_chunks(self, doc_id: str, n_chunks: int):
+        """A re-ingested doc may be shorter: delete its chunks numbered >= n_chunks."""
+        stale, seq = [], n_chunks
+        while self.index_.row_of(f"{doc_id}#{seq}") is not None:
+            stale.append(f"{doc_id}#{seq}")
+            seq += 1
+        if stale:
+            await self.delete(stale)
+
+    async def delete(self, doc_ids: List[str]) -> int:
+        if self.store is not None:
+            async with self._io_lock:
+                await self._refresh_locked()
+                locs = [self._locate(r) for r in (self.index_.row_of(k) for k in doc_ids) if r is not None]
+                await asyncio.to_thread(self.store.delete, [loc for loc in locs if loc])
+                removed = self._forget(doc_ids)
+        else:
+            removed = self._forget(doc_ids)
+        await db.rag_docs.delete_many({"doc_id": {"$in": doc_ids}})
+        RAG_INDEX_VECTORS.set(len(self.index_))
+        return removed
+
+    def _forget(self, doc_ids: List[str]) -> int:
+        removed = self.index_.delete(doc_ids)
+        self.lexical.delete(doc_ids)
+        self._forget_dedup(doc_ids)
+        return removed
+
+    def _vector_hits(self, idx: VectorIndex, qv: np.ndarray, k: int, rows: Optional[np.ndarray] = None):
+        t0 = time.perf_counter()
+        if rows is None:
+            found, scores = idx.search(qv, k)
+        else:
+            found, scores = idx.search_filtered(qv, k, rows, prefilter_max=FILTER_PREFILTER_MAX)
+        RAG_SEARCH_LATENCY.labels(mode=idx.mode).observe((time.perf_counter() - t0) * 1000)
+        if rows is None and idx.mode != "flat" and found.size and random.random() < RECALL_SAMPLE_RATE:
+            exact, _ = idx.search_exact(qv, k)
+            RAG_ANN_RECALL.observe(len(set(found.tolist()) & set(exact.tolist())) / max(1, exact.size))
+        return [(idx.key(r), float(sc)) for r, sc in zip(found.tolist(), scores.tolist())]
+
+    def _lexical_hits(self, lex: BM25Index, query: str, k: int, keep=None):
+        """BM25 top-k; with a `keep(key)` predicate, over-fetch until k hits pass it."""
+        t0 = time.perf_counter()
+        want = k
+        while True:
+            hits = lex.search(query, want)
+            if keep is not None:
+                kept = [h for h in hits if keep(h[0])]
+                if len(kept) < k and len(hits) == want:
+                    want *= 4
+                    continue
+                hits = kept[:k]
+            break
+        RAG_SEARCH_LATENCY.labels(mode="bm25").observe((time.perf_counter() - t0) * 1000)
+        return hits
+
+    async def _filter_rows(self, idx: VectorIndex, nf: Dict[str, List[Any]]) -> np.ndarray:
+        """Candidate rows for a filter; bitmap lookups run on the event loop, which owns mutations."""
+        if self.filters.indexed(nf):
+            rows = self.filters.rows(nf)
+            RAG_FILTERED_SEARCHES.labels(strategy="prefilter" if rows.size <= FILTER_PREFILTER_MAX else "postfilter").inc()
+            return rows
+        # field not indexed (RAG_FILTER_FIELDS / RAG_FILTER_MAX_VALUES): match payload metadata row by
+        # row in a worker thread, over the rows live now (payloads of existing rows never change)
+        RAG_FILTERED_SEARCHES.labels(strategy="scan").inc()
+        return await asyncio.to_thread(_scan_rows, idx, idx.live_rows(), nf)
+
+    async def search(self, query: str, top_k: int, mode: str = RETRIEVAL_MODE, nf: Optional[Dict[str, List[Any]]] = None):
+        """Return [(score, payload, fusion score)] for the top_k best chunks, best first.
+
+        In hybrid mode the vector and BM25 retrievers run concurrently in worker
+        threads, each returning ``top_k * RAG_HYBRID_DEPTH`` candidates, and the
+        rankings are fused (``RAG_FUSION``). Results are ordered by the fused
+        value, but ``score`` stays the query cosine as in vector mode (BM25 in
+        lexical mode); the fused value is the third element, None outside hybrid
+        mode. A normalised metadata filter `nf` restricts both retrievers.
+        """
+        self.refresh_soon()
+        idx, lex = self.index_, self.lexical
+        # hybrid fusion and duplicate collapsing both need candidates beyond top_k
+        depth = top_k * HYBRID_DEPTH if mode == "hybrid" or self.dedup is not None else top_k
+        rows = keep = None
+        if nf:
+            rows = await self._filter_rows(idx, nf)
+            if rows.size == 0:
+                return []
+
+            def keep(key: str) -> bool:
+                row = idx.row_of(key)
+                return row is not None and _filters.matches((idx.payload(row) or {}).get("metadata"), nf)
+        jobs = []
+        if mode != "lexical":
+            jobs.append(asyncio.to_thread(self._vector_hits, idx, self.embed_query(query), depth, rows))
+        if mode != "vector":
+            jobs.append(asyncio.to_thread(self._lexical_hits, lex, query, depth, keep))
+        rankings = await asyncio.gather(*jobs)
+        if len(rankings) == 1:
+            hits = rankings[0]
+        else:
+            hits = fuse(rankings, depth, FUSION, weights=(HYBRID_VECTOR_WEIGHT, 1.0 - HYBRID_VECTOR_WEIGHT))
+        if self.dedup is not None:
+            # keep only the best-ranked member of each near-duplicate group
+            seen, collapsed = set(), []
+            for key, score in hits:
+                group = self.dedup.group_of(key)
+                if group not in seen:
+                    seen.add(group)
+                    collapsed.append((key, score))
+            hits = collapsed
+        top = [(idx.row_of(key), score) for key, score in hits[:top_k]]
+        top = [(row, score) for row, score in top if row is not None]
+        if mode != "hybrid":
+            return [(score, idx.payload(row), None) for row, score in top]
+        qv = self.embed_query(query)
+        cosine = idx.gather(np.array([row for row, _ in top], dtype=np.int64)) @ (qv / (np.linalg.norm(qv) + 1e-8))
+        return [(float(cos), idx.payload(row), fused) for (row, fused), cos in zip(top, cosine.tolist())]
+
+def _background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    task.add_done_callback(_log_failure)
+    return task
+
+def _log_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("background store task failed", exc_info=task.exception())
 
 store = VectorStore()
+answer_cache = LRUCache(ANSWER_CACHE_SIZE, ttl_s=ANSWER_CACHE_TTL_S)
+_answer_cache_version = ""
 
 @app.post("/v1/rag/index")
 async def index_docs(payload: RAGIndexRequest):
-    count = await store.index(payload.documents)
-    return {"indexed": count}
+    count, duplicates = await store.index(payload.documents)
+    return {"indexed": count, "duplicates": duplicates}
+
+ingest_jobs: "OrderedDict[str, Any]" = OrderedDict()
+_ingest_tasks: set = set()  # strong refs so running jobs are not garbage collected
+_ingest_executor = None
+
+def _get_ingest_executor():
+    global _ingest_executor
+    if _ingest_executor is None:
+        pool = ProcessPoolExecutor if INGEST_EXECUTOR == "process" else ThreadPoolExecutor
+        _ingest_executor = pool(max_workers=INGEST_WORKERS)
+    return _ingest_executor
+
+def _observe_ingest_stage(stage: str, seconds: float, n: int):
+    RAG_INGEST_STAGE_LATENCY.labels(stage=stage).observe(seconds * 1000)
+
+async def _run_ingest(job, path: str):
+    RAG_INGEST_ACTIVE.inc()
+    try:
+        await _ingest.run_pipeline(
+            job,
+            _ingest.read_ndjson(path),
+            functools.partial(_ingest.embed_batch, dim=EMBED_DIM),
+            store.write_chunks,
+            executor=_get_ingest_executor(),
+            chunk_words=CHUNK_WORDS,
+            overlap=CHUNK_OVERLAP,
+            batch_size=INGEST_BATCH,
+            workers=INGEST_WORKERS,
+            queue_size=INGEST_QUEUE,
+            on_doc=store.drop_stale_chunks,
+            on_stage=_observe_ingest_stage,
+        )
+    except Exception:
+        pass  # recorded on the job
+    finally:
+        RAG_INGEST_ACTIVE.dec()
+        os.unlink(path)
+
+@app.post("/v1/rag/ingest", status_code=202)
+async def ingest(request: Request):
+    """Bulk-index an NDJSON body ({"doc_id", "text", "metadata"} per line) as overlapping chunks.
+
+    The body is spooled to disk and processed in the background; poll the job for progress.
+    Jobs are tracked per worker process.
+    """
+    fd, path = tempfile.mkstemp(prefix="rag-ingest-", suffix=".ndjson")
+    f = os.fdopen(fd, "wb")
+    try:
+        buf = bytearray()
+        async for part in request.stream():
+            buf += part
+            if len(buf) >= INGEST_SPOOL_BLOCK:
+                await asyncio.to_thread(f.write, buf)  # disk writes stay off the event loop
+                buf = bytearray()
+        if buf:
+            await asyncio.to_thread(f.write, buf)
+        await asyncio.to_thread(f.close)
+    except BaseException:
+        f.close()
+        os.unlink(path)
+        raise
+    job = _ingest.IngestJob(uuid.uuid4().hex)
+    ingest_jobs[job.id] = job
+    while len(ingest_jobs) > INGEST_JOBS_KEPT:
+        ingest_jobs.popitem(last=False)
+    task = asyncio.create_task(_run_ingest(job, path))
+    _ingest_tasks.add(task)
+    task.add_done_callback(_ingest_tasks.discard)
+    return job.to_dict()
+
+@app.get("/v1/rag/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown ingest job")
+    return job.to_dict()
 
 @app.post("/v1/rag/query", response_model=RAGQueryResponse)
 async def rag_query(q: RAGQueryRequest):
-    top_docs = await store.search(q.query, q.top_k)
+    global _answer_cache_version
+    store.refresh_soon()
+    version = store.version
+    if version != _answer_cache_version:
+        # index changed: every cached answer may be stale
+        answer_cache.clear()
+        _answer_cache_version = version
+    mode = q.mode or RETRIEVAL_MODE
+    try:
+        nf = _filters.normalize_filter(q.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    key = (normalize_query(q.query), q.top_k, mode, _filters.filter_key(nf), version)
+    cached = answer_cache.get(key)
+    RAG_CACHE_REQUESTS.labels(cache="answer", result="miss" if cached is None else "hit").inc()
+    if cached is not None:
+        return cached
+    top_docs = await store.search(q.query, q.top_k, mode, nf)
     sources = []
-    for rank, d in enumerate(top_docs, start=1):
-        v = d.get("embedding", [0]*EMBED_DIM)
-        # recompute similarity for response (store.search returns docs only)
-        score = float(np.dot(np.array(store.embed(q.query)), np.array(v)))
-        sources.append({
+    for rank, (score, d, fusion_score) in enumerate(top_docs, start=1):
+        source = {
             "doc_id": d.get("doc_id"),
             "snippet": d.get("text")[:160],
             "score": score,
             "citation_label": f"[{rank}]"
-        })
+        }
+        if fusion_score is not None:
+            source["fusion_score"] = fusion_score  # ranking value in hybrid mode (RAG_FUSION)
+        sources.append(source)
     answer = "Stub answer referencing " + ", ".join(s["citation_label"] for s in sources)
     res = {
         "answer": answer,
         "sources": sources
     }
-    # store answer provenance
+    # store answer provenance (once per distinct answer; cache hits reuse it)
     await db.rag_answers.insert_one({"query": q.query, **res, "created_at": datetime.utcnow(), "schema_version": 1})
+    answer_cache.put(key, res)
     return res
 
+@app.delete("/v1/rag/docs/{doc_id}")
+async def delete_doc(doc_id: str):
+    removed = await store.delete([doc_id])
+    return {"deleted": removed}
+
+@app.post("/v1/rag/index/compact")
+async def compact_index():
+    """Merge embedding store segments (drops tombstoned rows) and remap the index."""
+    if store.store is None:
+        return {"merged": None, "segments": 0}
+    merged = await store.compact(force=True)
+    return {"merged": merged, "segments": len(store.store.segment_names)}
+
 @app.get("/v1/rag/sources/{answer_id}")
 async def rag_sources(answer_id: str):
     doc = await db.rag_answers.find_one({"_id": answer_id})  # placeholder; would use ObjectId
@@ -100,6 +769,14 @@ async def rag_sources(answer_id: str):
         return {"sources": []}
     return {"sources": doc.get("sources", [])}
 
+@app.on_event("startup")
+async def _load_index():
+    await store.load()
+
 @app.get("/healthz")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "index": {"vectors": len(store.index_), "mode": store.index_.mode, "blocks": store.index_.blocks, "code_bytes": store.index_.code_bytes, "terms": store.lexical.terms}}
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,125 @@
+"""Compressed vector codes for the RAG index (scalar 8-bit and product quantization).
+
+Both quantizers score with asymmetric distance computation (ADC): the query stays
+float32 and is compared against codes directly, vectorized over the code matrix,
+so only codes (``dim`` or ``m`` bytes per vector) need to be resident. Callers
+re-score a shortlist against the exact float vectors.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+class ScalarQuantizer:
+    """Per-dimension affine 8-bit codes: x ~= lo + code * scale."""
+
+    kind = "int8"
+
+    def __init__(self, lo: np.ndarray, scale: np.ndarray):
+        self.lo = lo.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+
+    @property
+    def code_size(self) -> int:
+        return int(self.lo.shape[0])
+
+    @classmethod
+    def train(cls, sample: np.ndarray, seed: int = 0) -> "ScalarQuantizer":
+        lo, hi = sample.min(axis=0), sample.max(axis=0)
+        return cls(lo, np.maximum(hi - lo, 1e-8) / 255.0)
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(vecs, dtype=np.float32) - self.lo) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.lo + codes.astype(np.float32) * self.scale
+
+    def prepare(self, q: np.ndarray):
+        # q . (lo + c * scale) = q . lo + c . (q * scale)
+        return (q * self.scale).astype(np.float32), float(q @ self.lo)
+
+    def scores(self, codes: np.ndarray, prepared) -> np.ndarray:
+        w, bias = prepared
+        return codes.astype(np.float32) @ w + bias
+
+
+class ProductQuantizer:
+    """``m`` sub-vectors, each coded as the id of one of ``ksub`` <= 256 k-means centroids."""
+
+    kind = "pq"
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = centroids.astype(np.float32)  # (m, ksub, dsub)
+
+    @property
+    def m(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def code_size(self) -> int:
+        return self.m
+
+    @classmethod
+    def train(cls, sample: np.ndarray, m: int = 8, ksub: int = 256, iters: int = 12, seed: int = 0,
+              points_per_centroid: int = 64) -> "ProductQuantizer":
+        n, dim = sample.shape
+        if dim % m:
+            raise ValueError(f"dim {dim} is not divisible by pq m={m}")
+        rng = np.random.default_rng(seed)
+        if n > ksub * points_per_centroid:
+            sample = sample[rng.choice(n, size=ksub * points_per_centroid, replace=False)]
+            n = sample.shape[0]
+        ksub = min(ksub, n)
+        dsub = dim // m
+        cents = np.empty((m, ksub, dsub), dtype=np.float32)
+        for j in range(m):
+            sub = np.ascontiguousarray(sample[:, j * dsub:(j + 1) * dsub], dtype=np.float32)
+            c = sub[rng.choice(n, size=ksub, replace=False)].copy()
+            for _ in range(iters):
+                assign = _nearest(sub, c)
+                counts = np.bincount(assign, minlength=ksub)
+                sums = np.stack([np.bincount(assign, weights=sub[:, d], minlength=ksub) for d in range(dsub)], axis=1)
+                empty = counts == 0
+                c = sums / np.maximum(counts, 1)[:, None]
+                if empty.any():
+                    c[empty] = sub[rng.choice(n, size=int(empty.sum()), replace=False)]
+            cents[j] = c
+        return cls(cents)
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        m, _, dsub = self.centroids.shape
+        codes = np.empty((vecs.shape[0], m), dtype=np.uint8)
+        for j in range(m):
+            codes[:, j] = _nearest(vecs[:, j * dsub:(j + 1) * dsub], self.centroids[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.centroids[j][codes[:, j]] for j in range(self.m)]
+        return np.concatenate(parts, axis=1)
+
+    def prepare(self, q: np.ndarray) -> np.ndarray:
+        m, _, dsub = self.centroids.shape
+        # (m, ksub) lookup table of sub-query . centroid inner products
+        return np.einsum("mkd,md->mk", self.centroids, q.reshape(m, dsub).astype(np.float32))
+
+    def scores(self, codes: np.ndarray, lut: np.ndarray) -> np.ndarray:
+        out = np.take(lut[0], codes[:, 0])
+        for j in range(1, self.m):
+            out += np.take(lut[j], codes[:, j])
+        return out
+
+
+def _nearest(x: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for every row of x."""
+    d = (c * c).sum(axis=1)[None, :] - 2.0 * (x @ c.T)
+    return np.argmin(d, axis=1)
+
+
+def train_quantizer(kind: str, sample: np.ndarray, pq_m: int = 8, seed: int = 0):
+    if kind == "int8":
+        return ScalarQuantizer.train(sample, seed=seed)
+    if kind == "pq":
+        return ProductQuantizer.train(sample, m=pq_m, seed=seed)
+    raise ValueError(f"unknown quantization {kind}")
@@ -0,0 +1,524 @@
+"""In-process vector index for the RAG service.
+
+Rows are addressed by a global, never-reused row id and stored in blocks:
+read-only matrices (e.g. memory-mapped embedding store segments, float32 or
+float16) plus one growable float32 RAM tail for vectors added in this process.
+A row tombstone mask covers every block, so small corpora are answered exactly
+with one matmul per block.
+
+Past ``ivf_threshold`` live rows an IVF partition (spherical k-means cells +
+CSR inverted lists) is trained and queries probe only the ``nprobe`` closest
+cells. Rows appended after training are kept in a pending list that is scanned
+exactly until the lists are rebuilt, so incremental adds never need a retrain.
+
+With a ``quantizer`` factory (see ``quantize.py``) every row also gets a compact
+code; searches score codes with ADC to a ``rerank``-times-larger shortlist and
+re-score only that shortlist against the float vectors. Combined with mmap
+blocks this keeps just the codes resident in RAM.
+
+Public mutators and searches hold ``lock`` so queries may run in worker threads
+while the event loop applies writes. Training (k-means, quantizer fitting) and
+list / code rebuilds read a snapshot of the blocks without the lock and swap
+the result in under it; with a ``schedule`` callable (e.g. an executor's
+``submit``) ``add`` hands that work off instead of running it inline.
+"""
+from __future__ import annotations
+
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging, math, threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 1024
+_SCORE_BLOCK = 65536
+_ASSIGN_SCORES = 1 << 22  # entries of one (rows x nlist) score block when assigning cells
+_TRAIN_SAMPLE_MAX = 262144
+
+
+def normalize(mat: np.ndarray) -> np.ndarray:
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    return mat / (norms + 1e-8)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, highest first."""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= scores.size:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _nearest_cells(vecs: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Best centroid per row, scored a bounded block of rows at a time."""
+    out = np.empty(vecs.shape[0], dtype=np.int32)
+    step = max(1, min(_SCORE_BLOCK, _ASSIGN_SCORES // max(1, centroids.shape[0])))
+    for lo in range(0, vecs.shape[0], step):
+        chunk = np.asarray(vecs[lo:lo + step], dtype=np.float32)
+        out[lo:lo + step] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+class IVFPartition:
+    """Spherical k-means cells over a snapshot of index rows."""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, trained_rows: int):
+        self.centroids = centroids  # (nlist, dim), unit norm
+        self.order = order  # row ids grouped by cell
+        self.offsets = offsets  # CSR offsets into `order`, len nlist + 1
+        self.trained_rows = trained_rows
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def train(cls, sample: np.ndarray, nlist: int, iters: int = 10, seed: int = 0) -> "IVFPartition":
+        rng = np.random.default_rng(seed)
+        sample_n = sample.shape[0]
+        centroids = sample[rng.choice(sample_n, size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = _nearest_cells(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # reseed empty cells from random sample points
+                sums[empty] = sample[rng.choice(sample_n, size=int(empty.sum()), replace=False)]
+            centroids = normalize(sums)
+        return cls(centroids, np.empty(0, dtype=np.int64), np.zeros(nlist + 1, dtype=np.int64), 0)
+
+    def assign(self, vecs: np.ndarray) -> np.ndarray:
+        return _nearest_cells(vecs, self.centroids)
+
+    def rebuild_lists(self, vecs: np.ndarray, rows: np.ndarray):
+        """`vecs` holds the vectors of `rows`, in the same order."""
+        cells = self.assign(vecs)
+        idx = np.argsort(cells, kind="stable")
+        self.order = rows[idx]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=self.nlist)))).astype(np.int64)
+        self.trained_rows = int(rows.size)
+
+    def probe(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        cells = _top_k(self.centroids @ q, min(nprobe, self.nlist))
+        parts = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def _locked(fn):
+    @wraps(fn)
+    def inner(self, *args, **kwargs):
+        with self.lock:
+            return fn(self, *args, **kwargs)
+    return inner
+
+
+class VectorIndex:
+    """Exact blocked index with an optional IVF accelerator for large corpora."""
+
+    def __init__(self, dim: int, ivf_threshold: int = 50000, nprobe: int = 8, retrain_growth: float = 4.0,
+                 quantizer: Optional[Callable[[np.ndarray], Any]] = None, quant_min_rows: int = 1024, rerank: int = 4,
+                 schedule: Optional[Callable[[Callable[[], None]], Any]] = None):
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.retrain_growth = retrain_growth
+        self._starts: List[int] = []  # first global row of each sealed block
+        self._blocks: List[np.ndarray] = []  # sealed read-only matrices
+        self._tail = np.zeros((_INITIAL_CAPACITY, dim), dtype=np.float32)
+        self._tail_start = 0
+        self._tail_n = 0
+        self._alive = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self._n = 0
+        self._keys: List[Optional[str]] = []
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}
+        self._ivf: Optional[IVFPartition] = None
+        self._pending: List[int] = []  # rows added after the IVF lists were built
+        self._quantizer_factory = quantizer  # sample matrix -> trained quantizer
+        self.quant_min_rows = quant_min_rows
+        self.rerank = rerank
+        self._quant: Any = None
+        self._quant_trained_rows = 0
+        self._codes: Optional[np.ndarray] = None  # (capacity, code_size) uint8, indexed by row
+        self.version = 0
+        self.lock = threading.RLock()
+        self._schedule = schedule  # None = retrain inline in add()
+        self._reorganizing = False
+
+    # --- size / introspection ---
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def rows(self) -> int:
+        return self._n
+
+    @property
+    def blocks(self) -> int:
+        return len(self._blocks) + (1 if self._tail_n else 0)
+
+    @property
+    def mode(self) -> str:
+        parts = (["ivf"] if self._ivf is not None else []) + ([self._quant.kind] if self._quant is not None else [])
+        return "+".join(parts) or "flat"
+
+    @property
+    def code_bytes(self) -> int:
+        return 0 if self._quant is None else self._n * self._quant.code_size
+
+    @property
+    def resident_bytes(self) -> int:
+        """Vector and code arrays held in process memory; memory-mapped blocks are not counted."""
+        blocks = sum(b.nbytes for b in self._blocks if not isinstance(b, np.memmap))
+        return self._tail.nbytes + blocks + (0 if self._codes is None else self._codes.nbytes)
+
+    def payload(self, row: int) -> Optional[Dict[str, Any]]:
+        return self._payloads[row]
+
+    def key(self, row: int) -> Optional[str]:
+        return self._keys[row]
+
+    def row_of(self, key: str) -> Optional[int]:
+        return self._rows.get(key)
+
+    def vector(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        return None if row is None else self.gather(np.array([row]))[0]
+
+    # --- storage ---
+    def _iter_blocks(self):
+        for start, blk in zip(self._starts, self._blocks):
+            yield start, blk
+        if self._tail_n:
+            yield self._tail_start, self._tail[: self._tail_n]
+
+    def _view(self) -> Tuple[List[int], List[np.ndarray], np.ndarray, int]:
+        """The current blocks; rows below ``_n`` keep their vectors in it after the lock is released."""
+        return list(self._starts), list(self._blocks), self._tail, self._tail_start
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        """float32 vectors for global `rows` (any order)."""
+        return self._gather_from(self._view(), rows)
+
+    def _gather_from(self, view, rows: np.ndarray) -> np.ndarray:
+        starts, blocks, tail, tail_start = view
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((rows.size, self.dim), dtype=np.float32)
+        if rows.size == 0:
+            return out
+        in_tail = rows >= tail_start
+        if in_tail.any():
+            out[in_tail] = tail[rows[in_tail] - tail_start]
+        if blocks and not in_tail.all():
+            sealed = np.flatnonzero(~in_tail)
+            which = np.searchsorted(starts, rows[sealed], side="right") - 1
+            for b in np.unique(which):
+                sel = sealed[which == b]
+                out[sel] = blocks[b][rows[sel] - starts[b]]
+        return out
+
+    def _ensure_alive(self, need: int):
+        if need > self._alive.size:
+            alive = np.zeros(max(need, self._alive.size * 2), dtype=bool)
+            alive[: self._n] = self._alive[: self._n]
+            self._alive = alive
+
+    def _grow_tail(self, need: int):
+        cap = self._tail.shape[0]
+        if need <= cap:
+            return
+        tail = np.zeros((max(need, cap * 2), self.dim), dtype=np.float32)
+        tail[: self._tail_n] = self._tail[: self._tail_n]
+        self._tail = tail
+
+    def _seal_tail(self):
+        """Freeze the RAM tail so a new block can take the next row range."""
+        if self._tail_n:
+            self._starts.append(self._tail_start)
+            self._blocks.append(self._tail[: self._tail_n].copy())
+        self._tail = np.zeros((_INITIAL_CAPACITY, self.dim), dtype=np.float32)
+        self._tail_start = self._n
+        self._tail_n = 0
+
+    def _register(self, keys: List[str], payloads: Optional[List[Dict[str, Any]]], dead: Optional[np.ndarray] = None) -> np.ndarray:
+        start = self._n
+        last = {k: i for i, k in enumerate(keys)}
+        if len(last) != len(keys):
+            # duplicate keys within one batch: only the last occurrence survives
+            dup = np.array([last[k] != i for i, k in enumerate(keys)])
+            dead = dup if dead is None else (dead | dup)
+        for k in last:
+            self._delete_row(k)
+        self._ensure_alive(start + len(keys))
+        self._alive[start:start + len(keys)] = True if dead is None else ~dead
+        for i, k in enumerate(keys):
+            if dead is None or not dead[i]:
+                self._rows[k] = start + i
+        self._keys.extend(keys if dead is None else [None if dead[i] else k for i, k in enumerate(keys)])
+        self._payloads.extend(payloads if payloads is not None else [None] * len(keys))
+        self._n += len(keys)
+        new_rows = np.arange(start, self._n, dtype=np.int64)
+        if self._ivf is not None:
+            self._pending.extend(new_rows[self._alive[start:self._n]].tolist())
+        if self._quant is not None:
+            self._encode(start, self._n)
+        self.version += 1
+        self._maybe_reorganize()
+        return new_rows
+
+    # --- mutation ---
+    @_locked
+    def add(self, keys: List[str], vecs: np.ndarray, payloads: Optional[List[Dict[str, Any]]] = None) -> np.ndarray:
+        """Append (or replace) vectors into the RAM tail; existing keys are tombstoned."""
+        vecs = normalize(np.asarray(vecs, dtype=np.float32).reshape(len(keys), self.dim))
+        self._grow_tail(self._tail_n + len(keys))
+        self._tail[self._tail_n:self._tail_n + len(keys)] = vecs
+        self._tail_n += len(keys)
+        return self._register(keys, payloads)
+
+    @_locked
+    def attach(self, keys: List[str], matrix: np.ndarray, payloads: Optional[List[Dict[str, Any]]] = None, dead: Optional[np.ndarray] = None) -> np.ndarray:
+        """Attach a read-only, already normalised matrix (e.g. an mmap segment) without copying it.
+
+        `dead` marks rows that are tombstoned in the source and must never be returned.
+        """
+        if matrix.shape != (len(keys), self.dim):
+            raise ValueError("matrix shape does not match keys/dim")
+        self._seal_tail()
+        self._starts.append(self._n)
+        self._blocks.append(matrix)
+        self._tail_start = self._n + len(keys)
+        return self._register(keys, payloads, dead)
+
+    def _delete_row(self, key: str) -> bool:
+        row = self._rows.pop(key, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self._keys[row] = None
+        self._payloads[row] = None
+        return True
+
+    @_locked
+    def delete(self, keys: List[str]) -> int:
+        removed = sum(1 for k in keys if self._delete_row(k))
+        if removed:
+            self.version += 1
+        return removed
+
+    def _due(self) -> List[str]:
+        live = len(self._rows)
+        due = []
+        if self._quantizer_factory is not None and live >= self.quant_min_rows and (
+            self._quant is None or live >= self._quant_trained_rows * self.retrain_growth
+        ):
+            due.append("quantizer")
+        if live >= self.ivf_threshold:
+            if self._ivf is None or live >= self._ivf.trained_rows * self.retrain_growth:
+                due.append("ivf")
+            elif len(self._pending) > max(1024, self._ivf.trained_rows // 10):
+                due.append("lists")
+        return due
+
+    def _maybe_reorganize(self):
+        if self._reorganizing or not self._due():
+            return
+        if self._schedule is None:
+            self.reorganize()
+            return
+        self._reorganizing = True
+        try:
+            self._schedule(self._reorganize_background)
+        except Exception:
+            self._reorganizing = False
+            raise
+
+    def _reorganize_background(self):
+        try:
+            self.reorganize()
+        except Exception:
+            logger.exception("vector index reorganisation failed")
+        finally:
+            with self.lock:
+                self._reorganizing = False
+
+    def reorganize(self):
+        """Retrain the quantizer / IVF partition or rebuild the IVF lists, whichever is due."""
+        with self.lock:
+            due = self._due()
+        if "quantizer" in due:
+            self.train_quantizer()
+        if "ivf" in due:
+            self.train_ivf()
+        elif "lists" in due:
+            self._rebuild_lists()
+
+    def _snapshot(self):
+        with self.lock:
+            return self.live_rows(), self._n, self._view()
+
+    def _install_ivf(self, ivf: Optional[IVFPartition], n: int):
+        """Swap in a partition built over rows below `n`; live rows added since are pending."""
+        with self.lock:
+            self._ivf = ivf
+            self._pending = [] if ivf is None else (np.flatnonzero(self._alive[n:self._n]) + n).tolist()
+            self.version += 1
+
+    def train_ivf(self, nlist: Optional[int] = None, seed: int = 0):
+        rows, n, view = self._snapshot()
+        if rows.size == 0:
+            self._install_ivf(None, n)
+            return
+        nlist = min(rows.size, nlist or int(min(4096, max(1, 4 * math.sqrt(rows.size)))))
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(rows, size=min(rows.size, max(nlist, min(nlist * 64, _TRAIN_SAMPLE_MAX))), replace=False))
+        ivf = IVFPartition.train(self._gather_from(view, sample_rows), nlist, seed=seed)
+        ivf.rebuild_lists(self._gather_from(view, rows), rows)
+        self._install_ivf(ivf, n)
+
+    def _rebuild_lists(self):
+        rows, n, view = self._snapshot()
+        current = self._ivf
+        if current is None:
+            return
+        ivf = IVFPartition(current.centroids, current.order, current.offsets, current.trained_rows)
+        ivf.rebuild_lists(self._gather_from(view, rows), rows)
+        self._install_ivf(ivf, n)
+
+    def train_quantizer(self, sample_size: int = 65536, seed: int = 0):
+        rows, n, view = self._snapshot()
+        if self._quantizer_factory is None or rows.size == 0:
+            return
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(rows, size=min(rows.size, sample_size), replace=False))
+        quant = self._quantizer_factory(self._gather_from(view, sample_rows))
+        codes = self._encode_into(quant, None, view, 0, n)
+        with self.lock:  # rows added while encoding, then swap
+            self._codes = self._encode_into(quant, codes, self._view(), n, self._n)
+            self._quant = quant
+            self._quant_trained_rows = int(rows.size)
+            self.version += 1
+
+    def _encode(self, lo: int, hi: int):
+        """Encode rows [lo, hi) (dead rows too: their codes are simply never read)."""
+        self._codes = self._encode_into(self._quant, self._codes, self._view(), lo, hi)
+
+    def _encode_into(self, quant, codes: Optional[np.ndarray], view, lo: int, hi: int) -> np.ndarray:
+        cap = 0 if codes is None else codes.shape[0]
+        if hi > cap:
+            grown = np.zeros((max(hi, cap * 2, _INITIAL_CAPACITY), quant.code_size), dtype=np.uint8)
+            if cap:
+                grown[:cap] = codes
+            codes = grown
+        for start in range(lo, hi, _SCORE_BLOCK):
+            rows = np.arange(start, min(hi, start + _SCORE_BLOCK))
+            codes[rows] = quant.encode(self._gather_from(view, rows))
+        return codes
+
+    def _shortlist(self, q: np.ndarray, k: int, candidates: Optional[np.ndarray]) -> np.ndarray:
+        """Top-k live rows by ADC score over codes (all rows, or just `candidates`)."""
+        prepared = self._quant.prepare(q)
+        if candidates is not None:
+            candidates = candidates[self._alive[candidates]]
+            return candidates[_top_k(self._quant.scores(self._codes[candidates], prepared), k)]
+        scores = np.empty(self._n, dtype=np.float32)
+        for lo in range(0, self._n, _SCORE_BLOCK):
+            hi = min(self._n, lo + _SCORE_BLOCK)
+            scores[lo:hi] = self._quant.scores(self._codes[lo:hi], prepared)
+        scores[~self._alive[: self._n]] = -np.inf
+        top = _top_k(scores, k)
+        return top[np.isfinite(scores[top])]
+
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self._alive[: self._n])
+
+    # --- search ---
+    def _all_scores(self, qs: np.ndarray) -> np.ndarray:
+        """(n_rows, n_queries) inner products across every block; dead rows are -inf."""
+        scores = np.empty((self._n, qs.shape[0]), dtype=np.float32)
+        for start, blk in self._iter_blocks():
+            for lo in range(0, blk.shape[0], _SCORE_BLOCK):
+                chunk = np.asarray(blk[lo:lo + _SCORE_BLOCK], dtype=np.float32)
+                scores[start + lo:start + lo + chunk.shape[0]] = chunk @ qs.T
+        scores[~self._alive[: self._n]] = -np.inf
+        return scores
+
+    @_locked
+    def search_exact(self, q: np.ndarray, k: int, candidates: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        q = normalize(q)
+        if candidates is None:
+            scores = self._all_scores(q.reshape(1, -1))[:, 0]
+            top = _top_k(scores, k)
+            top = top[np.isfinite(scores[top])]
+            return top, scores[top]
+        candidates = candidates[self._alive[candidates]]
+        scores = self.gather(candidates) @ q
+        top = _top_k(scores, k)
+        return candidates[top], scores[top]
+
+    @_locked
+    def search(self, q: np.ndarray, k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, scores) for the k nearest live rows (inner product on unit vectors)."""
+        if self._ivf is None and self._quant is None:
+            return self.search_exact(q, k)
+        q = normalize(q)
+        cand = None
+        if self._ivf is not None:
+            cand = self._ivf.probe(q, nprobe or self.nprobe)
+            if self._pending:
+                cand = np.concatenate((cand, np.asarray(self._pending, dtype=np.int64)))
+        if self._quant is not None:
+            cand = self._shortlist(q, k * self.rerank, cand)
+        return self.search_exact(q, k, candidates=cand)
+
+    @_locked
+    def search_filtered(self, q: np.ndarray, k: int, rows: np.ndarray, prefilter_max: int = 20000,
+                        oversample: float = 1.5) -> Tuple[np.ndarray, np.ndarray]:
+        """k nearest among `rows` (e.g. a metadata filter's matches).
+
+        Selective filters (or a flat index) scan just the matching rows exactly. Broad
+        filters on an ANN index post-filter ``search`` results, oversampling by
+        1 / selectivity and doubling until k matches survive; if the ANN candidates
+        run out first it falls back to the exact scan of `rows`.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[rows < self._n]
+        rows = rows[self._alive[rows]]
+        if rows.size == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        live = len(self._rows)
+        if rows.size <= prefilter_max or (self._ivf is None and self._quant is None):
+            return self.search_exact(q, k, candidates=rows)
+        allowed = np.zeros(self._n, dtype=bool)
+        allowed[rows] = True
+        want = int(k * oversample * live / rows.size) + k
+        while True:
+            got, scores = self.search(q, want)
+            keep = allowed[got]
+            if keep.sum() >= k:
+                return got[keep][:k], scores[keep][:k]
+            if got.size < want or want >= live:
+                return self.search_exact(q, k, candidates=rows)
+            want *= 2
+
+    @_locked
+    def search_batch(self, qs: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact batched search: one matmul per block for all queries."""
+        qs = normalize(np.asarray(qs, dtype=np.float32).reshape(-1, self.dim))
+        if self._ivf is not None or self._quant is not None:
+            return [self.search(q, k) for q in qs]
+        scores = self._all_scores(qs)
+        out = []
+        for j in range(qs.shape[0]):
+            col = scores[:, j]
+            top = _top_k(col, k)
+            top = top[np.isfinite(col[top])]
+            out.append((top, col[top]))
+        return out
@@ -0,0 +1,251 @@
+"""Item-item co-click signals built from rec.click telemetry (Phase 5 follow-up).
+
+Offline/incremental job:
+  - streams `rec.click` events from telemetry_events from the last watermark minus a lateness window on
+    (ts-ordered, cursor batches)
+  - pairs clicks from the same anonId that fall within a session window
+  - accumulates symmetric co-click counts and writes a CSR artifact
+
+Artifact (directory):
+  coclick.bin         header | indptr uint64[n+1] | indices uint32[nnz] | data float32[nnz] | clicks float32[n]
+  coclick.json        { version, ids, watermarkTs, sessionWindowMs, nnz }
+  coclick.state.json  { watermarkTs, latenessMs, seen: [[ts, eventId], ...], recent: {anonId: [[ts, id], ...]} }
+                      – carried between incremental runs so pairs straddling the watermark are kept
+                      and events re-scanned in the lateness window are folded in once
+
+`ts` is client-supplied, so a click can be stored after newer ones were already
+folded in. Each run re-scans `latenessMs` behind the watermark (the highest ts seen)
+and skips the event ids it has already counted; clicks that arrive later than that
+behind the watermark are not counted until a `full` rebuild.
+
+The binary file is opened with mmap and read through memoryview casts, so lookups
+touch only the rows they need (O(nnz of row)) and replicas share page cache.
+"""
+from array import array
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+import asyncio, json, math, mmap, os, struct, sys, time
+
+MAGIC = b'RCC1'
+_HEADER = struct.Struct('<4sIQQ')  # magic, version, n_items, nnz
+FORMAT_VERSION = 1
+BIN_NAME = 'coclick.bin'
+META_NAME = 'coclick.json'
+STATE_NAME = 'coclick.state.json'
+MAX_RECENT = 50  # clicks remembered per anonId
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+
+def _le_bytes(arr: array) -> bytes:
+    if _BIG_ENDIAN:
+        arr = array(arr.typecode, arr); arr.byteswap()
+    return arr.tobytes()
+
+
+class CoClickMatrix:
+    """Read-only, memory-mapped CSR view over a co-click artifact."""
+
+    def __init__(self, ids: List[str], indptr, indices, data, clicks, meta: Dict[str, Any], mm: Optional[mmap.mmap] = None):
+        self.ids = ids
+        self.index = { cid: i for i, cid in enumerate(ids) }
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.clicks = clicks
+        self.meta = meta
+        self._mm = mm
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['CoClickMatrix']:
+        bin_path, meta_path = os.path.join(path, BIN_NAME), os.path.join(path, META_NAME)
+        if not (os.path.exists(bin_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(bin_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n, nnz = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or n != len(meta.get('ids', [])):
+            mm.close()
+            return None
+        if _BIG_ENDIAN:
+            # memoryview casts are native-endian; fall back to decoded copies on big-endian hosts
+            return cls.from_arrays(meta['ids'], *_read_sections_copy(mm, n, nnz), meta=meta)
+        view = memoryview(mm)
+        off = _HEADER.size
+        indptr = view[off:off + 8 * (n + 1)].cast('Q'); off += 8 * (n + 1)
+        indices = view[off:off + 4 * nnz].cast('I'); off += 4 * nnz
+        data = view[off:off + 4 * nnz].cast('f'); off += 4 * nnz
+        clicks = view[off:off + 4 * n].cast('f')
+        return cls(list(meta['ids']), indptr, indices, data, clicks, meta, mm)
+
+    @classmethod
+    def from_arrays(cls, ids, indptr, indices, data, clicks, meta=None) -> 'CoClickMatrix':
+        return cls(list(ids), indptr, indices, data, clicks, meta or {})
+
+    def row(self, content_id: str) -> Iterable[Tuple[int, float]]:
+        i = self.index.get(content_id)
+        if i is None:
+            return ()
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return zip(self.indices[lo:hi], self.data[lo:hi])
+
+    def neighbors(self, content_ids: Iterable[str]) -> Dict[str, float]:
+        """Cosine-normalised co-click affinity from the given items to every co-clicked item.
+
+        Cost is the sum of the touched rows' nnz; scores are clamped to 0..1.
+        """
+        out: Dict[str, float] = defaultdict(float)
+        seen = set()
+        for cid in content_ids:
+            i = self.index.get(cid)
+            if i is None or i in seen:
+                continue
+            seen.add(i)
+            ci = self.clicks[i] or 1.0
+            for j, c in self.row(cid):
+                cj = self.clicks[j] or 1.0
+                out[self.ids[j]] += c / math.sqrt(ci * cj)
+        return { k: min(1.0, v) for k, v in out.items() }
+
+    def to_counts(self) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
+        pairs: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for i, cid in enumerate(self.ids):
+            for j, c in self.row(cid):
+                pairs[cid][self.ids[j]] = float(c)
+        return pairs, { cid: float(self.clicks[i]) for i, cid in enumerate(self.ids) }
+
+
+def _read_sections_copy(mm, n: int, nnz: int):
+    off = _HEADER.size
+    out = []
+    for code, count in (('Q', n + 1), ('I', nnz), ('f', nnz), ('f', n)):
+        arr = array(code); size = arr.itemsize * count
+        arr.frombytes(mm[off:off + size]); arr.byteswap()
+        out.append(arr); off += size
+    return out
+
+
+def write_artifact(path: str, pairs: Dict[str, Dict[str, float]], clicks: Dict[str, float], meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialise symmetric co-click counts to CSR and atomically replace the artifact."""
+    os.makedirs(path, exist_ok=True)
+    ids = sorted(set(clicks) | set(pairs))
+    index = { cid: i for i, cid in enumerate(ids) }
+    indptr = array('Q', [0])
+    indices = array('I')
+    data = array('f')
+    for cid in ids:
+        row = sorted((index[o], c) for o, c in pairs.get(cid, {}).items() if o != cid)
+        indices.extend(j for j, _ in row)
+        data.extend(c for _, c in row)
+        indptr.append(len(indices))
+    counts = array('f', (clicks.get(cid, 0.0) for cid in ids))
+    meta = { **meta, 'version': FORMAT_VERSION, 'ids': ids, 'nnz': len(indices) }
+    bin_tmp = os.path.join(path, BIN_NAME + '.tmp')
+    meta_tmp = os.path.join(path, META_NAME + '.tmp')
+    with open(bin_tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(ids), len(indices)))
+        for arr in (indptr, indices, data, counts):
+            f.write(_le_bytes(arr))
+        f.flush(); os.fsync(f.fileno())
+    with open(meta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    # Readers validate n_items against meta, so a reader racing the two renames just skips the reload
+    os.replace(bin_tmp, os.path.join(path, BIN_NAME))
+    os.replace(meta_tmp, os.path.join(path, META_NAME))
+    return meta
+
+
+def _load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(path, STATE_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(path: str, state: Dict[str, Any]) -> None:
+    tmp = os.path.join(path, STATE_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, STATE_NAME))
+
+
+def _load_existing(path: str):
+    existing = CoClickMatrix.load(path)
+    if not existing:
+        return None
+    pairs, clicks = existing.to_counts()
+    state = _load_state(path)
+    if int(state.get('watermarkTs', -1)) != int(existing.meta.get('watermarkTs', 0)):
+        state = {}  # state from another build; start session windows afresh
+    elif 'seen' not in state:  # written before the lateness window: only ids at the watermark ts
+        state['seen'] = [[state['watermarkTs'], e] for e in state.get('watermarkIds') or []]
+    return pairs, clicks, int(existing.meta.get('watermarkTs', 0)), state
+
+
+async def build_coclick(db, path: str, batch_size: int = 1000, session_window_ms: int = 1800000,
+                        lateness_ms: int = 1800000, full: bool = False) -> Dict[str, Any]:
+    """Incrementally fold new rec.click events into the co-click artifact at `path`.
+
+    Clicks are streamed in ts order from `lateness_ms` before the stored watermark on,
+    skipping the event ids already folded in, unless `full`. Per-user session windows are
+    restored from the previous run. File I/O runs in a worker thread.
+    """
+    started = time.time()
+    loaded = None if full else await asyncio.to_thread(_load_existing, path)
+    if loaded:
+        pairs, clicks, watermark, state = loaded
+    else:
+        pairs, clicks, watermark, state = {}, {}, 0, {}
+    pairs = defaultdict(dict, pairs)
+    recent: Dict[str, Deque[Tuple[int, str]]] = defaultdict(deque)
+    for user, items in (state.get('recent') or {}).items():
+        recent[user] = deque((int(t), c) for t, c in items)
+    seen: Dict[str, int] = { str(e): int(t) for t, e in state.get('seen') or [] }  # event id -> ts, within the lateness window
+    events = 0
+    # the seen ids only cover the previous run's window; re-scanning further back would double count
+    rescan_ms = min(lateness_ms, int(state.get('latenessMs', 0))) if loaded else lateness_ms
+    query = {'type': 'rec.click', 'ts': {'$gte': max(0, watermark - rescan_ms)}}
+    cursor = db.telemetry_events.find(query, {'_id': 1, 'ts': 1, 'anonId': 1, 'data.id': 1}).sort('ts', 1).batch_size(batch_size)
+    async for ev in cursor:
+        ts = int(ev.get('ts') or 0)
+        eid = str(ev.get('_id'))
+        if eid in seen:
+            continue  # folded in by a previous run
+        seen[eid] = ts
+        watermark = max(watermark, ts)
+        cid = (ev.get('data') or {}).get('id')
+        user = ev.get('anonId')
+        if not cid or not user:
+            continue
+        events += 1
+        clicks[cid] = clicks.get(cid, 0.0) + 1.0
+        window = recent[user]
+        while window and ts - window[0][0] > session_window_ms:
+            window.popleft()
+        for t, other in window:
+            if other == cid or abs(ts - t) > session_window_ms:
+                continue  # restored windows can hold clicks newer than a late event
+            pairs[cid][other] = pairs[cid].get(other, 0.0) + 1.0
+            pairs[other][cid] = pairs[other].get(cid, 0.0) + 1.0
+        window.append((ts, cid))
+        if len(window) > MAX_RECENT:
+            window.popleft()
+    # only clicks that can still pair with future (or re-scanned late) clicks are carried forward
+    horizon = watermark - lateness_ms
+    carry = {u: [[t, c] for t, c in w if t >= horizon - session_window_ms] for u, w in recent.items()}
+    state = {'watermarkTs': watermark, 'latenessMs': lateness_ms,
+             'seen': sorted([t, e] for e, t in seen.items() if t >= horizon),
+             'recent': {u: w for u, w in carry.items() if w}}
+    meta_in = {'watermarkTs': watermark, 'sessionWindowMs': session_window_ms, 'builtTs': int(time.time()*1000)}
+    meta = await asyncio.to_thread(write_artifact, path, pairs, clicks, meta_in)
+    await asyncio.to_thread(_write_state, path, state)
+    return { 'events': events, 'items': len(meta['ids']), 'nnz': meta['nnz'], 'watermarkTs': watermark, 'durationMs': round((time.time() - started) * 1000, 2) }
@@ -1,12 +1,15 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Tuple
-import os, math, time, hashlib
+import asyncio, os, math, time, hashlib, heapq
+from itertools import islice
 from datetime import datetime
 
 # Phase 5 Step 1-4: Data contract, heuristic scoring, experiment assignment, API endpoint
 
 from motor.motor_asyncio import AsyncIOMotorClient
+from .snapshots import MasterySnapshotStore
+from .coclick import CoClickMatrix, build_coclick
 
 MONGODB_URI = os.getenv('RECS_MONGODB_URI','mongodb://localhost:27017/edu')
 MONGODB_DB = os.getenv('RECS_MONGODB_DB','edu')
@@ -43,17 +46,31 @@ class RecommendationResponse(BaseModel):
     generatedTs: int
     heuristic: Dict[str, float]
     algorithm: str
+    partial: bool = False  # True when the scoring deadline cut the candidate scan short
 
 # --- In-memory stores (placeholder; real impl would query other services or a DB) ---
 CONTENT_STORE: Dict[str, ContentMeta] = {}  # local cache
 LEARNER_STATES: Dict[str, LearnerState] = {}  # in-memory write through cache
 CACHE: Dict[str, Dict[str, any]] = {}  # key -> { ts, data }
-METRICS = { 'cache_hits': 0, 'cache_misses': 0 }
-MASTERY_SNAPSHOTS: Dict[str, List[Dict[str, any]]] = {}  # learnerId -> list of { ts, mastery }
+METRICS = { 'cache_hits': 0, 'cache_misses': 0, 'scored_responses': 0, 'partial_responses': 0, 'chunks_processed': 0 }
 
 RECS_ENABLED = (os.getenv('RECOMMENDATIONS_ENABLED', 'true').lower() == 'true')
 CACHE_TTL_MS = int(os.getenv('RECS_CACHE_TTL_MS','180000'))  # 3 min default
 API_TIMEOUT_MS = int(os.getenv('RECS_TIMEOUT_MS','200'))
+SCORE_DEADLINE_MS = float(os.getenv('RECS_SCORE_DEADLINE_MS', str(API_TIMEOUT_MS * 0.8)))  # budget from request start
+SCORE_CHUNK_SIZE = max(1, int(os.getenv('RECS_SCORE_CHUNK_SIZE','64')))
+RANK_WINDOW = max(1, int(os.getenv('RECS_RANK_WINDOW','4096')))  # candidates gap-ordered per window before scoring
+SNAPSHOT_BATCH_SIZE = int(os.getenv('RECS_SNAPSHOT_BATCH_SIZE','500'))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv('RECS_SNAPSHOT_RETENTION_DAYS','0'))  # 0 = keep forever
+
+SNAPSHOT_STORE = MasterySnapshotStore(db, batch_size=SNAPSHOT_BATCH_SIZE)
+
+# Item-item co-click artifact (built offline from rec.click telemetry; memory-mapped)
+COCLICK_PATH = os.getenv('RECS_COCLICK_PATH', os.path.join('data', 'recs_coclick'))
+COCLICK_BATCH_SIZE = int(os.getenv('RECS_COCLICK_BATCH_SIZE','1000'))
+COCLICK_SESSION_MS = int(os.getenv('RECS_COCLICK_SESSION_MS','1800000'))  # 30 min co-click window
+COCLICK_LATENESS_MS = int(os.getenv('RECS_COCLICK_LATENESS_MS','1800000'))  # re-scanned behind the watermark for late clicks
+COCLICK: Optional[CoClickMatrix] = None
 
 # Seed some demo content (idempotent)
 async def _seed():
@@ -97,6 +114,7 @@ WEIGHTS = {
     'diversity_penalty': float(os.getenv('REC_W_DIVERSITY_PEN', '0.1')),
 }
 SIMILARITY_WEIGHT = float(os.getenv('REC_W_SIMILARITY', '0.3'))  # used in explore variant
+COCLICK_WEIGHT = float(os.getenv('REC_W_COCLICK', '0.2'))  # used in explore variant
 
 TARGET_DIFFICULTY = int(os.getenv('REC_TARGET_DIFFICULTY', '3'))
 FRESHNESS_DECAY_DAYS = float(os.getenv('REC_FRESHNESS_DAYS', '30'))
@@ -145,7 +163,12 @@ def _similarity_score(learner: LearnerState, content: ContentMeta) -> float:
     # Normalize by max possible sum (len(content.topics))
     return sum(gaps) / len(content.topics)
 
-def score_content(learner: LearnerState, variant: str, content: ContentMeta) -> Tuple[float, List[str]]:
+def _coclick_affinity(learner: LearnerState) -> Dict[str, float]:
+    # One O(nnz) pass over the rows of recently consumed items; shared by every candidate
+    if COCLICK is None or not learner.recentContentIds: return {}
+    return COCLICK.neighbors(learner.recentContentIds[-5:])
+
+def score_content(learner: LearnerState, variant: str, content: ContentMeta, coclick: Optional[Dict[str, float]] = None) -> Tuple[float, List[str]]:
     # Optionally adjust weights per variant later
     topic_gap = _topic_gap_score(learner, content)
     freshness = _freshness_score(content)
@@ -158,17 +181,52 @@ def score_content(learner: LearnerState, variant: str, content: ContentMeta) ->
         div_pen * WEIGHTS['diversity_penalty']
     )
     similarity = 0.0
+    co = 0.0
     if variant == 'explore':  # hybrid scoring branch (Step 14)
         similarity = _similarity_score(learner, content)
         base_score += similarity * SIMILARITY_WEIGHT
+        co = (coclick or {}).get(content.id, 0.0)
+        base_score += co * COCLICK_WEIGHT
     reasons = []
     if topic_gap > 0.5: reasons.append('addresses_gap')
     if freshness > 0.7: reasons.append('fresh')
     if diff_match > 0.7: reasons.append('difficulty_fit')
     if div_pen > 0.6: reasons.append('low_diversity_penalty')
     if similarity > 0.5: reasons.append('similarity')
+    if co > 0.3: reasons.append('co_clicked')
     return base_score, reasons
 
+def rank_candidates(learner: LearnerState, variant: str, deadline_ms: float) -> Tuple[List[RecommendationItem], bool, int]:
+    """Anytime scoring: highest-gap candidates first, in chunks, until the deadline approaches.
+
+    Candidates are taken in windows of RANK_WINDOW and heap-ordered by gap per window, so the
+    work done before a deadline check is bounded. Returns (scored items, partial flag, chunks
+    processed). At least one chunk is always scored.
+    """
+    recent = set(learner.recentContentIds[-10:])  # skip very recent repeats
+    pool = (c for c in CONTENT_STORE.values() if c.id not in recent)
+    coclick = _coclick_affinity(learner) if variant == 'explore' else None
+    scored: List[RecommendationItem] = []
+    chunks = 0
+    chunk_start = time.time()*1000
+    while True:
+        window = list(islice(pool, RANK_WINDOW))
+        if not window:
+            return scored, False, chunks
+        heap = [ (-_topic_gap_score(learner, c), i) for i, c in enumerate(window) ]
+        heapq.heapify(heap)  # O(window); each chunk then pops only what it scores
+        while heap:
+            if chunks:
+                now = time.time()*1000
+                per_chunk = (now - chunk_start) / chunks
+                if now + per_chunk >= deadline_ms:
+                    return scored, True, chunks
+            for _ in range(min(SCORE_CHUNK_SIZE, len(heap))):
+                c = window[heapq.heappop(heap)[1]]
+                s, reasons = score_content(learner, variant, c, coclick)
+                scored.append(RecommendationItem(id=c.id, score=round(float(s),6), rank=-1, reason=reasons, variant=variant))
+            chunks += 1
+
 # --- API Endpoint (Step 2 + 3 + 4 integration) ---
 @app.get('/v1/recommendations/{learner_id}', response_model=RecommendationResponse)
 async def get_recommendations(learner_id: str, limit: int = 5, forceVariant: Optional[str] = None):
@@ -193,12 +251,11 @@ async def get_recommendations(learner_id: str, limit: int = 5, forceVariant: Opt
         LEARNER_STATES[learner_id] = learner
     allow_force = os.getenv('ALLOW_FORCE_VARIANT','0') == '1'
     variant = forceVariant if (allow_force and forceVariant in VARIANTS) else assign_variant(learner_id)
-    scored: List[RecommendationItem] = []
-    for c in CONTENT_STORE.values():
-        if c.id in learner.recentContentIds[-10:]:
-            continue  # skip very recent repeats
-        s, reasons = score_content(learner, variant, c)
-        scored.append(RecommendationItem(id=c.id, score=round(float(s),6), rank=-1, reason=reasons, variant=variant))
+    scored, partial, chunks = rank_candidates(learner, variant, start + SCORE_DEADLINE_MS)
+    METRICS['scored_responses'] += 1
+    METRICS['chunks_processed'] += chunks
+    if partial:
+        METRICS['partial_responses'] += 1
     scored.sort(key=lambda x: x.score, reverse=True)
     for i, item in enumerate(scored):
         item.rank = i + 1
@@ -210,11 +267,12 @@ async def get_recommendations(learner_id: str, limit: int = 5, forceVariant: Opt
         items=items,
         generatedTs=int(time.time()*1000),
         heuristic=WEIGHTS,
-        algorithm=algorithm
+        algorithm=algorithm,
+        partial=partial
     )
     # timeout guard
-    if (time.time()*1000 - start) > API_TIMEOUT_MS:
-        # skip caching if too slow to encourage re-compute
+    if partial or (time.time()*1000 - start) > API_TIMEOUT_MS:
+        # skip caching best-so-far / slow results to encourage re-compute
         return resp
     CACHE[cache_key] = { 'ts': now_ms, 'data': resp }
     return resp
@@ -243,28 +301,35 @@ async def update_state(learner_id: str, payload: MasteryUpdate):
 
 @app.post('/v1/recommendations/snapshots/run')
 async def run_mastery_snapshot():
-    """Capture current mastery for all learners (Step 10 batch snapshot)."""
+    """Capture current mastery for all persisted learners (Step 10 batch snapshot)."""
     now = int(time.time()*1000)
-    count = 0
-    # Ensure we have loaded any unseen learners? (skip for simplicity)
-    for lid, st in LEARNER_STATES.items():
-        snap = { 'ts': now, 'mastery': st.mastery.copy() }
-        arr = MASTERY_SNAPSHOTS.setdefault(lid, [])
-        arr.append(snap)
-        # keep last 24 snapshots
-        if len(arr) > 24: arr[:] = arr[-24:]
-        count += 1
-    return { 'snapshotsCreated': count }
+    count = await SNAPSHOT_STORE.snapshot_all(now)
+    return { 'snapshotsCreated': count, 'ts': now }
 
 @app.get('/v1/recommendations/{learner_id}/snapshots')
-async def list_snapshots(learner_id: str):
-    return { 'learnerId': learner_id, 'snapshots': MASTERY_SNAPSHOTS.get(learner_id, []) }
+async def list_snapshots(learner_id: str, since: Optional[int] = None, until: Optional[int] = None, limit: int = 24):
+    limit = max(1, min(limit, 500))
+    snaps = await SNAPSHOT_STORE.list_snapshots(learner_id, since=since, until=until, limit=limit)
+    return { 'learnerId': learner_id, 'snapshots': snaps }
+
+@app.post('/v1/recommendations/coclick/rebuild')
+async def rebuild_coclick(full: bool = False):
+    """Fold new rec.click telemetry into the co-click artifact and hot-swap it."""
+    global COCLICK
+    stats = await build_coclick(db, COCLICK_PATH, batch_size=COCLICK_BATCH_SIZE, session_window_ms=COCLICK_SESSION_MS,
+                                lateness_ms=COCLICK_LATENESS_MS, full=full)
+    COCLICK = await asyncio.to_thread(CoClickMatrix.load, COCLICK_PATH)
+    CACHE.clear()
+    return stats
 
 @app.on_event('startup')
 async def _startup():
+    global COCLICK
     # Indexes
     await db.recs_content.create_index('id', unique=True)
     await db.recs_learners.create_index('learnerId', unique=True)
+    await SNAPSHOT_STORE.ensure_indexes(SNAPSHOT_RETENTION_DAYS or None)
+    COCLICK = CoClickMatrix.load(COCLICK_PATH)
     await _seed()
 
 @app.get('/healthz')
@@ -273,4 +338,8 @@ async def health():
 
 @app.get('/metrics')
 async def metrics():
-    return { **METRICS, 'cache_size': len(CACHE) }
+    scored = METRICS['scored_responses']
+    return { **METRICS, 'cache_size': len(CACHE),
+             'partial_rate': (METRICS['partial_responses'] / scored) if scored else 0.0,
+             'avg_chunks_per_response': (METRICS['chunks_processed'] / scored) if scored else 0.0,
+             'coclick_items': len(COCLICK.ids) if COCLICK else 0, 'coclick_nnz': COCLICK.nnz if COCLICK else 0 }
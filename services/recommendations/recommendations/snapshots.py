@@ -0,0 +1,146 @@
+"""Persistent mastery snapshot store (Step 10 follow-up).
+
+Snapshots are stored compactly: each document holds two packed little-endian
+arrays (uint32 topic indices + float32 mastery values) that reference a shared
+topic dictionary document, instead of a dict of topic -> float per snapshot.
+
+Layout:
+  recs_snapshot_topics  { _id: 'topics', topics: [t0, t1, ...] }   (append-only)
+  recs_mastery_snapshots { learnerId, ts, createdAt, idx: <bytes>, val: <bytes> }
+
+A topic's id is its position in the dictionary array. New topics are appended
+with a ``$push`` that only matches while the array still has the length this
+replica last read, so ids are assigned exactly once and never move; a replica
+that loses the race reloads and retries with what is still missing.
+"""
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import sys
+
+from pymongo import InsertOne
+from pymongo.errors import DuplicateKeyError
+
+_BIG_ENDIAN = sys.byteorder == 'big'
+TOPICS_DOC_ID = 'topics'
+
+
+def pack_mastery(mastery: Dict[str, float], topic_index: Dict[str, int]) -> Tuple[bytes, bytes]:
+    """Pack topic->mastery into (uint32 indices, float32 values) byte strings sorted by index."""
+    pairs = sorted((topic_index[t], float(v)) for t, v in mastery.items())
+    idx = array('I', (p[0] for p in pairs))
+    val = array('f', (p[1] for p in pairs))
+    if _BIG_ENDIAN:
+        idx.byteswap(); val.byteswap()
+    return idx.tobytes(), val.tobytes()
+
+
+def unpack_mastery(idx_bytes: bytes, val_bytes: bytes, topics: List[str]) -> Dict[str, float]:
+    idx = array('I'); idx.frombytes(idx_bytes)
+    val = array('f'); val.frombytes(val_bytes)
+    if _BIG_ENDIAN:
+        idx.byteswap(); val.byteswap()
+    # float32 round-trip; trim noise so API output stays readable
+    return { topics[i]: round(v, 6) for i, v in zip(idx, val) if i < len(topics) }
+
+
+class MasterySnapshotStore:
+    """Mongo-backed snapshot store shared by all replicas."""
+
+    def __init__(self, db, batch_size: int = 500):
+        self.db = db
+        self.col = db.recs_mastery_snapshots
+        self.topics_col = db.recs_snapshot_topics
+        self.batch_size = max(1, batch_size)
+        self._topics: List[str] = []
+        self._topic_index: Dict[str, int] = {}
+
+    async def ensure_indexes(self, retention_days: Optional[int] = None):
+        await self.col.create_index([('learnerId', 1), ('ts', -1)])
+        if retention_days:
+            await self.col.create_index('createdAt', name='snap_ttl', expireAfterSeconds=int(retention_days) * 86400)
+
+    async def _load_topics(self):
+        doc = await self.topics_col.find_one({'_id': TOPICS_DOC_ID})
+        topics = (doc or {}).get('topics') or []
+        # Dictionary is append-only, so a longer list is always a superset of what we hold
+        if len(topics) >= len(self._topics):
+            self._topics = list(topics)
+            self._topic_index = { t: i for i, t in enumerate(self._topics) }
+
+    async def topic_index(self, topics: Iterable[str]) -> Dict[str, int]:
+        """Return the shared dictionary, registering unseen topics atomically."""
+        missing = sorted({ t for t in topics if t not in self._topic_index })
+        while missing:
+            known = len(self._topics)
+            try:
+                res = await self.topics_col.update_one(
+                    {'_id': TOPICS_DOC_ID, 'topics': {'$size': known}},
+                    {'$push': {'topics': {'$each': missing}}},
+                    upsert=known == 0,
+                )
+                appended = res.matched_count > 0 or res.upserted_id is not None
+            except DuplicateKeyError:  # upsert raced a replica that created the document first
+                appended = False
+            if appended:
+                self._topics.extend(missing)
+                self._topic_index.update((t, known + i) for i, t in enumerate(missing))
+                break
+            # another replica appended first: our ids would shift, so reload and retry
+            await self._load_topics()
+            missing = [ t for t in missing if t not in self._topic_index ]
+        return self._topic_index
+
+    async def _flush(self, ops: List[Any]) -> int:
+        if not ops:
+            return 0
+        await self.col.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    async def snapshot_all(self, ts: int) -> int:
+        """Snapshot every learner in recs_learners, streaming with a cursor and writing in batches.
+
+        recs_learners is the write-through source of truth, so replicas never snapshot stale local state.
+        """
+        created_at = datetime.fromtimestamp(ts / 1000, timezone.utc)
+        count = 0
+        ops: List[Any] = []
+        cursor = self.db.recs_learners.find({}, {'learnerId': 1, 'mastery': 1}).batch_size(self.batch_size)
+        async for doc in cursor:
+            lid = doc.get('learnerId')
+            if not lid:
+                continue
+            mastery = doc.get('mastery') or {}
+            index = await self.topic_index(mastery.keys())
+            idx, val = pack_mastery(mastery, index)
+            ops.append(InsertOne({'learnerId': lid, 'ts': ts, 'createdAt': created_at, 'idx': idx, 'val': val}))
+            if len(ops) >= self.batch_size:
+                count += await self._flush(ops)
+                ops = []
+        count += await self._flush(ops)
+        return count
+
+    async def list_snapshots(self, learner_id: str, since: Optional[int] = None, until: Optional[int] = None, limit: int = 24) -> List[Dict[str, Any]]:
+        """Return snapshots in ascending ts order for [since, until], newest `limit` kept."""
+        query: Dict[str, Any] = {'learnerId': learner_id}
+        rng: Dict[str, int] = {}
+        if since is not None: rng['$gte'] = since
+        if until is not None: rng['$lte'] = until
+        if rng: query['ts'] = rng
+        cursor = self.col.find(query, {'_id': 0, 'ts': 1, 'idx': 1, 'val': 1}).sort('ts', -1).limit(limit)
+        docs = await cursor.to_list(length=limit)
+        if not self._topics or any(_max_index(d.get('idx', b'')) >= len(self._topics) for d in docs):
+            await self._load_topics()
+        out = [ {'ts': d['ts'], 'mastery': unpack_mastery(d.get('idx', b''), d.get('val', b''), self._topics)} for d in docs ]
+        out.reverse()
+        return out
+
+
+def _max_index(idx_bytes: bytes) -> int:
+    # Indices are packed sorted, so the last element is the max
+    if len(idx_bytes) < 4:
+        return -1
+    tail = array('I'); tail.frombytes(idx_bytes[-4:])
+    if _BIG_ENDIAN:
+        tail.byteswap()
+    return tail[0]
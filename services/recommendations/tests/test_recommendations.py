@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from recommendations.main import app
 import os, time
@@ -52,3 +53,182 @@ def test_mastery_snapshot_batch():
     assert r['snapshotsCreated'] >= 2
     snaps = client.get('/v1/recommendations/l1/snapshots').json()
     assert snaps['snapshots'] and 'mastery' in snaps['snapshots'][0]
+
+def test_mastery_snapshot_pack_roundtrip():
+    from recommendations.snapshots import pack_mastery, unpack_mastery
+    topics = ['algebra', 'geometry', 'fractions']
+    index = { t: i for i, t in enumerate(topics) }
+    idx, val = pack_mastery({'fractions': 0.25, 'algebra': 0.5}, index)
+    assert len(idx) == 8 and len(val) == 8  # 2 x uint32, 2 x float32
+    assert unpack_mastery(idx, val, topics) == {'algebra': 0.5, 'fractions': 0.25}
+
+def test_mastery_snapshot_time_range():
+    client.post('/v1/recommendations/l_range/state', json={'mastery': {'algebra': 0.3}})
+    first = client.post('/v1/recommendations/snapshots/run').json()
+    client.post('/v1/recommendations/l_range/state', json={'mastery': {'algebra': 0.7}})
+    time.sleep(0.002)
+    second = client.post('/v1/recommendations/snapshots/run').json()
+    snaps = client.get(f"/v1/recommendations/l_range/snapshots?since={second['ts']}").json()['snapshots']
+    assert snaps and all(s['ts'] >= second['ts'] for s in snaps)
+    assert abs(snaps[-1]['mastery']['algebra'] - 0.7) < 1e-6
+    older = client.get(f"/v1/recommendations/l_range/snapshots?until={first['ts']}").json()['snapshots']
+    assert all(s['ts'] <= first['ts'] for s in older)
+
+def test_coclick_artifact_roundtrip(tmp_path):
+    from recommendations.coclick import CoClickMatrix, write_artifact
+    pairs = {'c1': {'c2': 3.0, 'c3': 1.0}, 'c2': {'c1': 3.0}, 'c3': {'c1': 1.0}}
+    clicks = {'c1': 4.0, 'c2': 3.0, 'c3': 1.0, 'c4': 2.0}
+    write_artifact(str(tmp_path), pairs, clicks, {'watermarkTs': 123})
+    m = CoClickMatrix.load(str(tmp_path))
+    assert m is not None and m.nnz == 4 and m.meta['watermarkTs'] == 123
+    assert dict((m.ids[j], c) for j, c in m.row('c1')) == {'c2': 3.0, 'c3': 1.0}
+    aff = m.neighbors(['c1'])
+    assert set(aff) == {'c2', 'c3'} and aff['c2'] > aff['c3']
+    assert m.neighbors(['c4']) == {} and m.neighbors(['missing']) == {}
+
+def test_rank_candidates_deadline_partial(monkeypatch):
+    from recommendations import main as rm
+    monkeypatch.setattr(rm, 'SCORE_CHUNK_SIZE', 2)
+    store = { f'dl{i}': rm.ContentMeta(id=f'dl{i}', topics=['algebra' if i % 2 else 'geometry'], createdTs=int(time.time()*1000)) for i in range(6) }
+    monkeypatch.setattr(rm, 'CONTENT_STORE', store)
+    learner = rm.LearnerState(learnerId='dl', mastery={'geometry': 0.9, 'algebra': 0.1})
+    full, partial, chunks = rm.rank_candidates(learner, 'control', time.time()*1000 + 10000)
+    assert not partial and chunks == 3 and len(full) == 6
+    # Deadline already passed: only the first (highest-gap) chunk is scored
+    cut, partial, chunks = rm.rank_candidates(learner, 'control', 0)
+    assert partial and chunks == 1 and len(cut) == 2
+    assert all('algebra' in store[it.id].topics for it in cut)
+
+def test_rank_candidates_orders_only_the_current_window(monkeypatch):
+    from recommendations import main as rm
+    monkeypatch.setattr(rm, 'SCORE_CHUNK_SIZE', 2)
+    monkeypatch.setattr(rm, 'RANK_WINDOW', 4)
+    store = { f'rw{i}': rm.ContentMeta(id=f'rw{i}', topics=['algebra' if i % 2 else 'geometry'], createdTs=int(time.time()*1000)) for i in range(40) }
+    monkeypatch.setattr(rm, 'CONTENT_STORE', store)
+    calls = []
+    gap = rm._topic_gap_score
+    monkeypatch.setattr(rm, '_topic_gap_score', lambda learner, c: calls.append(c.id) or gap(learner, c))
+    learner = rm.LearnerState(learnerId='rw', mastery={'geometry': 0.9, 'algebra': 0.1})
+    cut, partial, chunks = rm.rank_candidates(learner, 'control', 0)
+    # Past the deadline after the first chunk: only the first window was gap-ordered
+    assert partial and chunks == 1 and len(calls) == 4 + 2  # window ordering + score_content
+    assert [it.id for it in cut] == ['rw1', 'rw3']
+    full, partial, chunks = rm.rank_candidates(learner, 'control', time.time()*1000 + 10000)
+    assert not partial and chunks == 20 and len(full) == 40
+
+class _FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction):
+        self._docs = sorted(self._docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for d in self._docs:
+            yield d
+
+
+class _FakeEvents:
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query, projection=None):
+        lo = query['ts'].get('$gte', query['ts'].get('$gt', 0) + 1)
+        return _FakeCursor([d for d in self.docs if d['type'] == query['type'] and d['ts'] >= lo])
+
+
+@pytest.mark.asyncio
+async def test_build_coclick_incremental(tmp_path):
+    from types import SimpleNamespace
+    from recommendations.coclick import CoClickMatrix, build_coclick
+    db = SimpleNamespace(telemetry_events=_FakeEvents())
+    seq = iter(range(1000))
+
+    def click(ts, anon, cid):
+        db.telemetry_events.docs.append({'_id': next(seq), 'type': 'rec.click', 'ts': ts, 'anonId': anon, 'data': {'id': cid}})
+
+    click(1000, 'u1', 'a'); click(2000, 'u1', 'b'); click(2000, 'u2', 'a')
+    click(2500, None, 'z')  # no anonId: counted for nothing
+    stats = await build_coclick(db, str(tmp_path), session_window_ms=10000)
+    assert stats['events'] == 3 and stats['watermarkTs'] == 2500
+
+    # straddles the watermark (u1 clicked a, b before) + late event sharing the watermark ts
+    click(3000, 'u1', 'c'); click(2500, 'u2', 'c')
+    stats = await build_coclick(db, str(tmp_path), session_window_ms=10000)
+    assert stats['events'] == 2
+    m = CoClickMatrix.load(str(tmp_path))
+    rows = {cid: dict((m.ids[j], c) for j, c in m.row(cid)) for cid in m.ids}
+    assert rows['c'] == {'a': 2.0, 'b': 1.0}
+    assert rows['a'] == {'b': 1.0, 'c': 2.0}
+
+    # re-running folds nothing in twice
+    stats = await build_coclick(db, str(tmp_path), session_window_ms=10000)
+    assert stats['events'] == 0
+    again = await build_coclick(db, str(tmp_path), session_window_ms=10000, full=True)
+    assert again['events'] == 5 and CoClickMatrix.load(str(tmp_path)).to_counts() == m.to_counts()
+
+    # stored late with an older ts: re-scanned behind the watermark (3000) and folded in once
+    click(2800, 'u2', 'b')
+    stats = await build_coclick(db, str(tmp_path), session_window_ms=10000)
+    assert stats['events'] == 1 and stats['watermarkTs'] == 3000
+    rows = {cid: dict((m.ids[j], c) for j, c in m.row(cid)) for m in [CoClickMatrix.load(str(tmp_path))] for cid in m.ids}
+    assert rows['b'] == {'a': 2.0, 'c': 2.0}
+    assert (await build_coclick(db, str(tmp_path), session_window_ms=10000))['events'] == 0
+    # later than the lateness window: left for a full rebuild
+    click(1500, 'u3', 'a')
+    assert (await build_coclick(db, str(tmp_path), session_window_ms=10000, lateness_ms=1000))['events'] == 0
+    assert (await build_coclick(db, str(tmp_path), session_window_ms=10000))['events'] == 0  # window never widens
+    assert (await build_coclick(db, str(tmp_path), session_window_ms=10000, full=True))['events'] == 7
+
+
+class _FakeTopics:
+    """Just enough of a collection for the topic dictionary: $size-guarded $push with upsert."""
+
+    def __init__(self, before_update=None):
+        self.doc = None
+        self.before_update = before_update  # lets a test interleave another replica's write
+
+    async def find_one(self, query):
+        return None if self.doc is None else {'_id': self.doc['_id'], 'topics': list(self.doc['topics'])}
+
+    async def update_one(self, query, update, upsert=False):
+        from types import SimpleNamespace
+        from pymongo.errors import DuplicateKeyError
+        if self.before_update is not None:
+            hook, self.before_update = self.before_update, None
+            await hook()
+        new = update['$push']['topics']['$each']
+        if self.doc is not None and len(self.doc['topics']) == query['topics']['$size']:
+            self.doc['topics'].extend(new)
+            return SimpleNamespace(matched_count=1, upserted_id=None)
+        if upsert:
+            if self.doc is not None:
+                raise DuplicateKeyError('topics')
+            self.doc = {'_id': query['_id'], 'topics': list(new)}
+            return SimpleNamespace(matched_count=0, upserted_id=query['_id'])
+        return SimpleNamespace(matched_count=0, upserted_id=None)
+
+
+@pytest.mark.asyncio
+async def test_topic_ids_stable_across_racing_replicas():
+    from types import SimpleNamespace
+    from recommendations.snapshots import MasterySnapshotStore
+    topics = _FakeTopics()
+    a = MasterySnapshotStore(SimpleNamespace(recs_mastery_snapshots=None, recs_snapshot_topics=topics))
+    b = MasterySnapshotStore(SimpleNamespace(recs_mastery_snapshots=None, recs_snapshot_topics=topics))
+    assert dict(await a.topic_index(['fractions', 'algebra'])) == {'algebra': 0, 'fractions': 1}
+
+    # b is stale and loses the race to a: it must reload rather than guess ids
+    topics.before_update = lambda: a.topic_index(['geometry'])
+    index = await b.topic_index(['calculus', 'algebra'])
+    assert topics.doc['topics'] == ['algebra', 'fractions', 'geometry', 'calculus']
+    assert dict(index) == {t: i for i, t in enumerate(topics.doc['topics'])}
+    assert await a.topic_index(['calculus']) and a._topic_index['calculus'] == 3
+
@@ -2,9 +2,10 @@
 
 Provides collections with a minimal subset of Motor/PyMongo async collection methods:
 - find_one
-- insert_one
+- find (equality filters; async-iterable cursor with batch_size / to_list)
+- insert_one / insert_many
 - update_one (supports $inc, $set, upsert)
-- delete_many
+- delete_many (equality and $in)
 - estimated_document_count
 
 Use: from tests.fakes.inmemory_db import InMemoryMongoClient
@@ -41,6 +42,35 @@ def _get_nested(d: Dict[str, Any], path: str):
     return cur
 
 
+def _matches(d: Dict[str, Any], filt: dict) -> bool:
+    for k, v in filt.items():
+        got = d.get(k) if k == "_id" else _get_nested(d, k)
+        if isinstance(v, dict) and "$in" in v:
+            if got not in v["$in"]:
+                return False
+        elif got != v:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs: list):
+        self._docs = docs
+
+    def batch_size(self, n: int):
+        return self
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for d in self._docs:
+            yield d
+
+    async def to_list(self, length=None):
+        return self._docs[:length] if length else list(self._docs)
+
+
 class InMemoryCollection:
     def __init__(self):
         self._docs: list[dict] = []
@@ -69,6 +99,14 @@ class InMemoryCollection:
         self._docs.append(copy.deepcopy(doc))
         return _InsertResult(doc["_id"])
 
+    async def insert_many(self, docs: list, ordered: bool = True):
+        for doc in docs:
+            await self.insert_one(doc)
+        return None
+
+    def find(self, filt: dict = None, projection: dict = None):
+        return _Cursor([copy.deepcopy(d) for d in self._docs if _matches(d, filt or {})])
+
     async def update_one(self, filt: dict, update: dict, upsert: bool = False):
         target = await self.find_one(filt)
         if target:
@@ -109,14 +147,7 @@ class InMemoryCollection:
 
     async def delete_many(self, filt: dict):
         before = len(self._docs)
-
-        def match(d):
-            for k, v in filt.items():
-                if d.get(k) != v:
-                    return False
-            return True
-
-        self._docs = [d for d in self._docs if not match(d)]
+        self._docs = [d for d in self._docs if not _matches(d, filt)]
         return {"deleted": before - len(self._docs)}
 
 
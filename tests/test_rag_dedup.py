@@ -0,0 +1,31 @@
+from services.rag.rag.dedup import NearDupIndex, lsh_params
+
+BASE = " ".join(f"word{i}" for i in range(300))
+
+
+def test_lsh_params_midpoint_below_threshold():
+    bands, rows = lsh_params(0.85, 128)
+    assert bands * rows == 128
+    assert (1.0 / bands) ** (1.0 / rows) <= 0.85
+
+
+def test_near_duplicate_found_and_distinct_ignored():
+    idx = NearDupIndex(threshold=0.8)
+    idx.add("a", idx.signature(BASE))
+    near = BASE.replace("word150", "changed")  # one edited word: ~0.97 Jaccard on 5-shingles
+    hit = idx.find(idx.signature(near))
+    assert hit is not None and hit[0] == "a" and hit[1] >= 0.8
+    other = " ".join(f"term{i}" for i in range(300))
+    assert idx.find(idx.signature(other)) is None
+    assert idx.find(idx.signature(BASE), exclude="a") is None
+    assert idx.signature("   ") is None and idx.find(None) is None
+
+
+def test_groups_and_remove():
+    idx = NearDupIndex()
+    idx.add("a", idx.signature(BASE))
+    idx.add("b", idx.signature(BASE + " tail"), group=idx.group_of("a"))
+    assert idx.group_of("b") == "a" and len(idx) == 2
+    assert idx.remove("a") and not idx.remove("a")
+    assert idx.find(idx.signature(BASE))[0] == "b"
+    assert idx.group_of("a") == "a"
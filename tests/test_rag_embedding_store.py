@@ -0,0 +1,42 @@
+import numpy as np
+
+from services.rag.rag.embedding_store import EmbeddingStore
+from services.rag.rag.vector_index import VectorIndex
+
+
+def test_segments_mmap_tombstones_and_merge(tmp_path):
+    st = EmbeddingStore(str(tmp_path), 4, dtype="float16")
+    st.append(["a", "b"], np.eye(4)[:2], [{"doc_id": "a"}, {"doc_id": "b"}])
+    st.append(["b", "c"], np.eye(4)[2:], [{"doc_id": "b2"}, {"doc_id": "c"}])
+    st.delete([("seg-000002", 1)])  # delete c
+
+    segs = EmbeddingStore(str(tmp_path), 4, dtype="float16").open()
+    assert [s.name for s in segs] == ["seg-000001", "seg-000002"]
+    assert isinstance(segs[0].matrix, np.memmap) and segs[0].matrix.dtype == np.float16
+
+    idx = VectorIndex(4)
+    dead, _ = st.tombstones()
+    for seg in segs:
+        mask = np.array([r in dead.get(seg.name, set()) for r in range(len(seg))])
+        idx.attach(seg.keys, seg.matrix, seg.payloads, mask)
+    assert len(idx) == 2 and idx.row_of("c") is None
+    assert idx.payload(idx.row_of("b"))["doc_id"] == "b2"  # later segment wins
+    rows, _ = idx.search(np.array([0, 0, 1, 0], dtype=np.float32), 1)
+    assert idx.key(rows[0]) == "b"
+
+    assert st.merge(max_segments=1) == "seg-000003"
+    merged = EmbeddingStore(str(tmp_path), 4, dtype="float16").open()
+    assert len(merged) == 1 and merged[0].keys == ["a", "b"]
+    assert st.tombstones()[0] == {}
+
+
+def test_segment_keeps_full_text_beside_truncated_payload(tmp_path):
+    st = EmbeddingStore(str(tmp_path), 4)
+    long = "start " * 200 + "zebra"
+    st.append(["a", "b"], np.eye(4)[:2], [{"text": long[:20]}, {"text": "bee"}], [long, "bee"])
+    st.append(["c"], np.eye(4)[2:3], [{"text": "payload only"}])  # texts default to payload text
+    segs = EmbeddingStore(str(tmp_path), 4).open()
+    assert segs[0].texts == [long, "bee"] and segs[1].texts == ["payload only"]
+    st.merge(max_segments=1)
+    merged = EmbeddingStore(str(tmp_path), 4).open()[0]
+    assert merged.texts == [long, "bee", "payload only"] and merged.payloads[0]["text"] == long[:20]
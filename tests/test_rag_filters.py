@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from services.rag.rag.filters import MetadataBitmaps, filter_key, matches, normalize_filter
+from services.rag.rag.vector_index import VectorIndex
+
+
+def test_bitmaps_and_or_semantics():
+    bm = MetadataBitmaps()
+    metas = [{"unit": f"u{i % 3}", "grade": i % 2, "tags": ["x", "y"] if i % 4 == 0 else ["z"]} for i in range(12)]
+    bm.add(range(12), metas)
+    nf = normalize_filter({"unit": {"$in": ["u0", "u1"]}, "tags": "x"})
+    assert bm.rows(nf).tolist() == [i for i in range(12) if matches(metas[i], nf)] == [0, 4]
+    assert bm.rows(normalize_filter({"unit": "u9"})).size == 0
+    assert filter_key(normalize_filter({"a": [2, 1]})) == filter_key(normalize_filter({"a": {"$in": [1, 2]}}))
+    with pytest.raises(ValueError):
+        normalize_filter({"grade": {"$gt": 1}})
+
+
+def test_bitmaps_skip_internal_and_high_cardinality_fields():
+    bm = MetadataBitmaps(max_values=5)
+    metas = [{"unit": f"u{i % 3}", "chunk": i, "parent_doc_id": f"d{i}", "source_id": f"s{i}"} for i in range(12)]
+    bm.add(range(12), metas)
+    assert bm.cardinality() == {"unit": 3}
+    assert bm.indexed(normalize_filter({"unit": "u0"}))
+    assert not bm.indexed(normalize_filter({"parent_doc_id": "d1"}))
+    assert not bm.indexed(normalize_filter({"source_id": "s1"}))
+    explicit = MetadataBitmaps(["parent_doc_id"], max_values=5)
+    explicit.add(range(12), metas)
+    assert explicit.rows(normalize_filter({"parent_doc_id": "d7"})).tolist() == [7]
+
+
+@pytest.mark.parametrize("prefilter_max", [0, 10**6])
+def test_search_filtered_matches_exact_on_subset(prefilter_max):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(3000, 16))
+    idx = VectorIndex(16, ivf_threshold=1000, nprobe=4)
+    idx.add([f"k{i}" for i in range(len(data))], data)
+    assert idx.mode == "ivf"
+    rows = np.arange(0, 3000, 3)  # a broad filter: forces the ANN post-filter when prefilter_max=0
+    idx.delete(["k3"])
+    for q in data[:10]:
+        got, _ = idx.search_filtered(q, 5, rows, prefilter_max=prefilter_max)
+        assert got.size == 5 and all(r % 3 == 0 and r != 3 for r in got.tolist())
+        if prefilter_max:
+            exact, _ = idx.search_exact(q, 5, candidates=rows[rows != 3])
+            assert got.tolist() == exact.tolist()
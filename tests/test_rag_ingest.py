@@ -0,0 +1,68 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from services.rag.rag.ingest import IngestJob, chunk_text, embed_batch, run_pipeline
+
+
+def test_chunk_text_overlap_and_offsets():
+    text = " ".join(f"w{i}" for i in range(10))
+    chunks = chunk_text(text, size=4, overlap=1)
+    assert [c.split()[0] for _, c in chunks] == ["w0", "w3", "w6"]
+    assert chunks[-1][1].endswith("w9")
+    assert all(text[off:off + len(c)] == c for off, c in chunks)
+    assert chunk_text("   ", 4, 1) == []
+
+
+def test_embed_batch_matches_single_hash():
+    raw = np.frombuffer(hashlib.sha256(b"abc").digest()[:32], dtype=np.uint8).astype(np.float32)
+    assert np.allclose(embed_batch(["abc", "x"], 32)[0], raw / np.linalg.norm(raw), atol=1e-6)
+
+
+def _source(docs):
+    async def gen():
+        for i, d in enumerate(docs, start=1):
+            yield i, d
+    return gen()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batches_and_reports_progress():
+    written = []
+
+    async def write(batch, vecs):
+        assert vecs.shape == (len(batch), 8)
+        written.extend(c.key for c in batch)
+
+    docs = [{"doc_id": f"d{i}", "text": " ".join(["tok"] * 25)} for i in range(5)] + ["bad"]
+    job = IngestJob("j1")
+    await run_pipeline(job, _source(docs), lambda t: embed_batch(t, 8), write,
+                       chunk_words=10, overlap=2, batch_size=4, workers=2, queue_size=1)
+    assert job.status == "done" and job.docs == 5 and job.indexed == job.chunks == 15
+    assert sorted(written) == sorted(f"d{i}#{s}" for i in range(5) for s in range(3))
+    assert len(job.errors) == 1 and job.to_dict()["progress"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_pipeline_reports_skipped_duplicates_separately():
+    async def write(batch, vecs):
+        return len(batch) - 1, 1  # first chunk of each batch dropped as a near-duplicate
+
+    job = IngestJob("j3")
+    await run_pipeline(job, _source([{"doc_id": "d", "text": "a " * 40}]), lambda t: embed_batch(t, 8), write,
+                       chunk_words=5, overlap=0, batch_size=4)
+    assert job.chunks == 8 and job.indexed == 6 and job.skipped == job.duplicates == 2
+    assert job.to_dict()["progress"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_pipeline_writer_failure_marks_job_failed():
+    async def write(batch, vecs):
+        raise RuntimeError("mongo down")
+
+    job = IngestJob("j2")
+    with pytest.raises(BaseException):
+        await run_pipeline(job, _source([{"doc_id": "d", "text": "a " * 100}]),
+                           lambda t: embed_batch(t, 8), write, chunk_words=5, overlap=0, batch_size=2)
+    assert job.status == "failed" and "mongo down" in job.errors[-1]
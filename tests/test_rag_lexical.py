@@ -0,0 +1,22 @@
+from services.rag.rag.lexical import BM25Index, fuse
+
+
+def test_bm25_ranking_replace_delete():
+    idx = BM25Index()
+    idx.add(["a", "b", "c"], ["photosynthesis in plants", "cell division and mitosis", "plants need water and light"])
+    hits = idx.search("plants photosynthesis", 3)
+    assert [k for k, _ in hits][:2] == ["a", "c"]
+    idx.add(["a"], ["the krebs cycle"])  # replace
+    assert [k for k, _ in idx.search("photosynthesis", 3)] == []
+    assert idx.delete(["c", "missing"]) == 1
+    assert [k for k, _ in idx.search("plants", 3)] == []
+    idx.compact()
+    assert idx.search("mitosis", 1)[0][0] == "b" and len(idx) == 2
+
+
+def test_fuse_rrf_and_weighted():
+    vec = [("x", 0.9), ("y", 0.8)]
+    lex = [("y", 7.0), ("z", 3.0)]
+    assert fuse([vec, lex], 3)[0][0] == "y"
+    w = fuse([vec, lex], 3, method="weighted", weights=(1.0, 0.0))
+    assert w[0][0] == "x"
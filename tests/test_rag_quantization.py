@@ -0,0 +1,59 @@
+import functools
+
+import numpy as np
+import pytest
+
+from services.rag.rag.quantize import ProductQuantizer, ScalarQuantizer, train_quantizer
+from services.rag.rag.vector_index import VectorIndex, normalize
+
+
+def _data(n=3000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(30, dim))
+    return normalize(centers[rng.integers(0, 30, n)] + 0.3 * rng.normal(size=(n, dim)))
+
+
+@pytest.mark.parametrize("quant", [ScalarQuantizer.train, functools.partial(ProductQuantizer.train, m=4)])
+def test_adc_matches_decoded_inner_product(quant):
+    data = _data()
+    q = quant(data)
+    codes = q.encode(data)
+    assert codes.dtype == np.uint8 and codes.shape == (len(data), q.code_size)
+    assert np.allclose(q.scores(codes, q.prepare(data[0])), q.decode(codes) @ data[0], atol=1e-4)
+
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_quantized_index_recall_and_deletes(kind):
+    data = _data()
+    factory = functools.partial(train_quantizer, kind, pq_m=4)
+    idx = VectorIndex(16, quantizer=factory, quant_min_rows=1000, rerank=16)
+    idx.add([f"k{i}" for i in range(len(data))], data)
+    assert idx.mode == kind and idx.code_bytes == len(data) * (16 if kind == "int8" else 4)
+    hits = 0
+    for q in data[:30]:
+        approx, _ = idx.search(q, 10)
+        exact, _ = idx.search_exact(q, 10)
+        hits += len(set(approx.tolist()) & set(exact.tolist()))
+    assert hits / 300 >= 0.9
+    # rows added after training are encoded incrementally; deleted rows never come back
+    idx.add(["fresh"], -data[:1])
+    rows, _ = idx.search(-data[0], 1)
+    assert idx.key(rows[0]) == "fresh"
+    idx.delete(["fresh"])
+    rows, _ = idx.search(-data[0], 5)
+    assert "fresh" not in {idx.key(r) for r in rows}
+
+
+def test_resident_bytes_excludes_mapped_rows(tmp_path):
+    from services.rag.rag.embedding_store import EmbeddingStore
+
+    data = _data()
+    keys = [f"k{i}" for i in range(len(data))]
+    factory = functools.partial(train_quantizer, "pq", pq_m=4)
+    in_ram = VectorIndex(16, quantizer=factory, quant_min_rows=1000)
+    in_ram.add(keys, data)
+    assert in_ram.resident_bytes >= data.nbytes + in_ram.code_bytes  # float rows stay in the RAM tail
+    seg = EmbeddingStore(str(tmp_path), 16).append(keys, data, [{}] * len(keys))
+    mapped = VectorIndex(16, quantizer=factory, quant_min_rows=1000)
+    mapped.attach(seg.keys, seg.matrix, seg.payloads)
+    assert mapped.code_bytes <= mapped.resident_bytes < data.nbytes
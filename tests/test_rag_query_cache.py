@@ -0,0 +1,21 @@
+from services.rag.rag.cache import LRUCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What IS\tRAG?\n") == "what is rag?"
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    c = LRUCache(2)
+    c.put("a", 1); c.put("b", 2)
+    assert c.get("a") == 1  # a is now most recent
+    c.put("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and len(c) == 2
+    assert (c.hits, c.misses) == (2, 1)
+
+    now = [100.0]
+    monkeypatch.setattr("services.rag.rag.cache.time.monotonic", lambda: now[0])
+    t = LRUCache(4, ttl_s=10)
+    t.put("k", "v")
+    now[0] += 11
+    assert t.get("k") is None and len(t) == 0
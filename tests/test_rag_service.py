@@ -0,0 +1,149 @@
+"""RAG service endpoints through the FastAPI app, on the in-memory Mongo stub."""
+import pytest
+from fastapi.testclient import TestClient
+
+from services.rag.rag import main
+from tests.fakes.inmemory_db import InMemoryDatabase
+
+
+@pytest.fixture
+def rag(monkeypatch, tmp_path):
+    """Returns start(): a fresh service process over the same Mongo and embedding store."""
+    monkeypatch.setattr(main, "db", InMemoryDatabase())
+    monkeypatch.setattr(main, "EMBED_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(main, "STORE_REFRESH_MS", 0)
+
+    def start():
+        monkeypatch.setattr(main, "store", main.VectorStore())
+        main.answer_cache.clear()
+        return TestClient(main.app)
+
+    return start
+
+
+def _hits(client, query, mode="lexical", **extra):
+    r = client.post("/v1/rag/query", json={"query": query, "top_k": 5, "mode": mode, **extra})
+    assert r.status_code == 200, r.text
+    return [s["doc_id"] for s in r.json()["sources"]]
+
+
+def test_terms_past_payload_text_survive_restart(rag):
+    text = " ".join(f"t0_{i}" for i in range(200)) + " zebra"
+    assert len(text) > main.PAYLOAD_TEXT_CHARS
+    with rag() as client:
+        assert client.post("/v1/rag/index", json={"documents": [
+            {"doc_id": "long", "text": text}, {"doc_id": "other", "text": "unrelated words here"},
+        ]}).json()["indexed"] == 2
+        assert _hits(client, "zebra") == ["long"]
+    with rag() as client:  # restart: attaches the embedding store instead of reading rag_docs
+        assert client.get("/healthz").json()["index"]["vectors"] == 2
+        for term in ("t0_5", "t0_150", "zebra"):
+            assert _hits(client, term) == ["long"]
+
+
+def test_near_duplicates_detected_after_restart(rag):
+    text = " ".join(f"w{i}" for i in range(400))  # ~2.3k chars: mostly past the payload text
+    with rag() as client:
+        client.post("/v1/rag/index", json={"documents": [{"doc_id": "a", "text": text}]})
+    with rag() as client:
+        r = client.post("/v1/rag/index", json={"documents": [{"doc_id": "copy", "text": text}]}).json()
+        assert [d["duplicate_of"] for d in r["duplicates"]] == ["a"]
+
+
+def test_segments_merged_in_background(rag, monkeypatch):
+    import time
+
+    monkeypatch.setattr(main, "SEGMENT_MAX", 2)
+    with rag() as client:
+        for i in range(4):  # one store segment per request
+            client.post("/v1/rag/index", json={"documents": [{"doc_id": f"d{i}", "text": f"topic{i} shared"}]})
+        deadline = time.monotonic() + 5
+        while len(main.store.store.segment_names) > 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(main.store.store.segment_names) <= 2
+        assert client.delete("/v1/rag/docs/d1").json()["deleted"] == 1
+        assert sorted(_hits(client, "shared")) == ["d0", "d2", "d3"]
+        r = client.post("/v1/rag/index", json={"documents": [{"doc_id": "copy", "text": "topic3 shared"}]}).json()
+        assert [d["duplicate_of"] for d in r["duplicates"]] == ["d3"]
+    with rag() as client:
+        assert sorted(_hits(client, "shared")) == ["d0", "d2", "d3"]  # "copy" collapses into d3's group
+
+
+def test_unindexed_filter_scans_off_the_event_loop(rag, monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(main, "FILTER_FIELDS", ["subject"])  # "grade" is matched by scanning payloads
+    scan = main._scan_rows
+
+    def off_loop(*args):
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return scan(*args)
+
+    monkeypatch.setattr(main, "_scan_rows", off_loop)
+    with rag() as client:
+        client.post("/v1/rag/index", json={"documents": [
+            {"doc_id": f"d{g}", "text": f"photosynthesis for grade {g}", "metadata": {"subject": "bio", "grade": g}}
+            for g in (4, 5, 6)
+        ]})
+        assert sorted(_hits(client, "photosynthesis", filters={"grade": {"$in": [5, 6]}})) == ["d5", "d6"]
+
+
+def test_ingest_job_survives_restart(rag):
+    import json
+    import time
+
+    text = " ".join(f"t1_{i}" for i in range(150)) + " okapi"  # one chunk, "okapi" past the payload text
+    assert len(text) > main.PAYLOAD_TEXT_CHARS
+    body = "\n".join(json.dumps(d) for d in [
+        {"doc_id": "long", "text": text, "metadata": {"subject": "zoo"}},
+        {"doc_id": "other", "text": "unrelated words here"},
+    ])
+    with rag() as client:
+        r = client.post("/v1/rag/ingest", content=body, headers={"content-type": "application/x-ndjson"})
+        assert r.status_code == 202, r.text
+        job_id = r.json()["job_id"]
+        deadline = time.monotonic() + 10
+        while (job := client.get(f"/v1/rag/ingest/{job_id}").json())["status"] not in ("done", "failed"):
+            assert time.monotonic() < deadline, job
+            time.sleep(0.01)
+        assert job["status"] == "done" and job["docs"] == 2 and job["indexed"] == 2, job
+        assert _hits(client, "okapi") == ["long#0"]  # chunk ids
+    with rag() as client:
+        for term in ("t1_3", "okapi"):
+            assert _hits(client, term) == ["long#0"]
+        assert _hits(client, "okapi", filters={"subject": "zoo"}) == ["long#0"]
+
+
+def test_indexed_filter_query(rag, monkeypatch):
+    def no_scan(*args):
+        raise AssertionError("indexed filter fell back to a payload scan")
+
+    monkeypatch.setattr(main, "_scan_rows", no_scan)
+    with rag() as client:
+        client.post("/v1/rag/index", json={"documents": [
+            {"doc_id": f"d{g}", "text": f"osmosis lesson grade {g}", "metadata": {"subject": "bio" if g != 5 else "chem", "grade": g}}
+            for g in (4, 5, 6)
+        ]})
+        for mode in ("lexical", "vector", "hybrid"):
+            assert sorted(_hits(client, "osmosis", mode, filters={"subject": "bio"})) == ["d4", "d6"]
+            assert _hits(client, "osmosis", mode, filters={"subject": "bio", "grade": {"$in": [5, 6]}}) == ["d6"]
+        r = client.post("/v1/rag/query", json={"query": "osmosis", "filters": {"grade": {"$gt": 4}}})
+        assert r.status_code == 400
+
+
+def test_hybrid_query_reports_fusion_score(rag):
+    with rag() as client:
+        client.post("/v1/rag/index", json={"documents": [
+            {"doc_id": "cell", "text": "mitochondria power the cell"},
+            {"doc_id": "plant", "text": "chloroplasts in plant leaves"},
+            {"doc_id": "rock", "text": "igneous rock forms from magma"},
+        ]})
+        r = client.post("/v1/rag/query", json={"query": "mitochondria cell", "top_k": 3, "mode": "hybrid"})
+        assert r.status_code == 200, r.text
+        sources = r.json()["sources"]
+        assert sources[0]["doc_id"] == "cell"
+        fused = [s["fusion_score"] for s in sources]
+        assert fused == sorted(fused, reverse=True)
+        lexical = client.post("/v1/rag/query", json={"query": "mitochondria cell", "mode": "lexical"}).json()
+        assert all("fusion_score" not in s for s in lexical["sources"])
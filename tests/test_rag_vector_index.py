@@ -0,0 +1,89 @@
+import numpy as np
+
+from services.rag.rag.vector_index import VectorIndex
+
+
+def _clustered(n, dim=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return centers[rng.integers(0, clusters, n)] + 0.2 * rng.normal(size=(n, dim))
+
+
+def test_flat_search_exact_and_replace():
+    idx = VectorIndex(4)
+    idx.add(["a", "b", "c"], np.eye(4)[:3], [{"doc_id": k} for k in "abc"])
+    rows, scores = idx.search(np.array([0, 1, 0, 0], dtype=np.float32), 2)
+    assert idx.key(rows[0]) == "b" and abs(scores[0] - 1.0) < 1e-5
+    # re-adding a key tombstones the old row
+    idx.add(["b"], np.array([[0, 0, 0, 1]], dtype=np.float32), [{"doc_id": "b"}])
+    rows, _ = idx.search(np.array([0, 0, 0, 1], dtype=np.float32), 1)
+    assert idx.key(rows[0]) == "b" and len(idx) == 3 and idx.rows == 4
+    assert idx.delete(["a"]) == 1
+    rows, _ = idx.search(np.array([1, 0, 0, 0], dtype=np.float32), 5)
+    assert "a" not in {idx.key(r) for r in rows}
+
+
+def test_ivf_recall_and_incremental_add():
+    data = _clustered(4000)
+    idx = VectorIndex(16, ivf_threshold=2000, nprobe=6)
+    idx.add([f"k{i}" for i in range(len(data))], data)
+    assert idx.mode == "ivf"
+    hits = 0
+    for q in data[:50]:
+        approx, _ = idx.search(q, 10)
+        exact, _ = idx.search_exact(q, 10)
+        hits += len(set(approx.tolist()) & set(exact.tolist()))
+    assert hits / 500 >= 0.9
+    # pending rows (added after training) are searchable immediately
+    idx.add(["fresh"], data[:1] * -1)
+    rows, _ = idx.search(data[0] * -1, 1)
+    assert idx.key(rows[0]) == "fresh"
+
+
+def test_background_reorganize_swaps_in_partition(monkeypatch):
+    from services.rag.rag import vector_index
+
+    data = _clustered(3000)
+    jobs = []
+    idx = VectorIndex(16, ivf_threshold=2000, nprobe=6, schedule=jobs.append)
+    idx.add([f"k{i}" for i in range(2500)], data[:2500])
+    assert idx.mode == "flat" and len(jobs) == 1  # add() only schedules the training
+    train = vector_index.IVFPartition.train
+
+    def train_while_writing(*args, **kwargs):
+        # writes that land while k-means runs must survive the swap
+        idx.add([f"k{i}" for i in range(2500, 3000)], data[2500:])
+        idx.delete(["k0"])
+        return train(*args, **kwargs)
+
+    monkeypatch.setattr(vector_index.IVFPartition, "train", train_while_writing)
+    jobs.pop()()
+    assert idx.mode == "ivf" and not jobs  # one reorganisation at a time
+    rows, _ = idx.search(data[0], 5)
+    assert "k0" not in {idx.key(r) for r in rows}
+    rows, _ = idx.search(data[2999], 1)
+    assert idx.key(rows[0]) == "k2999"  # pending after the swap, not lost
+
+
+def test_ivf_training_scores_bounded_blocks(monkeypatch):
+    from services.rag.rag import vector_index
+
+    data = _clustered(4000)
+    monkeypatch.setattr(vector_index, "_ASSIGN_SCORES", 64 * 32)
+    monkeypatch.setattr(vector_index, "_TRAIN_SAMPLE_MAX", 1000)
+    seen = []
+    nearest = vector_index._nearest_cells
+
+    def recording(vecs, centroids):
+        seen.append(vecs.shape[0])
+        return nearest(vecs, centroids)
+
+    monkeypatch.setattr(vector_index, "_nearest_cells", recording)
+    idx = VectorIndex(16, ivf_threshold=10**6)
+    idx.add([f"k{i}" for i in range(len(data))], data)
+    idx.train_ivf(nlist=32)
+    assert max(seen[:-1]) == 1000  # k-means ran on the capped sample
+    assert seen[-1] == 4000  # every row still lands in a cell
+    cents = idx._ivf.centroids
+    vecs = vector_index.normalize(data)
+    assert np.array_equal(nearest(vecs, cents), np.argmax(vecs @ cents.T, axis=1))  # 64-row blocks
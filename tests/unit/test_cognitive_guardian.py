@@ -94,3 +94,266 @@ class TestInterventionTrigger:
         trigger = InterventionTrigger()
         result = trigger.evaluate(cognitive_load=0.30, consecutive_errors=0, fatigue=0.2)
         assert result is None
+
+
+# ---------------------------------------------------------------------------
+# Attention ring buffer
+# ---------------------------------------------------------------------------
+
+def _load_cg_package(name):
+    """Import a cognitive-guardian subpackage by path (directory name has a hyphen)."""
+    import importlib.util
+    import pathlib
+    import sys
+
+    pkg_dir = pathlib.Path(__file__).resolve().parents[2] / "services" / "cognitive-guardian" / name
+    mod_name = f"cognitive_guardian_{name}"
+    if mod_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            mod_name, pkg_dir / "__init__.py", submodule_search_locations=[str(pkg_dir)]
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[mod_name] = module
+        spec.loader.exec_module(module)
+    return mod_name
+
+
+class TestAttentionRing:
+    """Rolling counts must match a rescan of the last `capacity` frames."""
+
+    def test_rolling_counts_match_rescan(self):
+        import importlib
+        import random
+
+        try:
+            buf = importlib.import_module(f"{_load_cg_package('core')}.attention_buffer")
+        except ImportError:
+            pytest.skip("cognitive-guardian core not importable")
+
+        rng = random.Random(7)
+        ring = buf.AttentionRing(capacity=50)
+        assert len(ring) == 0 and ring.attention_penalty() == 0 and ring.face_detection_rate() == 0.0
+        frames = []
+        for t in range(173):
+            frame = {
+                "timestamp": float(t),
+                "face_detected": rng.random() > 0.2,
+                "eye_gaze_x": rng.choice([None, rng.uniform(-0.6, 0.6)]),
+                "head_yaw": rng.choice([None, rng.uniform(-45, 45)]),
+                "blink_detected": rng.random() > 0.9,
+            }
+            ring.append(**frame)
+            frames.append(frame)
+            window = frames[-50:]
+            poor = sum(
+                1 for f in window
+                if not f["face_detected"]
+                or (f["eye_gaze_x"] is not None and abs(f["eye_gaze_x"]) > 0.4)
+                or (f["head_yaw"] is not None and abs(f["head_yaw"]) > 30)
+            )
+            assert len(ring) == len(window)
+            assert ring.poor_count == poor
+            assert ring.attention_penalty() == int(poor / len(window) * 100)
+            assert ring.face_count == sum(f["face_detected"] for f in window)
+            assert ring.blink_count == sum(f["blink_detected"] for f in window)
+
+        assert ring.ordered(ring.timestamp).tolist() == [float(t) for t in range(123, 173)]
+
+    def test_batched_extend_matches_per_frame_append(self):
+        import importlib
+        import math
+        import random
+
+        try:
+            pkg = _load_cg_package("core")
+            buf = importlib.import_module(f"{pkg}.attention_buffer")
+            stream = importlib.import_module(f"{pkg}.attention_stream")
+        except ImportError:
+            pytest.skip("cognitive-guardian core not importable")
+
+        rng = random.Random(11)
+        frames = [
+            {
+                "timestamp": 1.7e9 + t / 30,
+                "face_detected": rng.random() > 0.2,
+                "eye_gaze_x": rng.choice([None, rng.uniform(-0.6, 0.6)]),
+                "eye_gaze_y": None,
+                "head_pitch": rng.uniform(-10, 10),
+                "head_yaw": rng.choice([None, rng.uniform(-45, 45)]),
+                "blink_detected": rng.random() > 0.9,
+            }
+            for t in range(137)
+        ]
+        single, batched = buf.AttentionRing(40), buf.AttentionRing(40)
+        for f in frames:
+            single.append(**f)
+        for start, size in [(0, 3), (3, 25), (28, 90), (118, 19)]:  # includes a batch larger than capacity
+            batched.extend(**stream.decode_binary_frames(stream.encode_binary_frames(frames[start:start + size])))
+        for attr in ("poor_count", "face_count", "blink_count"):
+            assert getattr(batched, attr) == getattr(single, attr)
+        assert len(batched) == 40
+        ts = batched.ordered(batched.timestamp)
+        assert all(math.isclose(a, b, abs_tol=1e-3) for a, b in zip(ts, single.ordered(single.timestamp)))
+
+        with pytest.raises(ValueError):
+            stream.decode_binary_frames(b"\x00" * 10)
+
+    def test_acks_coalesce_and_sampling_backs_off(self):
+        import importlib
+
+        try:
+            stream = importlib.import_module(f"{_load_cg_package('core')}.attention_stream")
+        except ImportError:
+            pytest.skip("cognitive-guardian core not importable")
+
+        acks = stream.AckPolicy(every_frames=30, interval_s=60)
+        assert [acks.received(10) for _ in range(6)] == [False, False, True, False, False, True]
+
+        advisor = stream.SampleRateAdvisor(max_hz=30, min_hz=5, tolerance=0.05, stable_checks=2)
+        rates = [advisor.update(s) for s in (0.1, 0.1, 0.12, 0.1, 0.11, 0.1, 0.1, 0.1, 0.6)]
+        assert rates == [30, 30, 15, 15, 7.5, 7.5, 5, 5, 30]
+
+
+class TestBatchAssessment:
+    """The vectorised /v1/assess:batch rules, one session per column entry."""
+
+    def test_rules_per_session(self):
+        import importlib
+
+        import numpy as np
+
+        try:
+            batch = importlib.import_module(f"{_load_cg_package('core')}.batch_assessment")
+        except ImportError:
+            pytest.skip("cognitive-guardian core not importable")
+
+        weights = {"hesitation": 0.25, "errors": 0.35, "rereads": 0.20, "fatigue": 0.15, "attention": 0.05}
+        # idle / overloaded / error-prone / long session / borderline overload
+        result = batch.assess_batch(
+            hesitation_ms=np.array([0, 20000, 0, 0, 20000]),
+            error_rate=np.array([0.0, 1.0, 0.8, 0.0, 1.0]),
+            reread_count=np.array([0, 10, 0, 0, 10]),
+            session_duration_minutes=np.array([0, 60, 30, 50, 25]),
+            poor_count=np.array([0, 50, 0, 3, 0]),
+            frame_count=np.array([0, 100, 0, 12, 5]),
+            weights=weights,
+        )
+        assert result["cognitive_load"].tolist() == [0, 97, 31, 14, 81]
+        assert result["emotional_state"].tolist() == ["calm", "frustrated", "confused", "tired", "confused"]
+        assert result["fatigue_index"].tolist() == [0, 100, 20, 90, 10]
+        assert result["attention_level"].tolist() == [100, 50, 100, 75, 100]
+        assert result["recommended_action"].tolist() == [
+            "continue", "suggest_break", "continue", "suggest_break", "switch_modality",
+        ]
+        assert result["intervention_needed"].tolist() == [False, True, False, True, True]
+        assert result["confidence"].tolist() == [0.5, 0.85, 0.5, 0.85, 0.5]
+
+
+# ---------------------------------------------------------------------------
+# Streaming LSTM load predictor
+# ---------------------------------------------------------------------------
+
+def _lstm_state(rng, input_size=3, hidden=4, layers=2):
+    """Random weights with the CogLoadLSTM state_dict layout."""
+    import numpy as np
+
+    state = {}
+    for k in range(layers):
+        state[f"lstm.weight_ih_l{k}"] = rng.normal(0, 0.5, (4 * hidden, input_size if k == 0 else hidden))
+        state[f"lstm.weight_hh_l{k}"] = rng.normal(0, 0.5, (4 * hidden, hidden))
+        state[f"lstm.bias_ih_l{k}"] = rng.normal(0, 0.1, 4 * hidden)
+        state[f"lstm.bias_hh_l{k}"] = rng.normal(0, 0.1, 4 * hidden)
+    state["fc.weight"] = rng.normal(0, 20, (1, hidden))
+    state["fc.bias"] = np.array([50.0])
+    return state
+
+
+class TestStreamingLSTM:
+    """NumPy LSTM matches torch.nn.LSTM's equations; streaming matches full-window runs."""
+
+    def _module(self):
+        import importlib
+
+        try:
+            return importlib.import_module(f"{_load_cg_package('models')}.streaming_lstm")
+        except ImportError:
+            pytest.skip("cognitive-guardian models not importable")
+
+    def test_step_matches_reference_equations(self):
+        import numpy as np
+
+        lstm_mod = self._module()
+        rng = np.random.default_rng(0)
+        state = _lstm_state(rng)
+        lstm = lstm_mod.NumpyLSTM(state)
+        assert (lstm.num_layers, lstm.hidden_size, lstm.input_size) == (2, 4, 3)
+
+        def sigmoid(v):
+            return 1 / (1 + np.exp(-v))
+
+        x = rng.random((2, 3))
+        h = rng.normal(size=(2, 2, 4))
+        c = rng.normal(size=(2, 2, 4))
+        inp, hs, cs = x, [], []
+        for k in range(2):
+            z = (inp @ state[f"lstm.weight_ih_l{k}"].T + state[f"lstm.bias_ih_l{k}"]
+                 + h[k] @ state[f"lstm.weight_hh_l{k}"].T + state[f"lstm.bias_hh_l{k}"])
+            i, f, g, o = np.split(z, 4, axis=1)
+            cs.append(sigmoid(f) * c[k] + sigmoid(i) * np.tanh(g))
+            hs.append(sigmoid(o) * np.tanh(cs[-1]))
+            inp = hs[-1]
+        expected = (inp @ state["fc.weight"].T + state["fc.bias"])[:, 0]
+
+        y, h_new, c_new = lstm.step(x, h.astype(np.float32), c.astype(np.float32))
+        np.testing.assert_allclose(y, expected, rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose(h_new, np.stack(hs), atol=1e-5)
+        np.testing.assert_allclose(c_new, np.stack(cs), atol=1e-5)
+
+    def test_streaming_state_per_session(self, tmp_path):
+        import numpy as np
+
+        lstm_mod = self._module()
+        rng = np.random.default_rng(1)
+        path = tmp_path / "lstm.npz"
+        np.savez(path, **_lstm_state(rng))
+        predictor = lstm_mod.StreamingLoadPredictor.from_path(str(path), max_sessions=3, idle_ttl_s=100)
+
+        seqs = {s: rng.random((5, 3)).astype(np.float32) for s in ("a", "b", "c")}
+        full = {s: np.clip(predictor.lstm.run(seq[None])[0], 0, 100) for s, seq in seqs.items()}
+        got = {s: [] for s in seqs}
+        # interleaved batches, including a session stepped twice in one batch
+        plan = [["a", "b"], ["a", "a", "c"], ["b", "c", "b"], ["a", "c"], ["a", "b", "c"], ["b", "c"]]
+        pos = {s: 0 for s in seqs}
+        for t, ids in enumerate(plan):
+            rows = []
+            for s in ids:
+                rows.append(seqs[s][pos[s]])
+                pos[s] += 1
+            for s, y in zip(ids, predictor.step_many(ids, np.stack(rows), now=float(t))):
+                got[s].append(y)
+        for s in seqs:
+            np.testing.assert_allclose(got[s], full[s], rtol=1e-5, atol=1e-4)
+
+        store = predictor.store
+        assert len(store) == 3
+        predictor.step_many(["d"], seqs["a"][:1], now=10.0)  # full: least recently stepped ("a") is evicted
+        assert "a" not in store and "d" in store and len(store) == 3
+        assert store.evict_idle(now=107.0) == 2  # "b" and "c" last stepped at t=5
+        assert len(store) == 1 and "d" in store
+        assert predictor.step("a", seqs["a"][0]) == pytest.approx(float(full["a"][0]), abs=1e-4)  # fresh state
+
+    def test_load_predictor_uses_model_and_falls_back(self, tmp_path):
+        import importlib
+
+        import numpy as np
+
+        try:
+            predictor_mod = importlib.import_module(f"{_load_cg_package('models')}.load_predictor")
+        except ImportError:
+            pytest.skip("cognitive-guardian models not importable")
+
+        path = tmp_path / "lstm.npz"
+        np.savez(path, **_lstm_state(np.random.default_rng(2), input_size=5))
+        forecast = predictor_mod.LoadPredictor(str(path)).predict([40, 50, 60], horizon=4)
+        assert len(forecast) == 4 and all(0 <= v <= 100 for v in forecast)
+        assert predictor_mod.LoadPredictor(str(tmp_path / "missing.npz")).predict([40, 50, 60], horizon=2) == [70, 80]
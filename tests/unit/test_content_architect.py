@@ -26,6 +26,77 @@ class TestModalitySelection:
         assert modality == "TEXT"
 
 
+class TestConcurrentGeneration:
+    """Blocks are generated concurrently; a failing modality yields a partial response."""
+
+    @pytest.mark.asyncio
+    async def test_partial_results_on_timeout(self, tmp_path):
+        import asyncio
+
+        try:
+            main = _load_ca_main()
+        except ImportError as exc:
+            pytest.skip(f"content-architect not importable: {exc}")
+        ContentModality, ContentRequest = main.ContentModality, main.ContentRequest
+
+        engine = main.ContentEngine(
+            artifacts=main.ArtifactStore(str(tmp_path)), block_timeouts={ContentModality.IMAGE: 0.05}
+        )
+        assert engine.block_timeouts[ContentModality.TEXT] == main.ContentEngine.BLOCK_TIMEOUTS_S[ContentModality.TEXT]
+        generate_block = engine._generate_block
+
+        async def slow_images(concept, modality, difficulty):
+            if modality == ContentModality.IMAGE:
+                await asyncio.sleep(1)
+            return await generate_block(concept, modality, difficulty)
+
+        engine._generate_block = slow_images
+        response = await engine.generate(ContentRequest(concept="fractions", student_id="s1", cognitive_load=40))
+        assert [b.modality for b in response.blocks] == [ContentModality.TEXT]
+        assert [e.modality for e in response.errors] == [ContentModality.IMAGE]
+
+    @pytest.mark.asyncio
+    async def test_stream_emits_text_first_then_summary(self, tmp_path):
+        import asyncio
+
+        try:
+            main = _load_ca_main()
+        except ImportError as exc:
+            pytest.skip(f"content-architect not importable: {exc}")
+        ContentRequest = main.ContentRequest
+
+        engine = main.ContentEngine(artifacts=main.ArtifactStore(str(tmp_path)))
+        generate_block = engine._generate_block
+
+        async def slow_text(concept, modality, difficulty):
+            await asyncio.sleep(0.05 if modality.value == "text" else 0)
+            return await generate_block(concept, modality, difficulty)
+
+        engine._generate_block = slow_text
+        events = [e async for e in engine.generate_stream(ContentRequest(concept="waves", student_id="s1", cognitive_load=40))]
+        assert [kind for kind, _ in events] == ["block", "block", "summary"]
+        assert events[0][1]["modality"] == "text"
+        assert "blocks" not in events[-1][1] and events[-1][1]["estimated_time_minutes"] == 7
+
+    @pytest.mark.asyncio
+    async def test_prerequisites_from_planner(self, tmp_path):
+        try:
+            main = _load_ca_main()
+        except ImportError as exc:
+            pytest.skip(f"content-architect not importable: {exc}")
+        ContentRequest = main.ContentRequest
+
+        class Planner:
+            async def compute_learning_path(self, concept):
+                return ["algebra", "functions", concept]
+
+        engine = main.ContentEngine(planner=Planner(), artifacts=main.ArtifactStore(str(tmp_path)))
+        request = ContentRequest(concept="derivatives", student_id="s1", cognitive_load=40)
+        assert (await engine.generate(request)).prerequisites == ["algebra", "functions"]
+        events = [e async for e in engine.generate_stream(request)]
+        assert events[-1][1]["prerequisites"] == ["algebra", "functions"]
+
+
 class TestKnowledgeGraph:
     """Test knowledge graph wrapper (Neo4j)."""
 
@@ -52,3 +123,541 @@ class TestVectorStore:
 
         vs = VectorStoreManager(url="http://localhost:6333", collection="test")
         assert vs.collection_name == "test"
+
+
+def _load_ca_package(name):
+    """Import a content-architect subpackage by path (directory name has a hyphen)."""
+    import importlib.util
+    import pathlib
+    import sys
+
+    pkg_dir = pathlib.Path(__file__).resolve().parents[2] / "services" / "content-architect" / name
+    mod_name = f"content_architect_{name}"
+    if mod_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            mod_name, pkg_dir / "__init__.py", submodule_search_locations=[str(pkg_dir)]
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[mod_name] = module
+        spec.loader.exec_module(module)
+    return mod_name
+
+
+def _load_ca_main():
+    """Import content-architect's main.py by path as ``content_architect_main``.
+
+    main.py imports its subpackages as top-level ``core`` / ``graph`` / ``rag``;
+    other services have a ``core`` too, so those names only point at
+    content-architect's packages while main.py executes.
+    """
+    import importlib.util
+    import pathlib
+    import sys
+
+    mod_name = "content_architect_main"
+    if mod_name in sys.modules:
+        return sys.modules[mod_name]
+    names = ("core", "graph", "rag")
+    before = {k: v for k, v in sys.modules.items() if k in names or k.split(".")[0] in names}
+    try:
+        for name in names:
+            sys.modules[name] = sys.modules[_load_ca_package(name)]
+        path = pathlib.Path(__file__).resolve().parents[2] / "services" / "content-architect" / "main.py"
+        spec = importlib.util.spec_from_file_location(mod_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        for k in [k for k in sys.modules if k in names or k.split(".")[0] in names]:
+            if k not in before:
+                del sys.modules[k]
+        sys.modules.update(before)
+    sys.modules[mod_name] = module
+    return module
+
+
+class TestHybridRetrieval:
+    """BM25 keyword retrieval works without sentence-transformers / Qdrant."""
+
+    @pytest.mark.asyncio
+    async def test_keyword_fallback_and_fusion(self):
+        import importlib
+        import numpy as np
+
+        try:
+            pkg = _load_ca_package("rag")
+            retrieval = importlib.import_module(f"{pkg}.retrieval")
+            embedding = importlib.import_module(f"{pkg}.embedding")
+        except ImportError:
+            pytest.skip("content-architect rag not importable")
+
+        class _Store:
+            async def search(self, vector, limit=5):
+                return [{"id": "vec-only", "score": 0.9, "payload": {"text": "semantic hit"}},
+                        {"id": "both", "score": 0.5, "payload": {"text": "fractions"}}]
+
+        class _Embedder:
+            def encode(self, texts):
+                return np.zeros((len(texts), 3))
+
+        # no sentence-transformers: keyword results only
+        retriever = retrieval.Retriever(_Store(), embeddings=embedding.EmbeddingService(lambda: None))
+        await retriever.index("both", "adding fractions with unlike denominators")
+        await retriever.index("kw-only", "fractions and decimals")
+        hits = await retriever.retrieve("unlike fractions", top_k=2)
+        assert [h["id"] for h in hits] == ["both", "kw-only"]
+        assert hits[0]["payload"]["text"].startswith("adding")
+
+        retriever.embeddings = embedding.EmbeddingService(lambda: _Embedder())
+        hits = await retriever.retrieve("unlike fractions", top_k=3)
+        assert hits[0]["id"] == "both"
+        assert {h["id"] for h in hits} == {"both", "vec-only", "kw-only"}
+
+    def test_text_blocks_grounded_through_shared_embedding_service(self):
+        from fastapi.testclient import TestClient
+
+        try:
+            main = _load_ca_main()
+        except ImportError as exc:
+            pytest.skip(f"content-architect not importable: {exc}")
+
+        assert main.retriever.embeddings is main.embedding_service
+        assert main.content_engine.retriever is main.retriever and main.retriever.reranker is main.reranker
+        client = TestClient(main.app)
+        docs = [{"doc_id": "f1", "text": "equivalent fractions share a value"}, {"doc_id": "w1", "text": "waves carry energy"}]
+        assert client.post("/v1/content/index", json={"documents": docs}).json() == {"indexed": 2}
+        r = client.post("/v1/generate", json={"concept": "fractions", "student_id": "s1", "cognitive_load": 10})
+        text = next(b for b in r.json()["blocks"] if b["modality"] == "text")
+        assert [s["id"] for s in text["content"]["sources"]] == ["f1"]
+
+
+class TestLocalVectorStore:
+    """Embedded NumPy backend used when qdrant_client is not installed."""
+
+    @pytest.mark.asyncio
+    async def test_upsert_search_many_and_persistence(self, tmp_path):
+        import importlib
+        import numpy as np
+
+        try:
+            pkg = _load_ca_package("rag")
+            vector_store = importlib.import_module(f"{pkg}.vector_store")
+        except ImportError:
+            pytest.skip("content-architect rag not importable")
+
+        rng = np.random.default_rng(0)
+        vecs = rng.normal(size=(50, 8)).astype(np.float32)
+        store = vector_store.VectorStore(backend="local", path=str(tmp_path))
+        await store.upsert_many([(f"d{i}", v.tolist(), {"i": i}) for i, v in enumerate(vecs)])
+        await store.upsert("d3", (-vecs[3]).tolist(), {"i": 3, "v": 2})
+        assert isinstance(store.backend, vector_store.LocalBackend)
+
+        results = await store.search_many([vecs[7].tolist(), vecs[3].tolist()], limit=3)
+        assert results[0][0]["id"] == "d7" and results[0][0]["score"] == pytest.approx(1.0, abs=1e-5)
+        assert results[1][0]["id"] != "d3" and len(results[1]) == 3
+        assert [h["score"] for h in results[0]] == sorted((h["score"] for h in results[0]), reverse=True)
+
+        reopened = vector_store.VectorStore(backend="local", path=str(tmp_path))
+        hits = await reopened.search((-vecs[3]).tolist(), limit=1)
+        assert hits[0]["id"] == "d3" and hits[0]["payload"] == {"i": 3, "v": 2}
+        assert len(reopened.backend) == 50
+
+
+class TestEmbeddingService:
+    """Concurrent embedding requests share one model call and an LRU cache."""
+
+    @pytest.mark.asyncio
+    async def test_micro_batching_and_cache(self):
+        import asyncio
+        import importlib
+        import numpy as np
+
+        try:
+            embedding = importlib.import_module(f"{_load_ca_package('rag')}.embedding")
+        except ImportError:
+            pytest.skip("content-architect rag not importable")
+
+        calls, loads = [], []
+
+        class _Model:
+            def encode(self, texts):
+                calls.append(list(texts))
+                return np.array([[len(t), 1.0] for t in texts])
+
+        def _loader():
+            loads.append(1)
+            return _Model()
+
+        service = embedding.EmbeddingService(_loader, max_batch=8, max_wait_ms=20)
+        await service.start()
+        assert loads == [1] and calls == [["warmup"]]
+
+        vecs = await asyncio.gather(*(service.embed(f"q{i}") for i in range(5)))
+        assert [v[0] for v in vecs] == [2.0] * 5
+        assert len(calls) == 2 and sorted(calls[1]) == [f"q{i}" for i in range(5)]
+
+        again = await service.embed_many(["q1", "q1", "longer"])
+        assert calls[-1] == ["longer"] and again[0] is vecs[1] and again[2][0] == 6.0
+        await service.close()
+
+
+class TestReranker:
+    """Cross-encoder scoring is batched, cached and never mutates inputs."""
+
+    @pytest.mark.asyncio
+    async def test_batched_cached_rerank(self):
+        import asyncio
+        import importlib
+
+        try:
+            reranker_mod = importlib.import_module(f"{_load_ca_package('rag')}.reranker")
+        except ImportError:
+            pytest.skip("content-architect rag not importable")
+
+        calls = []
+
+        class _CrossEncoder:
+            def predict(self, pairs):
+                calls.append(list(pairs))
+                return [len(passage) for _, passage in pairs]
+
+        docs = [{"id": f"d{i}", "score": 1.0 - i * 0.1, "payload": {"text": "x" * (i + 1)}} for i in range(4)]
+        reranker = reranker_mod.Reranker(loader=_CrossEncoder, max_wait_ms=20, skip_margin=0.5)
+        a, b = await asyncio.gather(reranker.rerank("q1", docs, top_k=2), reranker.rerank("q2", docs, top_k=2))
+        assert [d["id"] for d in a] == ["d3", "d2"] and [d["id"] for d in b] == ["d3", "d2"]
+        assert len(calls) == 2 and len(calls[1]) == 8  # warmup, then both requests in one batch
+        assert "rerank_score" not in docs[0]
+
+        await reranker.rerank("q1", docs + [{"id": "d9", "score": 0.0, "payload": {"text": "yy"}}], top_k=2)
+        assert calls[-1] == [("q1", "yy")]
+
+        decisive = [{"id": "top", "score": 10.0, "payload": {"text": "a"}}, {"id": "rest", "score": 1.0, "payload": {"text": "bbbb"}}]
+        assert [d["id"] for d in await reranker.rerank("q3", decisive, top_k=1)] == ["top"]
+        assert calls[-1] == [("q1", "yy")]
+        await reranker.close()
+
+    @pytest.mark.asyncio
+    async def test_retriever_reranks_fused_candidates(self):
+        import importlib
+
+        try:
+            pkg = _load_ca_package("rag")
+            retrieval = importlib.import_module(f"{pkg}.retrieval")
+            embedding = importlib.import_module(f"{pkg}.embedding")
+            reranker_mod = importlib.import_module(f"{pkg}.reranker")
+        except ImportError:
+            pytest.skip("content-architect rag not importable")
+
+        class _CrossEncoder:
+            def predict(self, pairs):
+                return [len(passage) for _, passage in pairs]  # longest passage wins
+
+        reranker = reranker_mod.Reranker(loader=_CrossEncoder, max_wait_ms=1)
+        retriever = retrieval.Retriever(None, embeddings=embedding.EmbeddingService(lambda: None), reranker=reranker)
+        await retriever.index_many([
+            ("short", "fractions", None),
+            ("long", "fractions and decimals and percentages", None),
+            ("mid", "fractions and decimals", None),
+        ])
+        hits = await retriever.retrieve("fractions", top_k=2)
+        assert [h["id"] for h in hits] == ["long", "mid"] and "rerank_score" in hits[0]
+        await reranker.close()
+
+
+class TestGraphSnapshot:
+    """Prerequisite closure / learning paths over the seed data, without Neo4j."""
+
+    @pytest.mark.asyncio
+    async def test_learning_path_from_seed_export(self, tmp_path):
+        import importlib
+        import pathlib
+        import subprocess
+        import sys
+
+        try:
+            pkg = _load_ca_package("graph")
+            kg_mod = importlib.import_module(f"{pkg}.knowledge_graph")
+            planner_mod = importlib.import_module(f"{pkg}.prerequisite_planner")
+        except ImportError:
+            pytest.skip("content-architect graph not importable")
+
+        seed = pathlib.Path(__file__).resolve().parents[2] / "scripts" / "setup" / "seed_knowledge_graph.py"
+        path = tmp_path / "kg.json"
+        subprocess.run([sys.executable, str(seed), "--export-json", str(path)], check=True, capture_output=True)
+
+        kg = kg_mod.KnowledgeGraph(snapshot_path=str(path))
+        planner = planner_mod.PrerequisitePlanner(kg)
+        learning_path = await planner.compute_learning_path("Newton's Laws")
+        assert learning_path[-1] == "Newton's Laws"
+        assert set(learning_path[:-1]) == {
+            "Algebra Basics", "Linear Equations", "Quadratic Equations", "Functions",
+            "Introduction to Calculus", "Kinematics",
+        }
+        pos = {c: i for i, c in enumerate(learning_path)}
+        snap = await kg.snapshot()
+        for concept in learning_path:
+            assert all(pos[p] < pos[concept] for p in snap.prerequisites(concept))
+        assert await planner.compute_learning_path("algorithms") == snap.learning_path("Algorithms")
+        assert await kg.get_prerequisites("Functions") == ["Linear Equations", "Quadratic Equations"]
+        assert await planner.compute_learning_path("unknown") == ["unknown"]
+        assert await planner.next_concepts("Functions", goal="Derivatives") == ["Introduction to Calculus", "Derivatives"]
+        assert await planner.next_concepts("Derivatives", goal="Derivatives") == []
+        assert set(await planner.next_concepts("Functions", limit=10)) == set(snap.dependents("Functions"))
+        assert "Functions" in snap.dependents("Linear Equations")
+
+    def test_cycle_is_broken_deterministically(self):
+        import importlib
+
+        snapshot = importlib.import_module(f"{_load_ca_package('graph')}.snapshot")
+        concepts = [{"name": n, "difficulty": d} for n, d in [("a", 0.1), ("b", 0.2), ("c", 0.3), ("t", 0.9)]]
+        snap = snapshot.GraphSnapshot(concepts, [("a", "b"), ("b", "c"), ("c", "b"), ("c", "t")])
+        assert snap.learning_path("t") == ["a", "b", "c", "t"]
+        assert sorted(snap.closure("t")) == ["a", "b", "c"]
+
+
+class TestKnowledgeGraphBulk:
+    """Multi-concept reads and writes are single UNWIND round trips."""
+
+    @pytest.mark.asyncio
+    async def test_unwind_queries(self):
+        import importlib
+
+        try:
+            kg_mod = importlib.import_module(f"{_load_ca_package('graph')}.knowledge_graph")
+        except ImportError:
+            pytest.skip("content-architect graph not importable")
+
+        runs = []
+
+        class _Result:
+            def __init__(self, rows):
+                self._rows = rows
+
+            async def data(self):
+                return self._rows
+
+        class _Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run(self, query, **params):
+                runs.append((query, params))
+                if "PREREQUISITE" in query:
+                    return _Result([{"name": "b", "prerequisites": ["a"]}])
+                return _Result([{"name": n, "related": ["x"]} for n in params.get("names", [])])
+
+        class _Driver:
+            def session(self):
+                return _Session()
+
+        kg = kg_mod.KnowledgeGraph(use_snapshot=False, write_batch_size=2)
+        kg._driver = _Driver()
+        assert await kg.get_prerequisites_many(["a", "b", "b"]) == {"a": [], "b": ["a"]}
+        assert runs[-1][0].startswith("UNWIND") and runs[-1][1]["names"] == ["a", "b"]
+        assert await kg.get_related_many(["a", "b"], limit=3) == {"a": ["x"], "b": ["x"]}
+        assert runs[-1][1]["limit"] == 3 and len(runs) == 2
+
+        await kg.add_concepts_many([{"name": f"c{i}", "domain": "math"} for i in range(5)])
+        writes = runs[2:]
+        assert [len(p["rows"]) for _, p in writes] == [2, 2, 1]
+        assert writes[0][1]["rows"][0] == {"name": "c0", "domain": "math", "keywords": []}
+
+
+    @pytest.mark.asyncio
+    async def test_unreachable_neo4j_falls_back(self, tmp_path):
+        import importlib
+        import json
+
+        try:
+            kg_mod = importlib.import_module(f"{_load_ca_package('graph')}.knowledge_graph")
+        except ImportError:
+            pytest.skip("content-architect graph not importable")
+
+        calls = []
+
+        class _Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run(self, query, **params):
+                calls.append(query)
+                raise ConnectionError("Neo4j unavailable")
+
+        class _Driver:
+            def session(self):
+                return _Session()
+
+        kg = kg_mod.KnowledgeGraph()
+        kg._driver = _Driver()
+        assert await kg.snapshot() is None  # no fallback: no graph, but no error either
+        assert await kg.snapshot() is None and len(calls) == 1  # retry is backed off
+
+        path = tmp_path / "kg.json"
+        path.write_text(json.dumps({"concepts": [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}], "prerequisites": [["a", "b"]]}))
+        kg = kg_mod.KnowledgeGraph(snapshot_path=str(path), snapshot_ttl_s=0)
+        kg._driver = _Driver()
+        snap = await kg.snapshot()
+        assert snap.source == "file" and snap.prerequisites("B") == ["A"]
+        path.unlink()
+        assert await kg.snapshot() is snap  # both sources down: last good snapshot is kept
+
+
+class TestContentCache:
+    """Generated blocks are cached in two tiers and generated once per key."""
+
+    @pytest.mark.asyncio
+    async def test_singleflight_and_disk_tier(self, tmp_path):
+        import asyncio
+        import importlib
+
+        try:
+            cache_mod = importlib.import_module(f"{_load_ca_package('core')}.content_cache")
+        except ImportError:
+            pytest.skip("content-architect core not importable")
+
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return {"modality": "text", "content": {"body": "x"}}
+
+        key = cache_mod.content_key("Fractions", "text", "intermediate", "text_generator", "gpt-4", "1")
+        assert key != cache_mod.content_key("Fractions", "text", "intermediate", "text_generator", "gpt-4", "2")
+
+        cache = cache_mod.ContentCache(disk_dir=str(tmp_path))
+        results = await asyncio.gather(*(cache.get_or_create(key, generate) for _ in range(5)))
+        assert len(calls) == 1
+        assert sorted(source for _, source in results) == ["miss"] + ["shared"] * 4
+        assert (await cache.get_or_create(key, generate))[1] == "memory"
+
+        fresh = cache_mod.ContentCache(disk_dir=str(tmp_path))
+        value, source = await fresh.get_or_create(key, generate)
+        assert source == "disk" and value["content"] == {"body": "x"} and len(calls) == 1
+        assert (await fresh.get(key))[1] == "memory"
+
+        async def failing():
+            raise RuntimeError("generator down")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_create("other", failing)
+        assert (await cache.get("other"))[0] is None
+
+
+class TestPrefetchScheduler:
+    """Upcoming concepts are generated in the background, nearest first, once each."""
+
+    @pytest.mark.asyncio
+    async def test_priority_dedup_and_backoff(self):
+        import asyncio
+        import importlib
+
+        try:
+            prefetch = importlib.import_module(f"{_load_ca_package('core')}.prefetch")
+        except ImportError:
+            pytest.skip("content-architect core not importable")
+
+        ran, busy = [], [True]
+
+        async def run(job):
+            ran.append(job)
+            if job == "bad":
+                raise RuntimeError("generator down")
+
+        scheduler = prefetch.PrefetchScheduler(run, busy=lambda: busy[0], max_concurrency=1, lookahead=2, backoff_s=0.01)
+        assert not scheduler.should_prefetch(0.5) and not scheduler.should_prefetch(None)
+        assert scheduler.should_prefetch(0.85)
+
+        assert scheduler.hint(["b1", "b2", "b3"], mastery=0.8) == 2  # lookahead caps the hint
+        assert scheduler.hint(["a1", "b2"], mastery=0.95) == 1  # b2 already queued
+        assert scheduler.hint(["bad"], mastery=0.9) == 1
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        assert ran == []  # foreground is busy
+        busy[0] = False
+        await asyncio.wait_for(scheduler.join(), 1)
+        assert ran == ["a1", "bad", "b1", "b2"]  # rank, then higher mastery first
+        assert scheduler.hint(["b1"], mastery=0.9) == 1  # finished jobs can be queued again
+        await asyncio.wait_for(scheduler.join(), 1)
+        await scheduler.close()
+
+
+class TestArtifactStore:
+    """Content-addressed artifacts with LRU eviction and Range / ETag serving."""
+
+    def test_store_and_range_requests(self, tmp_path):
+        import importlib
+
+        from starlette.applications import Starlette
+        from starlette.routing import Route
+        from starlette.testclient import TestClient
+
+        try:
+            artifacts = importlib.import_module(f"{_load_ca_package('core')}.artifacts")
+        except ImportError:
+            pytest.skip("content-architect core not importable")
+
+        store = artifacts.ArtifactStore(str(tmp_path), max_bytes=2500)
+        audio = bytes(range(256)) * 4  # 1024 bytes
+        name = store.put(audio, ".mp3")
+        assert store.put(audio, ".mp3") == name and len(store) == 1
+        assert store.lookup("../../etc/passwd") is None
+
+        async def serve(request):
+            return artifacts.ArtifactResponse(store.lookup(request.path_params["name"]), request.path_params["name"])
+
+        client = TestClient(Starlette(routes=[Route("/generated/{name}", serve, methods=["GET", "HEAD"])]))
+        full = client.get(f"/generated/{name}")
+        assert full.status_code == 200 and full.content == audio
+        assert full.headers["content-type"] == "audio/mpeg" and full.headers["accept-ranges"] == "bytes"
+        etag = full.headers["etag"]
+
+        part = client.get(f"/generated/{name}", headers={"Range": "bytes=100-199"})
+        assert part.status_code == 206 and part.content == audio[100:200]
+        assert part.headers["content-range"] == "bytes 100-199/1024"
+        assert client.get(f"/generated/{name}", headers={"Range": "bytes=-24"}).content == audio[-24:]
+        assert client.get(f"/generated/{name}", headers={"Range": "bytes=5000-"}).status_code == 416
+        assert client.get(f"/generated/{name}", headers={"If-None-Match": etag}).status_code == 304
+        stale = client.get(f"/generated/{name}", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+        assert stale.status_code == 200 and len(stale.content) == 1024
+
+        second = store.put(b"b" * 1000, ".png")
+        store.lookup(name)  # touch: the png is now least recently used
+        store.put(b"c" * 1000, ".png")
+        assert store.lookup(second) is None and store.lookup(name) is not None
+        assert store.total_bytes == 2024
+
+        reloaded = artifacts.ArtifactStore(str(tmp_path), max_bytes=2500)
+        reloaded.load()
+        assert len(reloaded) == 2 and reloaded.total_bytes == 2024
+
+    @pytest.mark.asyncio
+    async def test_media_blocks_point_at_stored_artifacts(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        try:
+            main = _load_ca_main()
+        except ImportError as exc:
+            pytest.skip(f"content-architect not importable: {exc}")
+
+        store = main.ArtifactStore(str(tmp_path / "a"))
+        engine = main.ContentEngine(main.ContentCache(), artifacts=store)
+        request = main.ContentRequest(concept="waves", student_id="s1", cognitive_load=70)  # image + voice
+        blocks = (await engine.generate(request)).blocks
+        assert [b.modality.value for b in blocks] == ["image", "voice"]
+        monkeypatch.setattr(main, "artifacts", store)
+        client = TestClient(main.app)
+        for block in blocks:
+            name = block.metadata["artifact"]
+            assert block.content["url"] == f"/generated/{name}"
+            assert client.get(block.content["url"]).status_code == 200
+
+        # a cached block whose file this store does not have is rendered again
+        other = main.ArtifactStore(str(tmp_path / "b"))
+        blocks = (await main.ContentEngine(engine.cache, artifacts=other).generate(request)).blocks
+        assert all(other.lookup(b.metadata["artifact"]) for b in blocks)